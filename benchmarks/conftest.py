@@ -0,0 +1,191 @@
+"""
+Fixtures of the storage benchmarks.
+
+The database and the size of the dataset are set from the environment:
+
+* `BENCHMARK_DB_URI`: connection string of the database, a SQLite file in a
+  temporary directory by default. Its tables are dropped and recreated.
+* `BENCHMARK_USERS`: number of users to generate, 10000 by default
+* `BENCHMARK_SEED`: seed of the data generator, 42 by default
+* `BENCHMARK_UUID_STORAGE`: `char`, the default, or `binary`
+"""
+import os
+import tempfile
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+from sqlalchemy import event
+
+from chaosplt_account.storage import AccountStorage, initialize_storage
+from chaosplt_relational_storage.db import Base
+
+from datagen import Dataset, generate
+from stats import PERCENTILES, percentile
+
+# one entry per benchmark, printed at the end of the session
+_reports: List[Dict[str, Any]] = []
+# query plans of the statements of a call, per test, printed at the end too
+_plans: List[Tuple[str, str, List[str]]] = []
+
+# prefix turning a statement into the description of its plan, per dialect
+EXPLAIN = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "mysql": "EXPLAIN "
+}
+
+
+@pytest.fixture(scope="session")
+def db_uri() -> str:
+    uri = os.getenv("BENCHMARK_DB_URI")
+    if not uri:
+        directory = tempfile.mkdtemp(prefix="chaosplt-account-bench-")
+        uri = "sqlite:///{}".format(os.path.join(directory, "bench.db"))
+    return uri
+
+
+@pytest.fixture(scope="session")
+def account_storage(db_uri: str) -> AccountStorage:
+    storage = initialize_storage({
+        "db": {
+            "uri": db_uri,
+            "uuid_storage": os.getenv("BENCHMARK_UUID_STORAGE", "char")
+        }
+    })
+    yield storage
+    storage.release()
+
+
+@pytest.fixture(scope="session")
+def dataset(account_storage: AccountStorage) -> Dataset:
+    engine = account_storage.driver.engine
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return generate(
+        engine, users=int(os.getenv("BENCHMARK_USERS", 10000)),
+        seed=int(os.getenv("BENCHMARK_SEED", 42)))
+
+
+@pytest.fixture
+def measure(benchmark, account_storage: AccountStorage):
+    """
+    Run the given call under the benchmark and record the number of SQL
+    statements it performs along with the latency percentiles.
+
+    The call is given a rotating argument taken from `values`, so that the
+    benchmark does not hit the same rows over and over.
+    """
+    engine = account_storage.driver.engine
+
+    def run(fn: Callable[[Any], Any], values: List[Any]) -> Any:
+        state = {"index": 0}
+
+        def call():
+            value = values[state["index"] % len(values)]
+            state["index"] += 1
+            return fn(value)
+
+        statements = count_statements(engine, lambda: fn(values[0]))
+        result = benchmark(call)
+
+        # no statistics when benchmarks are disabled, the call ran once
+        data = sorted(benchmark.stats.stats.data) if benchmark.stats else []
+        report = {
+            "name": benchmark.name,
+            "statements": statements,
+            "rounds": len(data)
+        }
+        for p in PERCENTILES:
+            report["p{}".format(p)] = percentile(data, p)
+        benchmark.extra_info.update(report)
+        _reports.append(report)
+        return result
+
+    return run
+
+
+@pytest.fixture
+def explain(request, account_storage: AccountStorage):
+    """
+    Call the given function once and return the query plan of each of the
+    statements it performed, as lines of text.
+    """
+    engine = account_storage.driver.engine
+
+    def run(fn: Callable[[], Any]) -> List[List[str]]:
+        plans = []
+        for statement, parameters in capture_statements(engine, fn):
+            plan = explain_statement(engine, statement, parameters)
+            _plans.append((request.node.name, statement, plan))
+            plans.append(plan)
+        return plans
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if _plans:
+        terminalreporter.section("query plans")
+        for name, statement, plan in _plans:
+            terminalreporter.write_line("{}: {}".format(
+                name, " ".join(statement.split())[:120]))
+            for line in plan:
+                terminalreporter.write_line("    {}".format(line))
+
+    if not _reports:
+        return
+
+    terminalreporter.section("storage latency percentiles (ms)")
+    header = "{:<45} {:>5} " + " ".join(["{:>8}"] * len(PERCENTILES))
+    terminalreporter.write_line(header.format(
+        "benchmark", "sql", *["p{}".format(p) for p in PERCENTILES]))
+    line = "{:<45} {:>5} " + " ".join(["{:>8.3f}"] * len(PERCENTILES))
+    for report in _reports:
+        terminalreporter.write_line(line.format(
+            report["name"][:45], report["statements"],
+            *[report["p{}".format(p)] * 1000 for p in PERCENTILES]))
+
+
+###############################################################################
+# Internals
+###############################################################################
+def count_statements(engine, fn: Callable[[], Any]) -> int:
+    """
+    Number of statements sent to the database while calling `fn` once.
+    """
+    return len(capture_statements(engine, fn))
+
+
+def capture_statements(engine, fn: Callable[[], Any]) -> List[Tuple[str, Any]]:
+    """
+    Statements sent to the database while calling `fn` once, along with
+    their parameters as given to the driver.
+    """
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def explain_statement(engine, statement: str, parameters: Any) -> List[str]:
+    prefix = EXPLAIN.get(engine.dialect.name)
+    if not prefix:
+        return ["no plan with {}".format(engine.dialect.name)]
+
+    # the parameters were already processed for the driver, bypass SQLAlchemy
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(prefix + statement, parameters)
+        # the description of the step is the last column in all dialects
+        return [str(row[-1]) for row in cursor.fetchall()]
+    finally:
+        conn.close()
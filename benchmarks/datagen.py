@@ -0,0 +1,207 @@
+"""
+Synthetic dataset for the storage benchmarks.
+
+Every user gets, like a real signup, a personal org and workspace. On top of
+this, collaborative orgs are created with a heavy-tailed number of members:
+most have a handful while a few have hundreds. Each has a few workspaces
+shared with a subset of its members.
+
+Identifiers are derived from the row's index so the generator does not keep
+them in memory, which lets it produce up to millions of users.
+"""
+from copy import deepcopy
+import random
+from typing import Any, Dict, List
+import uuid
+from uuid import UUID
+
+import attr
+from sqlalchemy.engine import Engine
+
+from chaosplt_account.storage.model.org import DEFAULT_ORG_SETTINGS, \
+    Org, OrgType, OrgsMembers
+from chaosplt_account.storage.model.user import User, UserInfo, UserPrivacy
+from chaosplt_account.storage.model.workspace import \
+    DEFAULT_WORKSPACE_SETTINGS, Workspace, WorkspacesMembers, WorkspaceType
+
+__all__ = ["Dataset", "generate", "user_id", "org_id", "workspace_id"]
+
+NAMESPACE = UUID("5f0c6f3a-4d3b-4a59-9a2e-6a1c1d0b6e2f")
+# one collaborative org for that many users
+USERS_PER_ORG = 20
+MAX_ORG_MEMBERS = 500
+MAX_ORG_WORKSPACES = 20
+# how many identifiers of each kind are kept to drive the benchmarks
+SAMPLE_SIZE = 1000
+
+
+@attr.s
+class Dataset:
+    users: int = attr.ib()
+    orgs: int = attr.ib()
+    seed: int = attr.ib()
+    user_ids: List[UUID] = attr.ib(factory=list)
+    usernames: List[str] = attr.ib(factory=list)
+    org_ids: List[UUID] = attr.ib(factory=list)
+    workspace_ids: List[UUID] = attr.ib(factory=list)
+    # members of the largest collaborative org
+    busy_user_ids: List[UUID] = attr.ib(factory=list)
+
+
+def user_id(index: int) -> UUID:
+    return uuid.uuid5(NAMESPACE, "user-{}".format(index))
+
+
+def org_id(index: int) -> UUID:
+    return uuid.uuid5(NAMESPACE, "org-{}".format(index))
+
+
+def workspace_id(index: int) -> UUID:
+    return uuid.uuid5(NAMESPACE, "workspace-{}".format(index))
+
+
+def generate(engine: Engine, users: int = 10000, seed: int = 42,
+             chunk_size: int = 5000) -> Dataset:
+    """
+    Insert the dataset through `engine` whose tables must exist and be empty.
+    """
+    rnd = random.Random(seed)
+    orgs = max(1, users // USERS_PER_ORG)
+    dataset = Dataset(users=users, orgs=orgs, seed=seed)
+
+    for start in range(0, users, chunk_size):
+        insert_users(engine, range(start, min(users, start + chunk_size)))
+
+    # collaborative orgs and their workspaces come after the personal ones
+    # in the index space
+    ws_index = users
+    largest = 0
+    org_chunk_size = max(1, chunk_size // 10)
+    for start in range(users, users + orgs, org_chunk_size):
+        rows = {
+            "org": [], "orgs_members": [], "workspace": [],
+            "workspaces_members": []
+        }
+        for index in range(start, min(users + orgs, start + org_chunk_size)):
+            members = org_members(rnd, users)
+            if len(members) > largest:
+                largest = len(members)
+                dataset.busy_user_ids = [user_id(m) for m in members[:50]]
+            ws_index = collaborative_org_rows(
+                rnd, index, members, ws_index, rows)
+        insert_rows(engine, rows)
+
+    dataset.user_ids = [
+        user_id(i) for i in rnd.sample(range(users), min(users, SAMPLE_SIZE))]
+    dataset.usernames = [
+        "user{}".format(i) for i in
+        rnd.sample(range(users), min(users, SAMPLE_SIZE))]
+    dataset.org_ids = [
+        org_id(users + i) for i in
+        rnd.sample(range(orgs), min(orgs, SAMPLE_SIZE))]
+    dataset.workspace_ids = [
+        workspace_id(i) for i in
+        rnd.sample(range(ws_index), min(ws_index, SAMPLE_SIZE))]
+    return dataset
+
+
+###############################################################################
+# Internals
+###############################################################################
+def org_members(rnd: random.Random, users: int) -> List[int]:
+    """
+    Pick the members of a collaborative org, their number follows a Pareto
+    distribution so that most orgs are small and a few are large.
+    """
+    count = int(rnd.paretovariate(1.2)) + 1
+    count = min(count, MAX_ORG_MEMBERS, users)
+    return rnd.sample(range(users), count)
+
+
+def insert_users(engine: Engine, indices: range):
+    rows = {
+        "user": [], "user_info": [], "user_privacy": [], "org": [],
+        "orgs_members": [], "workspace": [], "workspaces_members": []
+    }
+    for index in indices:
+        uid = user_id(index)
+        username = "user{}".format(index)
+        rows["user"].append({
+            "id": uid, "is_active": True, "is_authenticated": True,
+            "is_anonymous": False, "is_local": True, "is_closed": False
+        })
+        rows["user_info"].append({
+            "user_id": uid, "username": username,
+            "lower_username": username, "fullname": "User {}".format(index),
+            "details": {"email": "{}@example.com".format(username)}
+        })
+        rows["user_privacy"].append({"user_id": uid})
+
+        # personal org and workspace, the org index space starts with these
+        oid = org_id(index)
+        rows["org"].append({
+            "id": oid, "user_id": uid, "name": username,
+            "name_lower": username, "kind": OrgType.personal,
+            "settings": deepcopy(DEFAULT_ORG_SETTINGS)
+        })
+        rows["orgs_members"].append(
+            {"org_id": oid, "user_id": uid, "is_owner": True})
+
+        wid = workspace_id(index)
+        rows["workspace"].append({
+            "id": wid, "org_id": oid, "name": username,
+            "name_lower": username, "kind": WorkspaceType.personal,
+            "settings": deepcopy(DEFAULT_WORKSPACE_SETTINGS)
+        })
+        rows["workspaces_members"].append(
+            {"workspace_id": wid, "user_id": uid, "is_owner": True})
+
+    insert_rows(engine, rows)
+
+
+def collaborative_org_rows(rnd: random.Random, index: int,
+                           members: List[int], ws_index: int,
+                           rows: Dict[str, List[Dict[str, Any]]]) -> int:
+    oid = org_id(index)
+    name = "org{}".format(index)
+    rows["org"].append({
+        "id": oid, "name": name, "name_lower": name,
+        "kind": OrgType.collaborative,
+        "settings": deepcopy(DEFAULT_ORG_SETTINGS)
+    })
+    for position, member in enumerate(members):
+        rows["orgs_members"].append({
+            "org_id": oid, "user_id": user_id(member),
+            "is_owner": position == 0
+        })
+
+    workspaces = min(MAX_ORG_WORKSPACES, int(rnd.expovariate(0.5)) + 1)
+    for w in range(workspaces):
+        wid = workspace_id(ws_index)
+        ws_index += 1
+        ws_name = "{}-workspace{}".format(name, w)
+        rows["workspace"].append({
+            "id": wid, "org_id": oid, "name": ws_name,
+            "name_lower": ws_name, "kind": WorkspaceType.public,
+            "settings": deepcopy(DEFAULT_WORKSPACE_SETTINGS)
+        })
+        # about half of the org's members collaborate on each workspace
+        collaborators = rnd.sample(members, max(1, len(members) // 2))
+        for position, member in enumerate(collaborators):
+            rows["workspaces_members"].append({
+                "workspace_id": wid, "user_id": user_id(member),
+                "is_owner": position == 0
+            })
+    return ws_index
+
+
+def insert_rows(engine: Engine, rows: Dict[str, List[Dict[str, Any]]]):
+    tables = (
+        User.__table__, UserInfo.__table__, UserPrivacy.__table__,
+        Org.__table__, OrgsMembers.__table__, Workspace.__table__,
+        WorkspacesMembers.__table__)
+    with engine.begin() as conn:
+        for table in tables:
+            batch = rows.get(table.name)
+            if batch:
+                conn.execute(table.insert(), batch)
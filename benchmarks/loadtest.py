@@ -0,0 +1,510 @@
+"""
+HTTP load test of the account service.
+
+The web and API applications are built by `initialize_all` and served by
+CherryPy within this process, exactly as in production, while the clients
+of the remote auth and activity services are replaced by stubs. A number of
+concurrent clients, each signed in as its own user, then replay a weighted
+mix of requests for a given duration.
+
+Throughput and latencies of every kind of request are reported, optionally
+saved as JSON and compared against a previous run:
+
+```
+$ python benchmarks/loadtest.py --duration 30 --output run.json
+$ python benchmarks/loadtest.py --duration 30 --baseline run.json
+```
+
+The clients share the interpreter with the server, numbers are only
+meaningful when compared with runs made on the same host.
+"""
+from collections import Counter, defaultdict
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
+from uuid import UUID
+
+import attr
+import cherrypy
+import click
+from flask_jwt_extended import create_access_token
+
+from chaosplt_account.server import initialize_all, release_all
+from chaosplt_account.service import Services
+from chaosplt_account.service.auth import AuthService
+from chaosplt_account.service.channel import ChannelPool
+from chaosplt_account.settings import load_settings
+from chaosplt_relational_storage.db import Base
+
+from datagen import generate
+from stats import PERCENTILES, histogram, percentile
+
+cur_dir = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CONFIG = os.path.join(cur_dir, "loadtest.toml")
+DEFAULT_MIX = "current_user=4,lookup_org=3,list_workspaces=2,create_org=1"
+PASSWORD = "loadtest-password"
+# when standalone, the API application is grafted on `/api/v1` and its
+# blueprints are registered under that mount point as well
+API_PREFIX = "/api/v1/api/v1"
+
+# method, path, JSON body and whether the request goes to the web app (with
+# the session cookie) rather than the API (with the access token)
+Request = Tuple[str, str, Dict[str, Any], bool]
+
+
+@attr.s
+class Client:
+    index: int = attr.ib()
+    user_id: UUID = attr.ib()
+    username: str = attr.ib()
+    token: str = attr.ib(default=None)
+    cookie: str = attr.ib(default=None)
+    created: int = attr.ib(default=0)
+
+
+###############################################################################
+# Stubbed remote services
+###############################################################################
+class StubEventService:
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+
+    def record(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def release(self):
+        pass
+
+
+class StubActivityService:
+    def __init__(self, latency: float = 0):
+        self.event = StubEventService(latency)
+
+    def release(self):
+        self.event.release()
+
+
+class StubAccessTokenService:
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+
+    def _call(self, result: Any = None) -> Any:
+        if self.latency:
+            time.sleep(self.latency)
+        return result
+
+    def create(self, name: str, user_id: UUID):
+        return self._call()
+
+    def delete(self, user_id: UUID, token_id: UUID):
+        return self._call()
+
+    def revoke(self, user_id: UUID, token_id: UUID):
+        return self._call()
+
+    def get(self, token_id: UUID):
+        return self._call()
+
+    def get_by_name(self, user_id: UUID, name: str):
+        return self._call()
+
+    def get_by_user(self, user_id: UUID):
+        return self._call([])
+
+    def get_by_org(self, org_id: UUID):
+        return self._call([])
+
+    def get_by_workspace(self, workspace_id: UUID):
+        return self._call([])
+
+    def release(self):
+        pass
+
+
+###############################################################################
+# Request mix
+###############################################################################
+def current_user(client: Client, rnd: random.Random, users: int) -> Request:
+    return ("GET", "/account/users/current", None, True)
+
+
+def lookup_org(client: Client, rnd: random.Random, users: int) -> Request:
+    # personal orgs of the generated users are named after them
+    name = "user{}".format(rnd.randrange(users))
+    path = "{}/organizations/lookup/{}".format(API_PREFIX, name)
+    return ("GET", path, None, False)
+
+
+def list_workspaces(client: Client, rnd: random.Random,
+                    users: int) -> Request:
+    return ("GET", "{}/workspaces?limit=50".format(API_PREFIX), None, False)
+
+
+def create_org(client: Client, rnd: random.Random, users: int) -> Request:
+    client.created += 1
+    name = "loadtest{}-org{}".format(client.index, client.created)
+    return ("POST", "{}/organizations".format(API_PREFIX), {"name": name},
+            False)
+
+
+SCENARIOS: Dict[str, Callable[[Client, random.Random, int], Request]] = {
+    "current_user": current_user,
+    "lookup_org": lookup_org,
+    "list_workspaces": list_workspaces,
+    "create_org": create_org
+}
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """
+    Parse a mix such as `current_user=4,create_org=1` into the weight of each
+    scenario.
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise click.BadParameter(
+                "unknown scenario '{}', pick from {}".format(
+                    name, ", ".join(SCENARIOS)))
+        weights[name] = int(weight or 1)
+    return weights
+
+
+###############################################################################
+# Run
+###############################################################################
+def boot(config: Dict[str, Any], users: int, seed: int, clients: int,
+         remote_latency: float) -> Tuple[Tuple[Any, ...], List[Client]]:
+    """
+    Initialize the account service with stubbed remote services, generate
+    the dataset and start serving. Returns the initialized resources and the
+    signed in clients.
+    """
+    services = Services(
+        auth=AuthService(StubAccessTokenService(remote_latency)),
+        activity=StubActivityService(remote_latency),
+        channels=ChannelPool())
+    resources = initialize_all(
+        config, services=services, access_log_handler=logging.NullHandler())
+    web_app, api_app, _, _, storage = resources
+
+    engine = storage.driver.engine
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    click.echo("Generating {} users...".format(users))
+    generate(engine, users=users, seed=seed)
+
+    signed_in = []
+    for index in range(clients):
+        username = "loadtest{}".format(index)
+        user = storage.registration.create_local(username, PASSWORD)
+        client = Client(index=index, user_id=user.id, username=username)
+        with api_app.app_context():
+            client.token = create_access_token(identity=str(user.id))
+        signed_in.append(client)
+
+    cherrypy.engine.start()
+    cherrypy.engine.wait(cherrypy.engine.states.STARTED)
+
+    for client in signed_in:
+        client.cookie = sign_in(client)
+
+    return resources, signed_in
+
+
+def sign_in(client: Client) -> str:
+    conn = connect()
+    try:
+        conn.request(
+            "POST", "/account/users/signin/local",
+            json.dumps({"username": client.username, "password": PASSWORD}),
+            {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise click.ClickException(
+                "Could not sign in '{}': {}".format(
+                    client.username, response.status))
+        return response.getheader("Set-Cookie").split(";", 1)[0]
+    finally:
+        conn.close()
+
+
+def connect() -> http.client.HTTPConnection:
+    host, port = cherrypy.server.bound_addr[:2]
+    return http.client.HTTPConnection(host, port, timeout=30)
+
+
+def run_client(client: Client, weights: Dict[str, int], users: int,
+               seed: int, warmup_until: float, until: float,
+               samples: Dict[str, List[float]],
+               statuses: Dict[str, Counter]):
+    """
+    Send requests, picked from the weighted mix, over a single keep-alive
+    connection until `until`. Nothing is recorded during the warm-up.
+
+    The status of each response is counted, a connection failure counts as a
+    status of `0`.
+    """
+    rnd = random.Random(seed + client.index)
+    names = list(weights)
+    cum_weights = []
+    total = 0
+    for name in names:
+        total += weights[name]
+        cum_weights.append(total)
+
+    conn = connect()
+    while True:
+        now = time.perf_counter()
+        if now >= until:
+            break
+
+        name = rnd.choices(names, cum_weights=cum_weights)[0]
+        method, path, body, web = SCENARIOS[name](client, rnd, users)
+        headers = {}
+        if web:
+            headers["Cookie"] = client.cookie
+        else:
+            headers["Authorization"] = "Bearer {}".format(client.token)
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+            body = json.dumps(body)
+
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = 0
+            conn.close()
+            conn = connect()
+        latency = time.perf_counter() - start
+
+        if start >= warmup_until:
+            samples[name].append(latency)
+            statuses[name][status] += 1
+    conn.close()
+
+
+def load(clients: List[Client], weights: Dict[str, int], users: int,
+         seed: int, duration: float, warmup: float) -> Dict[str, Any]:
+    per_client = []
+    threads = []
+    started = time.perf_counter()
+    warmup_until = started + warmup
+    until = warmup_until + duration
+    for client in clients:
+        samples = defaultdict(list)
+        statuses = defaultdict(Counter)
+        per_client.append((samples, statuses))
+        t = threading.Thread(
+            target=run_client, name="loadtest-{}".format(client.index),
+            args=(client, weights, users, seed, warmup_until, until,
+                  samples, statuses),
+            daemon=True)
+        threads.append(t)
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    samples = defaultdict(list)
+    statuses = defaultdict(Counter)
+    for client_samples, client_statuses in per_client:
+        for name, latencies in client_samples.items():
+            samples[name].extend(latencies)
+        for name, counts in client_statuses.items():
+            statuses[name].update(counts)
+
+    result = {
+        "clients": len(clients),
+        "duration": duration,
+        "mix": weights,
+        "scenarios": {}
+    }
+    everything = []
+    every_status = Counter()
+    for name in weights:
+        everything.extend(samples[name])
+        every_status.update(statuses[name])
+        result["scenarios"][name] = summarize(
+            samples[name], statuses[name], duration)
+    result["total"] = summarize(everything, every_status, duration)
+    return result
+
+
+def summarize(latencies: List[float], statuses: Counter,
+              duration: float) -> Dict[str, Any]:
+    data = sorted(latencies)
+    summary = {
+        "requests": len(data),
+        "errors": sum(
+            count for status, count in statuses.items()
+            if status == 0 or status >= 400),
+        "statuses": {str(status): count for status, count in
+                     sorted(statuses.items())},
+        "rps": len(data) / duration if duration else 0,
+        "max": data[-1] if data else 0.0,
+        "histogram": histogram(data)
+    }
+    for p in PERCENTILES:
+        summary["p{}".format(p)] = percentile(data, p)
+    return summary
+
+
+###############################################################################
+# Report
+###############################################################################
+def report(result: Dict[str, Any]):
+    header = "{:<16} {:>8} {:>6} {:>9} " + \
+        " ".join(["{:>8}"] * len(PERCENTILES)) + " {:>8}"
+    line = "{:<16} {:>8} {:>6} {:>9.1f} " + \
+        " ".join(["{:>8.2f}"] * len(PERCENTILES)) + " {:>8.2f}"
+    click.echo()
+    click.echo(header.format(
+        "scenario", "requests", "errors", "rps",
+        *["p{}".format(p) for p in PERCENTILES], "max"))
+    rows = list(result["scenarios"].items()) + [("total", result["total"])]
+    for name, s in rows:
+        click.echo(line.format(
+            name, s["requests"], s["errors"], s["rps"],
+            *[s["p{}".format(p)] * 1000 for p in PERCENTILES],
+            s["max"] * 1000))
+
+    statuses = result["total"]["statuses"]
+    click.echo("\nresponses: {}".format(", ".join(
+        "{} x{}".format(status if status != "0" else "failed", count)
+        for status, count in statuses.items())))
+
+    click.echo("\nlatency histogram (ms)")
+    buckets = result["total"]["histogram"]
+    most = max(buckets.values()) or 1
+    for bound, count in buckets.items():
+        bar = "#" * int(round(50 * count / most))
+        click.echo("  <= {:>5} {:>8} {}".format(bound, count, bar))
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float) -> List[str]:
+    """
+    Compare the throughput and p99 latency of each scenario with the
+    baseline. Returns the regressions beyond `tolerance`, a ratio.
+    """
+    regressions = []
+    click.echo("\ncompared to baseline")
+    click.echo("{:<16} {:>9} {:>9} {:>8} {:>9} {:>9} {:>8}".format(
+        "scenario", "rps", "baseline", "delta", "p99", "baseline", "delta"))
+    rows = list(result["scenarios"].items()) + [("total", result["total"])]
+    for name, current in rows:
+        if name == "total":
+            previous = baseline.get("total")
+        else:
+            previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+
+        rps_delta = ratio(current["rps"], previous["rps"])
+        p99_delta = ratio(current["p99"], previous["p99"])
+        click.echo(
+            "{:<16} {:>9.1f} {:>9.1f} {:>+7.1%} {:>9.2f} {:>9.2f} "
+            "{:>+7.1%}".format(
+                name, current["rps"], previous["rps"], rps_delta,
+                current["p99"] * 1000, previous["p99"] * 1000, p99_delta))
+
+        if rps_delta < -tolerance:
+            regressions.append("{}: throughput down by {:.1%}".format(
+                name, -rps_delta))
+        if p99_delta > tolerance:
+            regressions.append("{}: p99 latency up by {:.1%}".format(
+                name, p99_delta))
+    return regressions
+
+
+def ratio(current: float, previous: float) -> float:
+    if not previous:
+        return 0.0
+    return (current - previous) / previous
+
+
+###############################################################################
+# Command line
+###############################################################################
+@click.command()
+@click.option('--config', default=DEFAULT_CONFIG, show_default=True,
+              type=click.Path(exists=True, readable=True, resolve_path=True),
+              help='Configuration TOML file.')
+@click.option('--db-uri', help='Database to run against, its tables are '
+              'dropped. Defaults to a temporary SQLite file.')
+@click.option('--users', default=1000, show_default=True,
+              help='Number of users to generate.')
+@click.option('--clients', default=1, show_default=True,
+              help='Number of concurrent clients, keep it to one against '
+              'SQLite.')
+@click.option('--duration', default=10.0, show_default=True,
+              help='Seconds during which requests are recorded.')
+@click.option('--warmup', default=2.0, show_default=True,
+              help='Seconds of load before recording.')
+@click.option('--mix', default=DEFAULT_MIX, show_default=True,
+              help='Weighted scenarios to replay.')
+@click.option('--remote-latency', default=0.0, show_default=True,
+              help='Milliseconds each call to a stubbed remote service '
+              'takes.')
+@click.option('--seed', default=42, show_default=True)
+@click.option('--output', type=click.Path(dir_okay=False, writable=True),
+              help='Save the results as JSON, to be used as a baseline.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Compare the results with a previous run.')
+@click.option('--tolerance', default=0.1, show_default=True,
+              help='Regression ratio tolerated before failing.')
+def main(config: str, db_uri: str, users: int, clients: int,
+         duration: float, warmup: float, mix: str, remote_latency: float,
+         seed: int, output: str, baseline: str, tolerance: float):
+    """
+    Load test the account service web and API applications.
+    """
+    weights = parse_mix(mix)
+    config = load_settings(config)
+    if not db_uri:
+        directory = tempfile.mkdtemp(prefix="chaosplt-account-loadtest-")
+        db_uri = "sqlite:///{}".format(os.path.join(directory, "load.db"))
+    config["db"]["uri"] = db_uri
+
+    resources, signed_in = boot(
+        config, users, seed, clients, remote_latency / 1000)
+    try:
+        click.echo("Running {} clients for {}s (+{}s warm-up)...".format(
+            clients, duration, warmup))
+        result = load(signed_in, weights, users, seed, duration, warmup)
+    finally:
+        cherrypy.engine.exit()
+        release_all(*resources)
+
+    report(result)
+    if output:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(result, json.load(f), tolerance)
+        if regressions:
+            click.echo("\nregressions:")
+            for regression in regressions:
+                click.echo("  {}".format(regression))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Statistics shared by the benchmarks and the load test.
+"""
+import math
+from typing import Dict, List, Sequence
+
+__all__ = ["PERCENTILES", "HISTOGRAM_BOUNDS", "percentile", "histogram"]
+
+PERCENTILES = (50, 90, 95, 99)
+# upper bounds, in milliseconds, of the latency histogram buckets
+HISTOGRAM_BOUNDS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf)
+
+
+def percentile(data: Sequence[float], p: int) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+    """
+    if not data:
+        return 0.0
+    rank = max(0, int(round(p / 100 * len(data))) - 1)
+    return data[min(rank, len(data) - 1)]
+
+
+def histogram(latencies: List[float]) -> Dict[str, int]:
+    """
+    Count latencies, given in seconds, per bucket of `HISTOGRAM_BOUNDS`. The
+    buckets are keyed by their upper bound in milliseconds.
+    """
+    counts = [0] * len(HISTOGRAM_BOUNDS)
+    for latency in latencies:
+        ms = latency * 1000
+        for index, bound in enumerate(HISTOGRAM_BOUNDS):
+            if ms <= bound:
+                counts[index] += 1
+                break
+    return {
+        ("inf" if math.isinf(bound) else str(bound)): count
+        for bound, count in zip(HISTOGRAM_BOUNDS, counts)
+    }
@@ -0,0 +1,107 @@
+"""
+Query plans of the lookups by user and of the listings.
+
+The membership tables are keyed by org or workspace first, looking up the
+memberships of a user relies on their secondary indexes. Those plans are
+printed at the end of the session. Against SQLite, they must not scan any
+of the tables whose rows are looked up by user.
+
+Pages of orgs and workspaces must be read in order from their
+`(created_on, id)` index, without sorting the whole table.
+"""
+import re
+from typing import List
+
+import pytest
+
+from chaosplt_account.storage import AccountStorage
+
+from datagen import Dataset
+
+BY_USER_TABLES = ("orgs_members", "workspaces_members", "user_info",
+                  "user_privacy", "org")
+# "SCAN TABLE t" before SQLite 3.36, "SCAN t" since
+FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)")
+SORT = re.compile(r"^USE TEMP B-TREE FOR (RIGHT PART OF )?ORDER BY")
+
+
+def scanned_tables(plans: List[List[str]]) -> List[str]:
+    tables = []
+    for plan in plans:
+        for line in plan:
+            m = FULL_SCAN.match(line)
+            if m and m.group("table") in BY_USER_TABLES:
+                tables.append(m.group("table"))
+    return tables
+
+
+def sorted_plans(plans: List[List[str]]) -> List[List[str]]:
+    return [plan for plan in plans if any(SORT.match(line) for line in plan)]
+
+
+@pytest.fixture
+def check_plans(account_storage: AccountStorage, explain):
+    def check(fn):
+        plans = explain(fn)
+        assert plans
+        if account_storage.driver.engine.dialect.name == "sqlite":
+            assert scanned_tables(plans) == []
+    return check
+
+
+def test_user_get_plan(check_plans, account_storage: AccountStorage,
+                       dataset: Dataset):
+    check_plans(lambda: account_storage.user.get(dataset.busy_user_ids[0]))
+
+
+def test_org_get_by_user_plan(check_plans, account_storage: AccountStorage,
+                              dataset: Dataset):
+    check_plans(
+        lambda: account_storage.org.get_by_user(dataset.busy_user_ids[0]))
+
+
+def test_workspace_get_by_user_plan(check_plans,
+                                    account_storage: AccountStorage,
+                                    dataset: Dataset):
+    check_plans(lambda: account_storage.workspace.get_by_user(
+        dataset.busy_user_ids[0]))
+
+
+def test_workspace_get_memberships_plan(check_plans,
+                                        account_storage: AccountStorage,
+                                        dataset: Dataset):
+    workspace_ids = dataset.workspace_ids[:100]
+    check_plans(lambda: account_storage.workspace.get_memberships(
+        dataset.busy_user_ids[0], workspace_ids))
+
+
+def test_registration_get_by_username_plan(check_plans,
+                                           account_storage: AccountStorage,
+                                           dataset: Dataset):
+    check_plans(lambda: account_storage.registration.get_by_username(
+        dataset.usernames[0]))
+
+
+@pytest.fixture
+def check_page_plans(account_storage: AccountStorage, explain):
+    def check(list_all):
+        first = list_all(limit=100)
+        assert first.cursor is not None
+        plans = explain(lambda: list_all(limit=100))
+        plans += explain(lambda: list_all(cursor=first.cursor, limit=100))
+        assert plans
+        if account_storage.driver.engine.dialect.name == "sqlite":
+            assert sorted_plans(plans) == []
+    return check
+
+
+def test_org_list_all_plan(check_page_plans,
+                           account_storage: AccountStorage,
+                           dataset: Dataset):
+    check_page_plans(account_storage.org.list_all)
+
+
+def test_workspace_list_all_plan(check_page_plans,
+                                 account_storage: AccountStorage,
+                                 dataset: Dataset):
+    check_page_plans(account_storage.workspace.list_all)
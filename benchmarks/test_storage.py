@@ -0,0 +1,134 @@
+"""
+Benchmarks of the storage services.
+
+Each benchmark reports, next to pytest-benchmark's own statistics, the
+number of SQL statements performed by a single call. That number must not
+grow with the size of the dataset, when it does, some relationship is
+loaded lazily row per row.
+"""
+from chaosplt_account.storage import AccountStorage
+
+from datagen import Dataset
+
+
+###############################################################################
+# Users
+###############################################################################
+def test_user_get(measure, account_storage: AccountStorage,
+                  dataset: Dataset):
+    user = measure(account_storage.user.get, dataset.user_ids)
+    assert user is not None
+
+
+def test_user_get_with_many_memberships(measure,
+                                        account_storage: AccountStorage,
+                                        dataset: Dataset):
+    user = measure(account_storage.user.get, dataset.busy_user_ids)
+    assert user is not None
+
+
+###############################################################################
+# Organizations
+###############################################################################
+def test_org_get(measure, account_storage: AccountStorage, dataset: Dataset):
+    org = measure(account_storage.org.get, dataset.org_ids)
+    assert org is not None
+
+
+def test_org_get_many(measure, account_storage: AccountStorage,
+                      dataset: Dataset):
+    batches = [dataset.org_ids[i:i + 50]
+               for i in range(0, len(dataset.org_ids), 50)]
+    orgs = measure(account_storage.org.get_many, batches)
+    assert orgs
+
+
+def test_org_list_all(measure, account_storage: AccountStorage,
+                      dataset: Dataset):
+    page = measure(lambda limit: account_storage.org.list_all(
+        limit=limit), [100])
+    assert page.items
+
+
+def test_org_get_by_user(measure, account_storage: AccountStorage,
+                         dataset: Dataset):
+    orgs = measure(account_storage.org.get_by_user, dataset.busy_user_ids)
+    assert orgs
+
+
+def test_org_get_members(measure, account_storage: AccountStorage,
+                         dataset: Dataset):
+    members = measure(account_storage.org.get_members, dataset.org_ids)
+    assert members
+
+
+def test_org_is_member(measure, account_storage: AccountStorage,
+                       dataset: Dataset):
+    pairs = list(zip(dataset.org_ids, dataset.user_ids))
+    measure(lambda pair: account_storage.org.is_member(*pair), pairs)
+
+
+###############################################################################
+# Workspaces
+###############################################################################
+def test_workspace_get(measure, account_storage: AccountStorage,
+                       dataset: Dataset):
+    workspace = measure(
+        account_storage.workspace.get, dataset.workspace_ids)
+    assert workspace is not None
+
+
+def test_workspace_get_many(measure, account_storage: AccountStorage,
+                            dataset: Dataset):
+    batches = [dataset.workspace_ids[i:i + 50]
+               for i in range(0, len(dataset.workspace_ids), 50)]
+    workspaces = measure(account_storage.workspace.get_many, batches)
+    assert workspaces
+
+
+def test_workspace_get_by_user(measure, account_storage: AccountStorage,
+                               dataset: Dataset):
+    workspaces = measure(
+        account_storage.workspace.get_by_user, dataset.busy_user_ids)
+    assert workspaces
+
+
+def test_workspace_get_collaborators(measure,
+                                     account_storage: AccountStorage,
+                                     dataset: Dataset):
+    collaborators = measure(
+        account_storage.workspace.get_collaborators, dataset.workspace_ids)
+    assert collaborators
+
+
+def test_workspace_get_memberships(measure, account_storage: AccountStorage,
+                                   dataset: Dataset):
+    workspace_ids = dataset.workspace_ids[:100]
+    measure(lambda user_id: account_storage.workspace.get_memberships(
+        user_id, workspace_ids), dataset.busy_user_ids)
+
+
+###############################################################################
+# Registration
+###############################################################################
+def test_registration_get_principal(measure,
+                                    account_storage: AccountStorage,
+                                    dataset: Dataset):
+    principal = measure(
+        account_storage.registration.get_principal, dataset.user_ids)
+    assert principal is not None
+
+
+def test_registration_get_by_username(measure,
+                                      account_storage: AccountStorage,
+                                      dataset: Dataset):
+    user = measure(
+        account_storage.registration.get_by_username, dataset.usernames)
+    assert user is not None
+
+
+def test_registration_has_by_username(measure,
+                                      account_storage: AccountStorage,
+                                      dataset: Dataset):
+    assert measure(
+        account_storage.registration.has_by_username, dataset.usernames)
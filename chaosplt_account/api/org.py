@@ -10,12 +10,13 @@ from flask import abort, jsonify
 from marshmallow import ValidationError
 import simplejson as json
 
+from chaosplt_account.cache import invalidate
 from chaosplt_account.model import User
 from chaosplt_account.schemas import new_org_schema, org_schema, \
-    link_workspace_schema, org_schema_short, orgs_schema_tiny, \
+    link_workspace_schema, org_schema_short, orgs_page_schema, \
     workspaces_schema, org_members_schema, org_member_schema, \
     org_name_schema, org_settings_schema, experiments_schema, \
-    schedules_schema
+    schedules_schema, paging_query_schema
 from chaosplt_account.service import Services
 from chaosplt_account.storage.model.org import OrgType, DEFAULT_ORG_SETTINGS
 
@@ -26,9 +27,26 @@ __all__ = ["list_all_orgs", "create_org", "get_org", "delete_org",
            "get_schedulings"]
 
 
-def list_all_orgs(services: Services, authed_user: User):
-    orgs = services.account.org.list_all()
-    return orgs_schema_tiny.jsonify(orgs)
+def list_all_orgs(services: Services, authed_user: User,
+                  params: Dict[str, Any] = None):
+    try:
+        params = paging_query_schema.load(params or {})
+        page = services.account.org.list_all(
+            cursor=params["cursor"], limit=params["limit"])
+    except ValidationError as err:
+        return jsonify(err.messages), 422
+    except ValueError:
+        return jsonify({
+            "cursor": ["Invalid cursor"]
+        }), 422
+
+    return orgs_page_schema.jsonify({
+        "orgs": page.items,
+        "paging": {
+            "cursor": page.cursor,
+            "limit": params["limit"]
+        }
+    })
 
 
 def create_org(services: Services, authed_user: User, payload: Dict[str, Any]):
@@ -47,6 +65,7 @@ def create_org(services: Services, authed_user: User, payload: Dict[str, Any]):
 
     user_id = authed_user.id
     org = services.account.org.create(org_name, user_id)
+    invalidate("orgs", "user:{}".format(user_id))
     services.activity.event.record(
         authenticated_user_id=user_id, user_id=user_id,
         org_id=org.id, event_type="organization", phase="create")
@@ -61,8 +80,10 @@ def get_org(services: Services, authed_user: User, org_id: UUID):
     if authed_user.is_authenticated:
         user_id = authed_user.id
         org.owner = services.account.org.is_owner(org.id, user_id)
+        memberships = services.account.workspace.get_memberships(
+            user_id, [w.id for w in org.workspaces])
         for w in org.workspaces:
-            w.owner = services.account.workspace.is_owner(w.id, user_id)
+            w.owner = memberships.get(w.id, False)
 
     return org_schema_short.jsonify(org)
 
@@ -82,6 +103,9 @@ def delete_org(services: Services, authed_user: User, org_id: UUID):
             }), 422
 
         services.account.org.delete(org_id)
+        invalidate(
+            "org:{}".format(org_id), "orgs", "workspaces",
+            *["workspace:{}".format(w.id) for w in org.workspaces])
         services.activity.event.record(
             authenticated_user_id=user_id, user_id=user_id,
             org_id=org.id, event_type="organization", phase="delete")
@@ -112,6 +136,9 @@ def link_workspace_to_org(services: Services, authed_user: User, org_id: UUID,
 
     services.account.org.add_workspace(
         org_id, workspace_id, owner=payload["owner"])
+    invalidate(
+        "org:{}".format(org_id), "orgs", "workspace:{}".format(workspace_id),
+        "workspaces")
 
     user_id = authed_user.id
     services.activity.event.record(
@@ -131,6 +158,9 @@ def unlink_workspace_from_org(services: Services, authed_user: User,
         return abort(404)
 
     services.account.org.remove_org(org_id, workspace_id)
+    invalidate(
+        "org:{}".format(org_id), "orgs", "workspace:{}".format(workspace_id),
+        "workspaces")
     user_id = authed_user.id
     services.activity.event.record(
         authenticated_user_id=user_id, user_id=user_id,
@@ -158,8 +188,10 @@ def lookup_org(services: Services, authed_user: User, org_name: str,
             return abort(404)
 
     if authed_user.is_authenticated:
+        memberships = services.account.workspace.get_memberships(
+            authed_user.id, [w.id for w in org.workspaces])
         for w in org.workspaces:
-            w.owner = services.account.workspace.is_owner(w.id, authed_user.id)
+            w.owner = memberships.get(w.id, False)
 
     return org_schema.jsonify(org)
 
@@ -194,6 +226,7 @@ def add_member(services: Services, authed_user: User, org_id: UUID,
         return abort(404)
 
     member = services.account.org.add_member(org.id, user_id)
+    invalidate("org:{}".format(org.id), "orgs", "user:{}".format(user_id))
     if not member:
         return abort(404)
     return org_member_schema.jsonify(member)
@@ -224,6 +257,7 @@ def set_org_name(services: Services, authed_user, org_id: UUID,
 
     org.name = new_name
     services.account.org.save(org)
+    invalidate("org:{}".format(org.id), "orgs", "workspaces")
 
     user_id = authed_user.id
     services.activity.event.record(
@@ -257,6 +291,7 @@ def set_org_infos(services: Services, authed_user, org_id: UUID,
     org.settings["logo"] = payload.get("logo")
     org.settings["description"] = payload.get("description")
     services.account.org.save(org)
+    invalidate("org:{}".format(org.id), "orgs")
 
     user_id = authed_user.id
     services.activity.event.record(
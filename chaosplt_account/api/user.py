@@ -5,6 +5,7 @@ from uuid import UUID
 from flask import abort, jsonify
 from marshmallow import ValidationError
 
+from chaosplt_account.cache import invalidate
 from chaosplt_account.model import Experiment, User
 from chaosplt_account.schemas import new_user_schema, user_schema, \
     link_org_schema, link_workspace_schema, my_orgs_schema, \
@@ -52,6 +53,11 @@ def delete_user(services: Services, authed_user: User, user_id: UUID):
         return "", 204
 
     services.account.user.delete(user_id)
+    # the user no longer appears in any of the members or collaborators lists
+    scopes = ["user:{}".format(user_id), "orgs", "workspaces"]
+    scopes.extend("org:{}".format(o.id) for o in user.orgs or [])
+    scopes.extend("workspace:{}".format(w.id) for w in user.workspaces or [])
+    invalidate(*scopes)
     services.activity.event.record(
         authenticated_user_id=authed_user.id, user_id=user_id,
         event_type="user", phase="delete")
@@ -104,6 +110,7 @@ def link_org_to_user(services: Services, authed_user: User, user_id: UUID,
 
     services.account.user.add_org(
         user_id, org_id, owner=payload["owner"])
+    invalidate("user:{}".format(user_id), "org:{}".format(org_id), "orgs")
     services.activity.event.record(
         authenticated_user_id=authed_user.id, user_id=user_id,
         org_id=org_id, event_type="user", phase="link-organization")
@@ -125,6 +132,7 @@ def unlink_org_from_user(services: Services, authed_user: User, user_id: UUID,
         }), 422
 
     services.account.user.remove_org(user_id, org_id)
+    invalidate("user:{}".format(user_id), "org:{}".format(org_id), "orgs")
     services.activity.event.record(
         authenticated_user_id=authed_user.id, user_id=user_id,
         org_id=org_id, event_type="user", phase="unlink-organization")
@@ -153,6 +161,9 @@ def link_workspace_to_user(services: Services, authed_user: User,
 
     services.account.user.add_workspace(
         user_id, workspace_id, owner=payload["owner"])
+    invalidate(
+        "user:{}".format(user_id), "workspace:{}".format(workspace_id),
+        "workspaces", "org:{}".format(workspace.org_id), "orgs")
     services.activity.event.record(
         authenticated_user_id=authed_user.id, user_id=user_id,
         org_id=workspace.org_id, event_type="user",
@@ -175,6 +186,9 @@ def unlink_workspace_from_user(services: Services, authed_user: User,
         }), 422
 
     services.account.user.remove_workspace(user_id, workspace_id)
+    invalidate(
+        "user:{}".format(user_id), "workspace:{}".format(workspace_id),
+        "workspaces", "org:{}".format(workspace.org_id), "orgs")
     services.activity.event.record(
         authenticated_user_id=authed_user.id, user_id=user_id,
         org_id=workspace.org_id, event_type="user",
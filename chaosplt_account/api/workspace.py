@@ -5,11 +5,12 @@ from uuid import UUID
 from flask import abort, jsonify
 from marshmallow import ValidationError
 
+from chaosplt_account.cache import invalidate
 from chaosplt_account.model import User
 from chaosplt_account.schemas import new_workspace_schema, workspace_schema, \
-    workspaces_schema_tiny, workspace_schema_short, \
+    workspaces_page_schema, workspace_schema_short, \
     experiments_schema, workspace_collaborators_schema, \
-    workspace_collaborator_schema, experiment_schema
+    workspace_collaborator_schema, experiment_schema, paging_query_schema
 from chaosplt_account.service import Services
 
 __all__ = ["list_all_workspaces", "create_workspace", "get_workspace",
@@ -18,9 +19,26 @@ __all__ = ["list_all_workspaces", "create_workspace", "get_workspace",
            "lookup_workspace_by_name"]
 
 
-def list_all_workspaces(services: Services, authed_user: User):
-    workspaces = services.account.workspace.list_all()
-    return workspaces_schema_tiny.jsonify(workspaces)
+def list_all_workspaces(services: Services, authed_user: User,
+                        params: Dict[str, Any] = None):
+    try:
+        params = paging_query_schema.load(params or {})
+        page = services.account.workspace.list_all(
+            cursor=params["cursor"], limit=params["limit"])
+    except ValidationError as err:
+        return jsonify(err.messages), 422
+    except ValueError:
+        return jsonify({
+            "cursor": ["Invalid cursor"]
+        }), 422
+
+    return workspaces_page_schema.jsonify({
+        "workspaces": page.items,
+        "paging": {
+            "cursor": page.cursor,
+            "limit": params["limit"]
+        }
+    })
 
 
 def create_workspace(services: Services, authed_user: User,
@@ -54,6 +72,9 @@ def create_workspace(services: Services, authed_user: User,
     workspace = workspace_svc.create(
         workspace_name, org_id, user_id, workspace_visibility,
         workspace_type=workspace_type)
+    invalidate(
+        "workspaces", "org:{}".format(org_id), "orgs",
+        "user:{}".format(user_id))
     services.activity.event.record(
         authenticated_user_id=user_id, user_id=user_id,
         org_id=workspace.org_id, event_type="workspace", phase="create",
@@ -74,6 +95,9 @@ def delete_workspace(services: Services, authed_user: User,
     if workspace:
         user_id = authed_user.id
         services.account.workspace.delete(workspace_id)
+        invalidate(
+            "workspace:{}".format(workspace_id), "workspaces",
+            "org:{}".format(workspace.org_id), "orgs")
         services.activity.event.record(
             authenticated_user_id=user_id, user_id=user_id,
             org_id=workspace.org_id, event_type="workspace", phase="delete",
@@ -7,9 +7,15 @@ from flask_login import LoginManager
 from flask_jwt_extended import JWTManager, verify_jwt_in_request, \
     current_user as api_user
 
-from .model import anonymous_user, User
+from .cache import cached_value
+from .model import anonymous_user, Principal
 
-__all__ = ["setup_jwt", "setup_login"]
+__all__ = ["setup_jwt", "setup_login", "load_principal",
+           "PRINCIPAL_CACHE_TIMEOUT"]
+
+# seconds during which a principal is served from the cache, deleting the
+# user, over HTTP or gRPC, evicts it as soon as the deletion committed
+PRINCIPAL_CACHE_TIMEOUT = 60
 
 
 def setup_jwt(app: Flask) -> JWTManager:
@@ -22,8 +28,8 @@ def setup_jwt(app: Flask) -> JWTManager:
         }
 
     @jwt.user_loader_callback_loader
-    def user_loader(identity: Union[UUID, str]) -> User:
-        return request.storage.registration.get(identity)
+    def user_loader(identity: Union[UUID, str]) -> Principal:
+        return load_principal(identity)
 
     return jwt
 
@@ -36,8 +42,8 @@ def setup_login(app: Flask, from_session: bool = False,
 
     if from_session:
         @login_manager.user_loader
-        def load_user_from_session(user_id: Union[UUID, str]) -> User:
-            user = request.storage.registration.get(user_id)
+        def load_user_from_session(user_id: Union[UUID, str]) -> Principal:
+            user = load_principal(user_id)
             if not user:
                 request._session_user_is_anonymous = True
                 user = anonymous_user
@@ -50,3 +56,22 @@ def setup_login(app: Flask, from_session: bool = False,
             return api_user
 
     return login_manager
+
+
+def load_principal(user_id: Union[UUID, str]) -> Principal:
+    """
+    Load the principal of the authenticated user, going through the cache
+    attached to the request when there is one.
+    """
+    storage = request.storage
+
+    def load() -> Principal:
+        return storage.registration.get_principal(user_id)
+
+    cache = getattr(request, "cache", None)
+    if cache is None:
+        return load()
+
+    return cached_value(
+        cache, "principal:{}".format(user_id), load,
+        "user:{}".format(user_id), timeout=PRINCIPAL_CACHE_TIMEOUT)
@@ -1,11 +1,193 @@
-from flask import Flask
+from functools import wraps
+import hashlib
+from typing import Any, Callable, List
+import uuid
+from weakref import WeakSet
+
+from flask import current_app, Flask, has_request_context, request, \
+    Response
 from flask_caching import Cache
+from flask_login import current_user
+
+from .metrics import observe_cache
 
-__all__ = ["setup_cache"]
+__all__ = ["setup_cache", "cached_response", "cached_value", "invalidate",
+           "defer_invalidations", "apply_invalidations"]
+
+# every cache created by `setup_cache`, so that a mutation can invalidate the
+# responses cached by both the web and the api applications
+_caches = WeakSet()
 
 
 def setup_cache(app: Flask) -> Cache:
     """
     Initialize the application's cache.
     """
-    return Cache(app, config=app.config)
+    cache = Cache(app, config=app.config)
+    _caches.add(cache)
+    return cache
+
+
+def cached_response(*scopes: str, per_user: bool = False,
+                    timeout: int = None) -> Callable:
+    """
+    Cache the successful responses of the decorated view.
+
+    The `scopes` are formatted with the view's arguments, for instance
+    `"org:{org_id}"`, and tie the cached response to the entities it was
+    built from. Calling `invalidate` with any of these scopes discards it.
+
+    Set `per_user` when the response depends on the authenticated user so
+    that each user gets their own entry.
+
+    The cache is the one attached to the request by the blueprint, when
+    there is none the view is always called.
+    """
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            cache = getattr(request, "cache", None)
+            if cache is None:
+                return f(*args, **kwargs)
+
+            backend = get_backend(cache)
+            key = make_response_key(
+                backend, [s.format(**kwargs) for s in scopes], per_user)
+
+            cached = backend.get(key)
+            observe_cache("response", cached is not None)
+            if cached is not None:
+                data, content_type = cached
+                return Response(data, status=200, content_type=content_type)
+
+            response = as_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                backend.set(
+                    key, (response.get_data(), response.content_type),
+                    timeout=timeout)
+            return response
+        return wrapped
+    return decorator
+
+
+def cached_value(cache: Cache, name: str, load: Callable[[], Any],
+                 *scopes: str, timeout: int = None) -> Any:
+    """
+    Return the value cached under `name`, calling `load` to fetch and cache
+    it when missing. Like responses, the value is discarded as soon as any of
+    the `scopes` is invalidated. A `None` value is never cached.
+    """
+    backend = get_backend(cache)
+    if backend is None:
+        return load()
+
+    key = "account:value:{}:{}".format(
+        name, ":".join(str(v) for v in get_versions(backend, list(scopes))))
+    value = backend.get(key)
+    observe_cache("value", value is not None)
+    if value is None:
+        value = load()
+        if value is not None:
+            backend.set(key, value, timeout=timeout)
+    return value
+
+
+def invalidate(*scopes: str):
+    """
+    Discard all the responses cached for any of the given scopes.
+
+    While serving a request which deferred its invalidations, the scopes are
+    only invalidated by `apply_invalidations`, once its changes committed.
+    Otherwise, a concurrent read could cache the rows as they were before
+    the commit under the new versions of the scopes.
+    """
+    if has_request_context():
+        pending = getattr(request, "pending_invalidations", None)
+        if pending is not None:
+            pending.extend(scopes)
+            return
+
+    for cache in list(_caches):
+        backend = get_backend(cache)
+        if backend is None:
+            continue
+        for scope in scopes:
+            backend.set(scope_key(scope), new_version(), timeout=0)
+
+
+def defer_invalidations():
+    """
+    Hold the scopes invalidated while serving the current request until
+    `apply_invalidations` is called.
+    """
+    request.pending_invalidations = []
+
+
+def apply_invalidations(committed: bool = True):
+    """
+    Invalidate the scopes held for the current request, once its changes
+    committed. They are dropped when its changes were rolled back instead.
+    """
+    pending = getattr(request, "pending_invalidations", None)
+    request.pending_invalidations = None
+    if pending and committed:
+        invalidate(*dict.fromkeys(pending))
+
+
+###############################################################################
+# Internals
+###############################################################################
+def get_backend(cache: Cache):
+    """
+    Return the backend of the cache without relying on the current
+    application, which may be a different one when invalidating.
+    """
+    if cache.app is None:
+        return None
+    return cache.app.extensions.get("cache", {}).get(cache)
+
+
+def scope_key(scope: str) -> str:
+    return "account:scope:{}".format(scope)
+
+
+def new_version() -> str:
+    return uuid.uuid4().hex
+
+
+def get_versions(backend, scopes: List[str]) -> List[str]:
+    """
+    Return the current version of each scope. Invalidating a scope gives it a
+    new version, which orphans all the entries built with the previous one.
+    """
+    keys = [scope_key(s) for s in scopes]
+    versions = list(backend.get_many(*keys)) if keys else []
+    for i, version in enumerate(versions):
+        if version is None:
+            # another process may have created it meanwhile, let it win
+            backend.add(keys[i], new_version(), timeout=0)
+            versions[i] = backend.get(keys[i])
+    return versions
+
+
+def make_response_key(backend, scopes: List[str], per_user: bool) -> str:
+    user_id = None
+    if per_user and current_user.is_authenticated:
+        user_id = current_user.id
+
+    parts = [
+        request.endpoint, request.script_root, request.full_path,
+        str(user_id)
+    ] + get_versions(backend, scopes)
+    digest = hashlib.sha1(
+        "|".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+    return "account:response:{}".format(digest)
+
+
+def as_response(rv) -> Response:
+    """
+    Turn whatever the view returned into a response object.
+    """
+    if isinstance(rv, Response):
+        return rv
+    return current_app.make_response(rv)
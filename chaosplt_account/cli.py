@@ -1,9 +1,13 @@
 import click
+from sqlalchemy import create_engine
 
 from . import __version__
 from .log import configure_logger
 from .server import run_forever
 from .settings import load_settings
+from .storage import ensure_indexes, migrate_uuids
+from .storage.passwords import SCHEMES, calibrate_rounds
+from .workers import bind_listener, check_workers, run_workers
 
 
 @click.group()
@@ -19,10 +23,113 @@ def cli():
 @click.option('--logger-config',
               type=click.Path(exists=False, readable=True, resolve_path=True),
               help='Python logger JSON definition.')
-def run(config: str = None, logger_config: str = None):
+@click.option('--workers', type=click.IntRange(min=1), default=1,
+              show_default=True,
+              help='Number of processes serving the requests.')
+@click.option('--graceful-timeout', type=float, default=30.0,
+              show_default=True,
+              help='Seconds given to the workers to drain when stopping.')
+def run(config: str = None, logger_config: str = None, workers: int = 1,
+        graceful_timeout: float = 30.0):
     """
     Runs the application.
     """
     config = load_settings(config)
+    if workers == 1:
+        configure_logger(logger_config, config)
+        run_forever(config)
+        return
+
+    try:
+        check_workers(config)
+    except RuntimeError as x:
+        raise click.ClickException(str(x))
+
+    # bound before the log files are opened, see `bind_listener`
+    listener = bind_listener(config)
     configure_logger(logger_config, config)
-    run_forever(config)
+    run_workers(config, workers, listener, graceful_timeout)
+
+
+@cli.command("ensure-indexes")
+@click.option('--config',
+              type=click.Path(exists=True, readable=True, resolve_path=True),
+              help='Configuration TOML file.')
+@click.option('--dry-run', is_flag=True,
+              help='Only list the missing indexes.')
+@click.option('--lock-tables', is_flag=True,
+              help='Lock the tables while indexing, on PostgreSQL.')
+def ensure_indexes_cmd(config: str = None, dry_run: bool = False,
+                       lock_tables: bool = False):
+    """
+    Creates the indexes declared by the models which the database lacks.
+    """
+    config = load_settings(config)
+    engine = create_engine(config["db"]["uri"])
+    try:
+        indexes = ensure_indexes(
+            engine, concurrently=not lock_tables, dry_run=dry_run)
+    finally:
+        engine.dispose()
+
+    verb = "Missing" if dry_run else "Created"
+    for index in indexes:
+        click.echo("{} index {} on {}".format(
+            verb, index.name, index.table.name))
+    if not indexes:
+        click.echo("No index is missing")
+
+
+@cli.command("migrate-uuids")
+@click.option('--config',
+              type=click.Path(exists=True, readable=True, resolve_path=True),
+              help='Configuration TOML file.')
+@click.option('--to', 'storage', type=click.Choice(["binary", "char"]),
+              default="binary", show_default=True,
+              help='Storage to convert the UUIDs to.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=1000,
+              show_default=True, help='Rows converted per transaction.')
+@click.option('--pause', type=float, default=0.0, show_default=True,
+              help='Seconds to wait between two batches.')
+def migrate_uuids_cmd(config: str = None, storage: str = "binary",
+                      batch_size: int = 1000, pause: float = 0.0):
+    """
+    Converts the UUIDs stored by the database, by batches.
+    """
+    config = load_settings(config)
+    engine = create_engine(config["db"]["uri"])
+    try:
+        converted = migrate_uuids(
+            engine, storage, batch_size=batch_size, pause=pause,
+            progress=lambda table, count: click.echo(
+                "{}: {} rows converted".format(table, count)))
+    finally:
+        engine.dispose()
+
+    click.echo("Converted {} rows to {} UUIDs, set `uuid_storage = \"{}\"` "
+               "in the [db] section".format(
+                   sum(converted.values()), storage, storage))
+
+
+@cli.command("calibrate-passwords")
+@click.option('--scheme', type=click.Choice(SCHEMES),
+              default="pbkdf2_sha512", show_default=True,
+              help='Scheme to hash the passwords with.')
+@click.option('--target-ms', type=click.IntRange(min=1), default=250,
+              show_default=True,
+              help='Milliseconds a single password should take to hash.')
+@click.option('--samples', type=click.IntRange(min=1), default=5,
+              show_default=True, help='Passwords hashed per measure.')
+def calibrate_passwords_cmd(scheme: str = "pbkdf2_sha512",
+                            target_ms: int = 250, samples: int = 5):
+    """
+    Finds the cost of the scheme for a password to take the target time to
+    hash on this machine.
+    """
+    rounds, duration = calibrate_rounds(
+        scheme, target_ms / 1000.0, samples=samples)
+    click.echo("{} rounds of {} hash a password in {:.0f}ms, about {:.1f} "
+               "sign ins per second and per worker".format(
+                   rounds, scheme, duration * 1000, 1.0 / duration))
+    click.echo("Set `scheme = \"{}\"` and `rounds = {}` in the [passwords] "
+               "section".format(scheme, rounds))
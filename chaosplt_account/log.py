@@ -1,17 +1,33 @@
+from datetime import datetime, timezone
 import json
 import logging
 import logging.config
-from logging import StreamHandler
+from logging import Handler, LogRecord, StreamHandler
+from logging.handlers import BaseRotatingHandler, QueueHandler, \
+    QueueListener, WatchedFileHandler
 import pkgutil
-from typing import Any, Dict
+from queue import Empty, Full, Queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Tuple
 
+import attr
 from flask import Flask
-from requestlogger import ApacheFormatter, WSGILogger
 
-__all__ = ["configure_logger", "http_requests_logger"]
+from .metrics import observe_access_log_drop
+
+__all__ = ["configure_logger", "http_requests_logger", "shutdown_access_logs",
+           "AccessLogSettings", "AccessLogger", "ApacheAccessFormatter",
+           "JSONAccessFormatter"]
 
 logger = logging.getLogger("chaosplatform")
 
+_lock = threading.Lock()
+# one listener, and its thread, per handler actually writing the lines and
+# format of these lines
+_listeners: Dict[Tuple[Handler, str], 'AccessLogListener'] = {}
+
 
 def configure_logger(log_conf_path: str, config: Dict[str, Any]):
     if log_conf_path:
@@ -27,9 +43,317 @@ def configure_logger(log_conf_path: str, config: Dict[str, Any]):
     logger.debug("Logger configured")
 
 
-def http_requests_logger(app: Flask,
-                         stream_handler: StreamHandler = None) -> WSGILogger:
-    if not stream_handler:
-        stream_handler = StreamHandler()
-    return WSGILogger(
-        app.wsgi_app, [stream_handler], ApacheFormatter(), propagate=False)
+@attr.s
+class AccessLogSettings:
+    # write the lines from a background thread rather than from the thread
+    # serving the request
+    async_: bool = attr.ib(default=False)
+    format: str = attr.ib(default="apache")
+    # fraction of the successful requests which are logged, the others are
+    # always logged
+    sample_2xx: float = attr.ib(default=1.0)
+    queue_size: int = attr.ib(default=10000)
+    batch_size: int = attr.ib(default=100)
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> 'AccessLogSettings':
+        settings = config.get("http", {}).get("access_log", {})
+        log_format = settings.get("format", "apache")
+        if log_format not in FORMATTERS:
+            raise ValueError(
+                "Access log format must be one of: {}".format(
+                    ", ".join(FORMATTERS)))
+
+        return AccessLogSettings(
+            async_=settings.get("async", False),
+            format=log_format,
+            sample_2xx=min(1.0, max(0.0, settings.get("sample_2xx", 1.0))),
+            queue_size=settings.get("queue_size", 10000),
+            batch_size=settings.get("batch_size", 100)
+        )
+
+
+def http_requests_logger(app: Flask, stream_handler: Handler = None,
+                         config: Dict[str, Any] = None) -> 'AccessLogger':
+    """
+    Wrap the WSGI application of `app` so that a line is written to
+    `stream_handler`, or to the standard error by default, for each request.
+
+    The line is formatted and written from a background thread when the
+    `[chaosplatform.http.access_log]` section of `config` says so. The
+    handler gets the line as the message of the record, its own formatter
+    is left as it is.
+    """
+    settings = AccessLogSettings.from_config(config or {})
+    target = stream_handler or StreamHandler()
+
+    if settings.async_:
+        handler = start_listener(target, settings)
+    else:
+        handler = AccessLogHandler(target, FORMATTERS[settings.format]())
+    return AccessLogger(app.wsgi_app, handler, settings.sample_2xx)
+
+
+def shutdown_access_logs(timeout: float = 10.0):
+    """
+    Write the lines still waiting in the queues then stop their background
+    threads.
+    """
+    with _lock:
+        listeners = list(_listeners.values())
+        _listeners.clear()
+
+    for listener in listeners:
+        listener.stop(timeout)
+
+
+class AccessLogger:
+    """
+    WSGI middleware handing a record of each request over to `handler`.
+
+    Only the fields of the line are collected while serving the request,
+    formatting them is left to the handler.
+    """
+    def __init__(self, application: Callable, handler: Handler,
+                 sample_2xx: float = 1.0):
+        self.application = application
+        self.handler = handler
+        self.sample_2xx = sample_2xx
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable):
+        started = time.perf_counter()
+        status_codes = []
+        content_lengths = []
+
+        def custom_start_response(status, response_headers, exc_info=None):
+            status_codes.append(int(status.partition(' ')[0]))
+            for name, value in response_headers:
+                if name.lower() == 'content-length':
+                    content_lengths.append(int(value))
+                    break
+            return start_response(status, response_headers, exc_info)
+
+        retval = self.application(environ, custom_start_response)
+        duration = time.perf_counter() - started
+        status = status_codes[0] if status_codes else 0
+        if self.sampled(status):
+            self.handler.handle(access_record(
+                environ, status,
+                content_lengths[0] if content_lengths else None, duration))
+        return retval
+
+    def sampled(self, status: int) -> bool:
+        if self.sample_2xx >= 1.0 or not 200 <= status < 300:
+            return True
+        return random.random() < self.sample_2xx
+
+
+class ApacheAccessFormatter(logging.Formatter):
+    """
+    The Apache combined log format followed by the response time, as
+    `seconds/microseconds`.
+    """
+    def format(self, record: LogRecord) -> str:
+        fields = record.access
+        date = datetime.fromtimestamp(record.created, timezone.utc)
+        duration_us = int(fields["duration"] * 10**6)
+        return '{} - - [{}] "{} {} {}" {} {} "{}" "{}" {}/{}'.format(
+            fields["host"], date.strftime("%d/%b/%Y:%H:%M:%S %z"),
+            fields["method"], fields["path"], fields["protocol"],
+            fields["status"],
+            "-" if fields["size"] is None else fields["size"],
+            fields["referer"], fields["agent"],
+            duration_us // 10**6, duration_us % 10**6)
+
+
+class JSONAccessFormatter(logging.Formatter):
+    """
+    One JSON object per line, the duration is given in milliseconds.
+    """
+    def format(self, record: LogRecord) -> str:
+        fields = dict(record.access)
+        fields["duration_ms"] = round(fields.pop("duration") * 1000, 3)
+        fields["time"] = datetime.fromtimestamp(
+            record.created, timezone.utc).isoformat()
+        return json.dumps(fields, sort_keys=True)
+
+
+FORMATTERS = {
+    "apache": ApacheAccessFormatter,
+    "json": JSONAccessFormatter
+}
+
+
+###############################################################################
+# Internals
+###############################################################################
+def access_record(environ: Dict[str, Any], status: int, size: int,
+                  duration: float) -> LogRecord:
+    record = logging.LogRecord(
+        "chaosplatform.access", logging.INFO, "", 0, "%s %s %s",
+        (environ.get("REQUEST_METHOD", ""), environ.get("PATH_INFO", ""),
+         status), None)
+    record.access = {
+        "host": environ.get("REMOTE_ADDR", ""),
+        "method": environ.get("REQUEST_METHOD", ""),
+        "path": environ.get("PATH_INFO", ""),
+        "query": environ.get("QUERY_STRING", ""),
+        "protocol": environ.get("SERVER_PROTOCOL", ""),
+        "status": status,
+        "size": size,
+        "referer": environ.get("HTTP_REFERER", ""),
+        "agent": environ.get("HTTP_USER_AGENT", ""),
+        "duration": duration
+    }
+    return record
+
+
+def as_line(record: LogRecord, formatter: logging.Formatter) -> LogRecord:
+    """
+    Copy of `record` whose message is the line `formatter` makes of it.
+    """
+    line = logging.makeLogRecord(record.__dict__)
+    line.msg = formatter.format(record)
+    line.args = None
+    return line
+
+
+def start_listener(handler: Handler,
+                   settings: AccessLogSettings) -> 'AccessLogQueueHandler':
+    """
+    Return the queue handler feeding the background thread which writes to
+    `handler`, starting that thread unless already running.
+    """
+    key = (handler, settings.format)
+    with _lock:
+        listener = _listeners.get(key)
+        if not listener:
+            listener = AccessLogListener(
+                Queue(maxsize=settings.queue_size),
+                BatchingHandler(
+                    handler, settings.batch_size,
+                    FORMATTERS[settings.format]()))
+            listener.start()
+            _listeners[key] = listener
+        return AccessLogQueueHandler(listener.queue)
+
+
+class AccessLogQueueHandler(QueueHandler):
+    """
+    Queue the records as they are, they are formatted by the listener. When
+    the queue is full, the record is dropped rather than waiting.
+    """
+    def prepare(self, record: LogRecord) -> LogRecord:
+        return record
+
+    def enqueue(self, record: LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            observe_access_log_drop()
+
+
+class AccessLogListener(QueueListener):
+    """
+    Hand the queued records over to a `BatchingHandler`, which is flushed
+    whenever the queue is empty.
+    """
+    def dequeue(self, block: bool) -> LogRecord:
+        try:
+            return self.queue.get_nowait()
+        except Empty:
+            if not block:
+                raise
+        # caught up with the requests, write what was buffered so far
+        for handler in self.handlers:
+            handler.flush()
+        return self.queue.get()
+
+    def enqueue_sentinel(self):
+        # wait for room, the queue is being drained
+        self.queue.put(self._sentinel)
+
+    def stop(self, timeout: float = 10.0):
+        thread = self._thread
+        if thread is None:
+            return
+        self.enqueue_sentinel()
+        thread.join(timeout)
+        self._thread = None
+        for handler in self.handlers:
+            handler.flush()
+        if thread.is_alive():
+            logger.warning(
+                "The access log queue could not be drained, {} lines "
+                "lost".format(self.queue.qsize()))
+
+
+class AccessLogHandler(Handler):
+    """
+    Format the records with `formatter` and hand the lines over to `target`
+    as the message of their records.
+    """
+    def __init__(self, target: Handler, formatter: logging.Formatter):
+        Handler.__init__(self)
+        self.target = target
+        self.setFormatter(formatter)
+
+    def emit(self, record: LogRecord):
+        self.target.handle(as_line(record, self.formatter))
+
+
+class BatchingHandler(Handler):
+    """
+    Format the records and write them to the stream of `target` by batches
+    of `batch_size` lines. Handlers which do more than writing to a stream,
+    rotating files for instance, handle the records one at a time.
+
+    With a `formatter`, the records are first turned into lines by it, as
+    `AccessLogHandler` does.
+    """
+    def __init__(self, target: Handler, batch_size: int = 100,
+                 formatter: logging.Formatter = None):
+        Handler.__init__(self)
+        self.target = target
+        self.batch_size = max(1, batch_size)
+        self.buffer: List[LogRecord] = []
+        self.setFormatter(formatter)
+
+    def emit(self, record: LogRecord):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            records, self.buffer = self.buffer, []
+        finally:
+            self.release()
+        if not records:
+            return
+
+        if self.formatter is not None:
+            records = [as_line(r, self.formatter) for r in records]
+        target = self.target
+        if not self.batchable(target):
+            for record in records:
+                target.handle(record)
+            return
+
+        target.acquire()
+        try:
+            target.stream.write("".join(
+                target.format(record) + target.terminator
+                for record in records))
+            target.stream.flush()
+        except Exception:
+            target.handleError(records[-1])
+        finally:
+            target.release()
+
+    @staticmethod
+    def batchable(target: Handler) -> bool:
+        return isinstance(target, StreamHandler) and \
+            getattr(target, "stream", None) is not None and \
+            not isinstance(target, (BaseRotatingHandler, WatchedFileHandler))
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+from functools import wraps
+import glob
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+from weakref import WeakValueDictionary
+
+import grpc
+from prometheus_client import CollectorRegistry, Counter, Histogram, \
+    make_wsgi_app
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector, \
+    mark_process_dead
+
+__all__ = ["registry", "metrics_app", "multiprocess_dir",
+           "reset_multiprocess_metrics", "forget_process",
+           "observe_request", "observe_cache",
+           "observe_access_log_drop", "observe_password_hash",
+           "observe_password_rejected", "timed_handler",
+           "ClientMetricsInterceptor", "track_engine", "track_pipeline",
+           "track_spool", "track_channels", "track_http_server"]
+
+NAMESPACE = "chaosplatform_account"
+
+registry = CollectorRegistry(auto_describe=True)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent serving HTTP requests, per application and endpoint",
+    ["app", "endpoint", "method", "status"], namespace=NAMESPACE,
+    registry=registry)
+GRPC_CLIENT_DURATION = Histogram(
+    "grpc_client_duration_seconds",
+    "Time spent in outbound gRPC calls, per remote service and method",
+    ["service", "method", "code"], namespace=NAMESPACE, registry=registry)
+GRPC_SERVER_DURATION = Histogram(
+    "grpc_server_handler_duration_seconds",
+    "Time spent handling inbound gRPC calls, per service and method",
+    ["service", "method", "code"], namespace=NAMESPACE, registry=registry)
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "Lookups of cached responses and values, whether they were found",
+    ["kind", "result"], namespace=NAMESPACE, registry=registry)
+ACCESS_LOG_DROPPED = Counter(
+    "access_log_dropped",
+    "Access log lines dropped because the queue to the writer was full",
+    namespace=NAMESPACE, registry=registry)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or verifying a password, per operation",
+    ["operation"], namespace=NAMESPACE, registry=registry)
+PASSWORD_QUEUE_WAIT = Histogram(
+    "password_queue_wait_seconds",
+    "Time a password waited for a worker to hash or verify it",
+    ["operation"], namespace=NAMESPACE, registry=registry)
+PASSWORD_REJECTED = Counter(
+    "password_rejected",
+    "Passwords not hashed because too many were waiting for a worker",
+    namespace=NAMESPACE, registry=registry)
+
+_lock = threading.Lock()
+_engines = WeakValueDictionary()  # type: WeakValueDictionary
+_pipelines = WeakValueDictionary()  # type: WeakValueDictionary
+_spools = WeakValueDictionary()  # type: WeakValueDictionary
+_channels = WeakValueDictionary()  # type: WeakValueDictionary
+_http_servers = WeakValueDictionary()  # type: WeakValueDictionary
+
+
+def metrics_app() -> Callable:
+    """
+    WSGI application exposing the metrics in the Prometheus text format.
+
+    In multiprocess mode, see `multiprocess_dir`, the counters and histograms
+    are those of all the processes, read from their files, while the state of
+    the connection pools, queues and threads is the one of the process
+    serving the scrape.
+    """
+    if not multiprocess_dir():
+        return make_wsgi_app(registry)
+
+    aggregated = CollectorRegistry(auto_describe=True)
+    MultiProcessCollector(aggregated)
+    aggregated.register(ResourcesCollector())
+    return make_wsgi_app(aggregated)
+
+
+def multiprocess_dir() -> str:
+    """
+    Directory where each process writes its metrics, for any of them to
+    serve the metrics of all, when the `PROMETHEUS_MULTIPROC_DIR` environment
+    variable is set. It must be set before this module is imported.
+    """
+    return os.environ.get(
+        "PROMETHEUS_MULTIPROC_DIR", os.environ.get("prometheus_multiproc_dir"))
+
+
+def reset_multiprocess_metrics():
+    """
+    Remove the metrics written by the processes of a previous run, if any.
+    """
+    path = multiprocess_dir()
+    if not path:
+        return
+    for db in glob.glob(os.path.join(path, "*.db")):
+        os.remove(db)
+
+
+def forget_process(pid: int):
+    """
+    Stop reporting the live values of a process which exited, its counters
+    and histograms are still added up.
+    """
+    if multiprocess_dir():
+        mark_process_dead(pid)
+
+
+def observe_request(app: str, endpoint: str, method: str, status: int,
+                    started: float):
+    """
+    Record the latency of a request which started at `started`, as given by
+    `time.perf_counter()`.
+    """
+    HTTP_REQUEST_DURATION.labels(
+        app, endpoint or "unknown", method, str(status)).observe(
+            time.perf_counter() - started)
+
+
+def observe_cache(kind: str, hit: bool):
+    CACHE_REQUESTS.labels(kind, "hit" if hit else "miss").inc()
+
+
+def observe_access_log_drop():
+    ACCESS_LOG_DROPPED.inc()
+
+
+def observe_password_hash(operation: str, waited: float, duration: float):
+    PASSWORD_QUEUE_WAIT.labels(operation).observe(waited)
+    PASSWORD_HASH_DURATION.labels(operation).observe(duration)
+
+
+def observe_password_rejected():
+    PASSWORD_REJECTED.inc()
+
+
+def timed_handler(service: str, method: str) -> Callable:
+    """
+    Record the latency of the decorated gRPC handler. The call's code is
+    `UNKNOWN` when it raised.
+    """
+    def decorator(f: Callable) -> Callable:
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            started = time.perf_counter()
+            code = grpc.StatusCode.OK.name
+            try:
+                return f(*args, **kwargs)
+            except Exception:
+                code = grpc.StatusCode.UNKNOWN.name
+                raise
+            finally:
+                GRPC_SERVER_DURATION.labels(service, method, code).observe(
+                    time.perf_counter() - started)
+        return wrapped
+    return decorator
+
+
+class ClientMetricsInterceptor(grpc.UnaryUnaryClientInterceptor):
+    """
+    Record the latency of the unary calls made over the intercepted channel.
+    """
+    def intercept_unary_unary(self, continuation, client_call_details,
+                              request):
+        started = time.perf_counter()
+        service, method = split_method(client_call_details.method)
+        outcome = continuation(client_call_details, request)
+
+        def done(call):
+            code = call.code()
+            GRPC_CLIENT_DURATION.labels(
+                service, method, code.name if code else "UNKNOWN").observe(
+                    time.perf_counter() - started)
+
+        # also called, right away, once the call is complete
+        outcome.add_done_callback(done)
+        return outcome
+
+
+def track_engine(name: str, engine: Any):
+    """
+    Expose the usage of the connection pool of the given SQLAlchemy engine.
+    """
+    with _lock:
+        _engines[name] = engine
+
+
+def track_pipeline(name: str, pipeline: Any):
+    """
+    Expose the queue depth and counters of a `BatchPipeline`.
+    """
+    with _lock:
+        _pipelines[name] = pipeline
+
+
+def track_spool(name: str, spool: Any):
+    """
+    Expose the number of events waiting in an `EventSpool`.
+    """
+    with _lock:
+        _spools[name] = spool
+
+
+def track_channels(name: str, pool: Any):
+    """
+    Expose how often the channels of a `ChannelPool` are reused.
+    """
+    with _lock:
+        _channels[name] = pool
+
+
+def track_http_server(name: str, server: Any):
+    """
+    Expose the usage of the thread pool of a CherryPy server, once started.
+    """
+    with _lock:
+        _http_servers[name] = server
+
+
+###############################################################################
+# Internals
+###############################################################################
+def split_method(full_method: str) -> Tuple[str, str]:
+    """
+    Split a gRPC method such as `/package.Service/Method` into its service
+    and method names.
+    """
+    service, _, method = full_method.strip("/").rpartition("/")
+    return (service or "unknown", method)
+
+
+def tracked(resources: WeakValueDictionary) -> Dict[str, Any]:
+    with _lock:
+        return dict(resources.items())
+
+
+class ResourcesCollector:
+    """
+    Read the state of the tracked resources when the metrics are scraped.
+    """
+    def collect(self):
+        yield from self.collect_engines()
+        yield from self.collect_pipelines()
+        yield from self.collect_spools()
+        yield from self.collect_channels()
+        yield from self.collect_http_servers()
+
+    def collect_engines(self):
+        size = GaugeMetricFamily(
+            "{}_db_pool_size".format(NAMESPACE),
+            "Connections kept by the database pool", labels=["storage"])
+        checked_out = GaugeMetricFamily(
+            "{}_db_pool_checked_out".format(NAMESPACE),
+            "Connections of the database pool currently in use",
+            labels=["storage"])
+        overflow = GaugeMetricFamily(
+            "{}_db_pool_overflow".format(NAMESPACE),
+            "Connections opened beyond the size of the database pool",
+            labels=["storage"])
+        for name, engine in tracked(_engines).items():
+            pool = engine.pool
+            # pools such as SQLite's static one do not account connections
+            if not hasattr(pool, "checkedout"):
+                continue
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], pool.overflow())
+        yield size
+        yield checked_out
+        yield overflow
+
+    def collect_pipelines(self):
+        queued = GaugeMetricFamily(
+            "{}_queue_depth".format(NAMESPACE),
+            "Items waiting to be processed by a background worker",
+            labels=["queue"])
+        items = CounterMetricFamily(
+            "{}_queue_items".format(NAMESPACE),
+            "Items handed to a background worker, per outcome",
+            labels=["queue", "outcome"])
+        for name, pipeline in tracked(_pipelines).items():
+            stats = pipeline.stats()
+            queued.add_metric([name], stats.queued)
+            for outcome in ("submitted", "processed", "dropped", "failed"):
+                items.add_metric([name, outcome], getattr(stats, outcome))
+        yield queued
+        yield items
+
+    def collect_spools(self):
+        pending = GaugeMetricFamily(
+            "{}_spool_pending".format(NAMESPACE),
+            "Events waiting on disk to be sent", labels=["spool"])
+        size = GaugeMetricFamily(
+            "{}_spool_size_bytes".format(NAMESPACE),
+            "Size of the spool on disk", labels=["spool"])
+        for name, spool in tracked(_spools).items():
+            stats = spool.stats()
+            pending.add_metric([name], stats.pending)
+            size.add_metric([name], stats.size)
+        yield pending
+        yield size
+
+    def collect_channels(self):
+        channels = CounterMetricFamily(
+            "{}_grpc_channels".format(NAMESPACE),
+            "gRPC channels created or reused, per remote address",
+            labels=["address", "outcome"])
+        for pool in tracked(_channels).values():
+            for addr, stats in pool.stats().items():
+                channels.add_metric([addr, "created"], stats.created)
+                channels.add_metric([addr, "reused"], stats.reused)
+        yield channels
+
+    def collect_http_servers(self):
+        threads = GaugeMetricFamily(
+            "{}_http_threads".format(NAMESPACE),
+            "Threads of the HTTP server pool", labels=["server"])
+        idle = GaugeMetricFamily(
+            "{}_http_threads_idle".format(NAMESPACE),
+            "Threads of the HTTP server pool waiting for a request",
+            labels=["server"])
+        queued = GaugeMetricFamily(
+            "{}_http_requests_queued".format(NAMESPACE),
+            "Accepted connections waiting for a thread of the HTTP server",
+            labels=["server"])
+        for name, server in tracked(_http_servers).items():
+            pool = getattr(server.httpserver, "requests", None)
+            if pool is None:
+                continue
+            # cheroot does not expose the size of its pool
+            threads.add_metric([name], len(getattr(pool, "_threads", [])))
+            idle.add_metric([name], pool.idle)
+            queued.add_metric([name], pool.qsize)
+        yield threads
+        yield idle
+        yield queued
+
+
+registry.register(ResourcesCollector())
@@ -6,7 +6,7 @@ import attr
 
 __all__ = ["Organization", "User", "Workspace", "AccessToken",
            "OrganizationMember", "WorkspaceCollaborator", "anonymous_user",
-           "Experiment", "Execution", "Schedule"]
+           "Experiment", "Execution", "Schedule", "Page", "Principal"]
 
 
 @attr.s
@@ -91,6 +91,32 @@ class User:
                 return w
 
 
+@attr.s
+class Principal:
+    """
+    The authenticated user as seen by the authentication layer: only its
+    identifier, name and flags. Load the `User` when its orgs or workspaces
+    are needed.
+    """
+    id: UUID = attr.ib()
+    username: str = attr.ib()
+    is_authenticated: bool = attr.ib()
+    is_active: bool = attr.ib()
+    is_anonymous: bool = attr.ib()
+    is_local: bool = attr.ib(default=False)
+    is_closed: bool = attr.ib(default=False)
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+
+@attr.s
+class Page:
+    items: List[Any] = attr.ib()
+    # opaque cursor to pass back to fetch the next page, `None` on the last
+    cursor: str = attr.ib(default=None)
+
+
 anonymous_user = User(
     id=None, username=None, org_name=None, is_authenticated=False,
     is_active=False, is_anonymous=True
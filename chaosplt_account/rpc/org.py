@@ -5,6 +5,7 @@ from chaosplt_grpc.organization.message import Member, Organization
 from chaosplt_grpc.organization.server import \
     OrganizationRPC as GRPCOrganizationService
 
+from ..cache import invalidate
 from ..storage import AccountStorage
 
 __all__ = ["OrganizationRPC"]
@@ -18,6 +19,7 @@ class OrganizationRPC(GRPCOrganizationService):
 
     def create_organization(self, user_id: str, name: str) -> Organization:
         org = self.storage.org.create(name, user_id)
+        invalidate("orgs", "user:{}".format(user_id))
         logger.info("Organization {} is created".format(org.id))
 
         members = [
@@ -30,7 +32,12 @@ class OrganizationRPC(GRPCOrganizationService):
             members=members)
 
     def delete_organization(self, organization_id: str) -> NoReturn:
+        org = self.storage.org.get(organization_id)
         self.storage.org.delete(organization_id)
+        if org:
+            invalidate(
+                "org:{}".format(organization_id), "orgs", "workspaces",
+                *["workspace:{}".format(w.id) for w in org.workspaces])
         logger.info("Organization {} now deleted".format(organization_id))
 
     def get_organization(self, organization_id: str) -> Organization:
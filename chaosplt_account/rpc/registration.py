@@ -5,6 +5,8 @@ from chaosplt_grpc.registration.message import Registration
 from chaosplt_grpc.registration.server import \
     RegistrationService as GRPCRegistrationService
 
+from ..cache import invalidate
+from ..metrics import timed_handler
 from ..storage import AccountStorage
 
 __all__ = ["RegistrationRPC"]
@@ -16,6 +18,7 @@ class RegistrationRPC(GRPCRegistrationService):
         GRPCRegistrationService.__init__(self)
         self.storage = storage
 
+    @timed_handler("RegistrationService", "Create")
     def create_registration(self, username: str, name: str,
                             email: str) -> Registration:
         user = self.storage.registration.create(username, name, email)
@@ -30,10 +33,23 @@ class RegistrationRPC(GRPCRegistrationService):
             is_anonymous=False
         )
 
+    @timed_handler("RegistrationService", "Delete")
     def delete_registration(self, registration_id: str) -> NoReturn:
-        logger.info("User {} now deleted".format(registration_id))
+        user = self.storage.registration.get(registration_id)
         self.storage.registration.delete(registration_id)
+        logger.info("User {} now deleted".format(registration_id))
+        if not user:
+            return
+
+        # the user no longer appears in any of the members or collaborators
+        # lists and its principal must not authenticate it anymore
+        scopes = ["user:{}".format(registration_id), "orgs", "workspaces"]
+        scopes.extend("org:{}".format(o.id) for o in user.orgs or [])
+        scopes.extend(
+            "workspace:{}".format(w.id) for w in user.workspaces or [])
+        invalidate(*scopes)
 
+    @timed_handler("RegistrationService", "GetById")
     def get_by_id(self, registration_id: str) -> Registration:
         user = self.storage.registration.get(registration_id)
         if not user:
@@ -4,6 +4,7 @@ from typing import List, NoReturn
 from chaosplt_grpc.workspace.message import Collaborator, Workspace
 from chaosplt_grpc.workspace.server import WorkspaceRPC as GRPCWorkspaceService
 
+from ..cache import invalidate
 from ..storage import AccountStorage
 
 __all__ = ["WorkspaceRPC"]
@@ -18,6 +19,9 @@ class WorkspaceRPC(GRPCWorkspaceService):
     def create_workspace(self, user_id: str, org_id: str,
                          name: str) -> Workspace:
         workspace = self.storage.workspace.create(name, org_id, user_id, None)
+        invalidate(
+            "workspaces", "org:{}".format(org_id), "orgs",
+            "user:{}".format(user_id))
         logger.info("Workspace {} is created".format(workspace.id))
 
         collaborators = [
@@ -31,7 +35,12 @@ class WorkspaceRPC(GRPCWorkspaceService):
             collaborators=collaborators)
 
     def delete_workspace(self, workspace_id: str) -> NoReturn:
+        workspace = self.storage.workspace.get(workspace_id)
         self.storage.workspace.delete(workspace_id)
+        if workspace:
+            invalidate(
+                "workspace:{}".format(workspace_id), "workspaces",
+                "org:{}".format(workspace.org_id), "orgs")
         logger.info("Workspace {} now deleted".format(workspace_id))
 
     def get_workspace(self, workspace_id: str) -> Workspace:
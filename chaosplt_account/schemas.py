@@ -2,7 +2,7 @@ from typing import Any, Dict
 
 from flask import Flask
 from flask_marshmallow import Marshmallow
-from marshmallow import fields, post_load
+from marshmallow import EXCLUDE, fields, post_load, validate
 
 from .model import User
 
@@ -22,7 +22,8 @@ __all__ = ["org_schema", "user_schema", "workspace_schema", "new_user_schema",
            "profile_new_workspace_schema",
            "workspace_collaborators_schema", "current_user_schema",
            "schedules_schema", "experiment_schema",
-           "light_access_tokens_schema"]
+           "light_access_tokens_schema", "paging_query_schema",
+           "orgs_page_schema", "workspaces_page_schema"]
 
 ma = Marshmallow()
 
@@ -283,6 +284,31 @@ class NewAccessTokenSchema(ma.Schema):
 class PagingSchema(ma.Schema):
     prev_item = fields.Integer(default=1, data_key="prev")
     next_item = fields.Integer(default=1, data_key="next")
+    cursor = fields.String(allow_none=True)
+    limit = fields.Integer()
+
+
+class PagingQuerySchema(ma.Schema):
+    class Meta:
+        unknown = EXCLUDE
+    cursor = fields.String(missing=None)
+    limit = fields.Integer(
+        missing=100, validate=validate.Range(min=1, max=500))
+
+
+class OrganizationsPageSchema(ma.Schema):
+    class Meta:
+        ordered = True
+    orgs = fields.Nested(
+        OrganizationSchema, many=True, exclude=('owner', 'workspaces'))
+    paging = fields.Nested(PagingSchema, exclude=('prev_item', 'next_item'))
+
+
+class WorkspacesPageSchema(ma.Schema):
+    class Meta:
+        ordered = True
+    workspaces = fields.Nested(WorkspaceSchema, many=True, exclude=('owner',))
+    paging = fields.Nested(PagingSchema, exclude=('prev_item', 'next_item'))
 
 
 class ProfileWorkspaceSchema(ma.Schema):
@@ -473,3 +499,6 @@ org_member_schema = OrgMemberSchema()
 current_user_schema = CurrentUserSchema()
 schedules_schema = ScheduleSchema(many=True)
 light_access_tokens_schema = LightAccessTokenSchema(many=True)
+paging_query_schema = PagingQuerySchema()
+orgs_page_schema = OrganizationsPageSchema()
+workspaces_page_schema = WorkspacesPageSchema()
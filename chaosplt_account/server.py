@@ -7,15 +7,18 @@ from chaosplt_grpc import create_grpc_server, start_grpc_server, \
 from chaosplt_grpc.registration.server import \
     register_registration_service
 import cherrypy
+from cherrypy.process.plugins import Monitor
 from flask import Flask
 from flask_caching import Cache
 from grpc import Server
 
 from .cache import setup_cache
-from .log import http_requests_logger
+from .log import http_requests_logger, shutdown_access_logs
+from .metrics import metrics_app, track_http_server
 from .rpc.registration import RegistrationRPC
 from .service import initialize_services, shutdown_services, Services
-from .storage import AccountStorage, initialize_storage, shutdown_storage
+from .storage import AccountStorage, initialize_storage, \
+    shutdown_storage, warm_up_storage
 from .views.api import create_api, cleanup_api, serve_api
 from .views.web import create_app, cleanup_app, serve_app
 
@@ -46,6 +49,7 @@ def initialize_all(config: Dict[str, Any], web_app: Flask = None,
         services = Services()
 
     storage = initialize_storage(config)
+    warm_up_storage(storage, config)
     if embedded:
         services.account = storage
 
@@ -54,7 +58,7 @@ def initialize_all(config: Dict[str, Any], web_app: Flask = None,
     if not web_app:
         web_app = create_app(config)
         web_cache = setup_cache(web_app)
-        wsgiapp = http_requests_logger(web_app, access_log_handler)
+        wsgiapp = http_requests_logger(web_app, access_log_handler, config)
         cherrypy.tree.graft(wsgiapp, "/account")
     serve_app(
         web_app, web_cache, services, storage, config, web_mount_point,
@@ -63,12 +67,18 @@ def initialize_all(config: Dict[str, Any], web_app: Flask = None,
     if not api_app:
         api_app = create_api(config)
         api_cache = setup_cache(api_app)
-        wsgiapp = http_requests_logger(api_app, access_log_handler)
+        wsgiapp = http_requests_logger(api_app, access_log_handler, config)
         cherrypy.tree.graft(wsgiapp, "/api/v1")
     serve_api(
         api_app, api_cache, services, storage, config, api_mount_point,
         log_handler=access_log_handler)
 
+    # unauthenticated, so only served when asked for
+    metrics_config = config.get("metrics", {})
+    if metrics_config.get("enabled", False):
+        cherrypy.tree.graft(
+            metrics_app(), metrics_config.get("path", "/metrics"))
+
     grpc_server = initialize_grpc(config, storage, grpc_server)
 
     return (web_app, api_app, services, grpc_server, storage)
@@ -85,6 +95,7 @@ def release_all(web_app: Flask, api_app: Flask, services: Services,
     cleanup_api(api_app)
     shutdown_services(services)
     shutdown_storage(storage)
+    shutdown_access_logs()
 
 
 def run_forever(config: Dict[str, Any]):
@@ -103,6 +114,13 @@ def run_forever(config: Dict[str, Any]):
     cherrypy.engine.subscribe(
         'start', lambda: run_stuff(config), priority=80)
 
+    cherrypy_config = config["http"].get("cherrypy", {})
+    if cherrypy_config.get("adaptive_pool", False):
+        AdaptiveThreadPool(
+            cherrypy.engine, cherrypy.server,
+            cherrypy_config.get("adaptive_interval", 1.0)).subscribe()
+    track_http_server("http", cherrypy.server)
+
     if "tls" in config["http"]:
         cherrypy.server.ssl_module = 'builtin'
         cherrypy.server.ssl_certificate = config["http"]["tls"]["certificate"]
@@ -133,3 +151,39 @@ def initialize_grpc(config: Dict[str, Any], storage: AccountStorage,
     register_registration_service(RegistrationRPC(storage), grpc_server)
 
     return grpc_server
+
+
+class AdaptiveThreadPool(Monitor):
+    """
+    Grow the thread pool of the HTTP server, up to its maximum size, when
+    requests wait for a thread. Shrink it back, down to its initial size,
+    once threads have been idle for `idle_checks` checks in a row.
+    """
+    def __init__(self, bus, server: cherrypy._cpserver.Server,
+                 frequency: float = 1.0, idle_checks: int = 30):
+        Monitor.__init__(
+            self, bus, self.adapt, frequency, name="AdaptiveThreadPool")
+        self.server = server
+        self.idle_checks = idle_checks
+        self.quiet = 0
+
+    def adapt(self):
+        pool = getattr(self.server.httpserver, "requests", None)
+        if pool is None:
+            return
+
+        queued = pool.qsize
+        idle = pool.idle
+        if queued and not idle:
+            self.quiet = 0
+            logger.debug(
+                "{} requests waiting for a thread, growing the pool".format(
+                    queued))
+            pool.grow(queued)
+        elif idle and not queued:
+            self.quiet += 1
+            if self.quiet >= self.idle_checks:
+                self.quiet = 0
+                pool.shrink(max(1, idle // 2))
+        else:
+            self.quiet = 0
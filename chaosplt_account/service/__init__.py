@@ -2,8 +2,10 @@ from typing import Any, Dict, NoReturn
 
 import attr
 
+from ..metrics import track_channels
 from .activity import ActivityService
 from .auth import AuthService, AccessTokenService
+from .channel import ChannelPool, channel_options
 
 __all__ = ["initialize_services", "shutdown_services", "services", "Services"]
 
@@ -12,15 +14,26 @@ __all__ = ["initialize_services", "shutdown_services", "services", "Services"]
 class Services:
     auth: AuthService = attr.ib(default=None)
     activity: ActivityService = attr.ib(default=None)
+    channels: ChannelPool = attr.ib(default=None)
 
 
 def initialize_services(services: Services, config: Dict[str, Any]):
+    if not services.channels:
+        services.channels = ChannelPool(channel_options(config))
+    track_channels("services", services.channels)
+
     if not services.auth:
-        services.auth = AuthService(AccessTokenService(config))
+        services.auth = AuthService(
+            AccessTokenService(config, services.channels))
 
     if not services.activity:
-        services.activity = ActivityService(config)
+        services.activity = ActivityService(config, services.channels)
 
 
 def shutdown_services(services: Services) -> NoReturn:
-    pass
+    # drain the queued events while the channels are still open
+    if services.activity:
+        services.activity.release()
+
+    if services.channels:
+        services.channels.close_all()
@@ -1,25 +1,73 @@
 from datetime import datetime
-from typing import Any, Dict, Union
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
-from chaosplt_grpc import remote_channel
 from chaosplt_grpc.activity.client import record_activity
 from tzlocal import get_localzone
 
+from ..metrics import track_pipeline, track_spool
+from .channel import ChannelPool
+from .pipeline import BatchPipeline
+from .spool import EventSpool
+
 __all__ = ["ActivityService"]
+logger = logging.getLogger("chaosplatform")
 
 
 class ActivityService:
-    def __init__(self, config: Dict[str, Any]):
-        self.event = EventService(config)
+    def __init__(self, config: Dict[str, Any], channels: ChannelPool = None):
+        self.event = EventService(config, channels)
 
     def release(self):
-        pass
+        self.event.release()
 
 
 class EventService:
-    def __init__(self, config: Dict[str, Any]):
-        self.addr = config["grpc"]["activity"]["address"]
+    def __init__(self, config: Dict[str, Any], channels: ChannelPool = None):
+        activity_config = config["grpc"]["activity"]
+        self.addr = activity_config["address"]
+        self.channels = channels or ChannelPool()
+
+        # events which could not be sent wait in the spool, while the remote
+        # is considered down, for `retry_interval` seconds after a failure,
+        # they go straight to the spool
+        self.spool = None
+        self.retry_interval = activity_config.get("retry_interval", 5.0)
+        self._failed_at = None
+        self._failed_lock = threading.Lock()
+        # a single caller replays the spool at a time, or events would be
+        # sent twice
+        self._replay_lock = threading.Lock()
+        # spooled events replayed by a request recording an event, without
+        # the background worker, so that it does not wait for all of them
+        self.replay_limit = activity_config.get("batch_size", 100)
+        spool_path = activity_config.get("spool_path")
+        if spool_path:
+            self.spool = EventSpool(
+                spool_path,
+                max_events=activity_config.get("spool_max_events", 1000000))
+            track_spool("activity", self.spool)
+
+        self.pipeline = None
+        if activity_config.get("async", True):
+            self.pipeline = BatchPipeline(
+                self.send_batch,
+                max_size=activity_config.get("queue_size", 10000),
+                batch_size=activity_config.get("batch_size", 100),
+                flush_interval=activity_config.get("flush_interval", 1.0),
+                overflow=activity_config.get("overflow", "drop-newest"),
+                name="activity", idle_handler=self.replay,
+                drop_handler=None if self.spool is None else self.spool.append)
+            track_pipeline("activity", self.pipeline)
+
+    def release(self):
+        if self.pipeline:
+            self.pipeline.close()
+        if self.spool is not None:
+            self.spool.close()
 
     def record(self, user_id: Union[UUID, str], event_type: str, phase: str,
                org_id: Union[UUID, str] = None,
@@ -31,18 +79,135 @@ class EventService:
                payload: str = None) -> str:
         """
         Record a new activity
+
+        When the service is asynchronous, which is the default, the event is
+        queued and sent later on by a background worker so this returns
+        `None` rather than the activity identifier. Events dropped because
+        the queue is full are spooled, when there is a spool.
+
+        Otherwise, up to `batch_size` spooled events are sent first. When
+        some are still spooled afterwards, or being replayed by another
+        request, the event is spooled after them, so that events are received
+        in the order they were recorded.
+        """
+        tz = get_localzone()
+        event = dict(
+            authenticated_user_id=str(authenticated_user_id),
+            access_token_id=str(access_token_id),
+            user_id=str(user_id) if user_id else None,
+            org_id=str(org_id) if org_id else None,
+            workspace_id=str(workspace_id) if workspace_id else None,
+            experiment_id=str(experiment_id) if experiment_id else None,
+            execution_id=str(execution_id) if execution_id else None,
+            event_type=event_type, phase=phase,
+            timestamp=datetime.now().astimezone(tz).isoformat(),
+            payload=payload)
+
+        if self.pipeline:
+            self.pipeline.submit(event)
+            return
+
+        if self.spool is None:
+            return self.send(event)
+
+        if not self.is_remote_down():
+            try:
+                replayed = self.replay_spooled(
+                    limit=self.replay_limit, blocking=False)
+                if replayed is not None and not len(self.spool):
+                    return self.send(event)
+            except Exception:
+                self.mark_remote_down()
+        self.spool.append([event])
+
+    def send(self, event: Dict[str, Any]) -> str:
         """
-        with remote_channel(self.addr) as channel:
-            tz = get_localzone()
-            ts = datetime.now().astimezone(tz).isoformat()
-            activity_id = record_activity(
-                channel, authenticated_user_id=str(authenticated_user_id),
-                access_token_id=str(access_token_id),
-                user_id=str(user_id) if user_id else None,
-                org_id=str(org_id) if org_id else None,
-                workspace_id=str(workspace_id) if workspace_id else None,
-                experiment_id=str(experiment_id) if experiment_id else None,
-                execution_id=str(execution_id) if execution_id else None,
-                event_type=event_type, phase=phase,
-                timestamp=ts, payload=payload)
-            return activity_id
+        Send a single event to the activity service.
+        """
+        with self.channels.channel(self.addr) as channel:
+            return record_activity(channel, **event)
+
+    def send_batch(self, events: List[Dict[str, Any]]):
+        """
+        Send the events over the same channel, one call each as the activity
+        service has no bulk endpoint.
+
+        With a spool, the events which could not be sent are spooled rather
+        than lost, and spooled events are replayed first to keep the order.
+        """
+        if self.spool is None:
+            self.send_all(events)
+            return
+
+        if self.is_remote_down():
+            self.spool.append(events)
+            return
+
+        remaining = list(events)
+        try:
+            self.replay_spooled()
+            with self.channels.channel(self.addr) as channel:
+                while remaining:
+                    record_activity(channel, **remaining[0])
+                    remaining.pop(0)
+        except Exception:
+            self.mark_remote_down()
+            self.spool.append(remaining)
+
+    def send_all(self, events: List[Dict[str, Any]]):
+        with self.channels.channel(self.addr) as channel:
+            for event in events:
+                record_activity(channel, **event)
+
+    def replay(self):
+        """
+        Send the spooled events, if any, unless the remote is still
+        considered down.
+        """
+        if self.spool is None or not len(self.spool) or \
+                self.is_remote_down():
+            return
+
+        try:
+            self.replay_spooled()
+        except Exception:
+            self.mark_remote_down()
+
+    def replay_spooled(self, limit: int = None,
+                       blocking: bool = True) -> Optional[int]:
+        """
+        Send the spooled events, at most `limit` of them when given, and
+        return how many were sent. Raises when one could not be sent.
+
+        Unless `blocking`, return `None` rather than wait when another caller
+        is already replaying.
+        """
+        if self.spool is None or not len(self.spool):
+            return 0
+
+        if not self._replay_lock.acquire(blocking):
+            return None
+        try:
+            count = self.spool.replay(self.send, limit=limit)
+        finally:
+            self._replay_lock.release()
+        if count:
+            logger.info("Replayed {} spooled activity events".format(count))
+        return count
+
+    def is_remote_down(self) -> bool:
+        with self._failed_lock:
+            if self._failed_at is None:
+                return False
+            if time.monotonic() - self._failed_at >= self.retry_interval:
+                self._failed_at = None
+                return False
+            return True
+
+    def mark_remote_down(self):
+        logger.warning(
+            "Activity service at {} unreachable, spooling events "
+            "for the next {}s".format(self.addr, self.retry_interval),
+            exc_info=True)
+        with self._failed_lock:
+            self._failed_at = time.monotonic()
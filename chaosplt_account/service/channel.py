@@ -0,0 +1,198 @@
+from contextlib import contextmanager
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+import attr
+import grpc
+from grpc import Channel, ChannelConnectivity
+
+from ..metrics import ClientMetricsInterceptor
+
+__all__ = ["ChannelPool", "ChannelStats", "channel_options"]
+logger = logging.getLogger("chaosplatform")
+
+DEFAULT_KEEPALIVE = {
+    # ping the server when the connection has been idle for that long
+    "time_ms": 30000,
+    # and consider the connection dead when the ping is not acknowledged
+    "timeout_ms": 10000,
+    "permit_without_calls": True
+}
+
+# connectivity states after which the channel is replaced rather than reused
+BROKEN_STATES = (
+    ChannelConnectivity.TRANSIENT_FAILURE, ChannelConnectivity.SHUTDOWN)
+
+# status codes meaning the connection itself, not the call, failed
+CONNECTION_ERRORS = (grpc.StatusCode.UNAVAILABLE,)
+
+# seconds before closing a released channel, gRPC checks every 0.2s whether
+# the connectivity of a channel is still watched and fails on a closed one
+CLOSE_DELAY = 0.5
+
+
+@attr.s
+class ChannelStats:
+    # channels opened, the first one and every reconnection
+    created: int = attr.ib(default=0)
+    # calls made over an already opened channel
+    reused: int = attr.ib(default=0)
+    # channels replaced after a failure or a broken connectivity state
+    reconnects: int = attr.ib(default=0)
+    failures: int = attr.ib(default=0)
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.created + self.reused
+        return self.reused / total if total else 0.0
+
+
+def channel_options(config: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """
+    Build the gRPC channel options from the `[grpc.keepalive]` section of the
+    configuration.
+    """
+    keepalive = dict(DEFAULT_KEEPALIVE)
+    keepalive.update(config.get("grpc", {}).get("keepalive", {}))
+    return [
+        ("grpc.keepalive_time_ms", int(keepalive["time_ms"])),
+        ("grpc.keepalive_timeout_ms", int(keepalive["timeout_ms"])),
+        ("grpc.keepalive_permit_without_calls",
+         1 if keepalive["permit_without_calls"] else 0),
+        ("grpc.http2.max_pings_without_data", 0)
+    ]
+
+
+class ChannelPool:
+    """
+    Long-lived gRPC channels shared by all the outbound services, one per
+    remote address.
+
+    A channel multiplexes concurrent calls over a single HTTP/2 connection so
+    there is no need for more than one per address. The channel's
+    connectivity is watched and a channel seen as broken, or on which a call
+    failed to reach the server, is replaced on its next use.
+    """
+    def __init__(self, options: List[Tuple[str, Any]] = None):
+        self.options = options or []
+        self._channels = {}  # type: Dict[str, Channel]
+        self._states = {}  # type: Dict[str, ChannelConnectivity]
+        self._watchers = {}  # type: Dict[str, Any]
+        self._closing = []  # type: List[threading.Timer]
+        self._stats = {}  # type: Dict[str, ChannelStats]
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @contextmanager
+    def channel(self, addr: str) -> Channel:
+        """
+        Provide the channel to `addr`, unlike `remote_channel` it is not
+        closed when the context manager exits.
+        """
+        channel = self.get(addr)
+        try:
+            yield channel
+        except grpc.RpcError as x:
+            code = x.code() if callable(getattr(x, "code", None)) else None
+            if code in CONNECTION_ERRORS:
+                self.discard(addr, channel)
+            raise
+
+    def get(self, addr: str) -> Channel:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The gRPC channel pool has been closed")
+
+            stats = self._stats.setdefault(addr, ChannelStats())
+            channel = self._channels.get(addr)
+            if channel is not None:
+                if self._states.get(addr) not in BROKEN_STATES:
+                    stats.reused += 1
+                    return channel
+
+                logger.debug(
+                    "Reconnecting gRPC channel to {}".format(addr))
+                stats.reconnects += 1
+                self._release(addr)
+
+            channel = self._open(addr)
+            stats.created += 1
+            return channel
+
+    def discard(self, addr: str, channel: Channel = None):
+        """
+        Close the channel to `addr` so that the next call reconnects. When
+        `channel` is given, only close it if it is still the pooled one.
+        """
+        with self._lock:
+            current = self._channels.get(addr)
+            if current is None:
+                return
+            if channel is not None and channel is not current:
+                return
+            self._stats.setdefault(addr, ChannelStats()).failures += 1
+            self._release(addr)
+
+    def close_all(self):
+        """
+        Close all the channels, the pool cannot be used afterwards.
+        """
+        with self._lock:
+            self._closed = True
+            for addr in list(self._channels):
+                self._release(addr)
+            closing, self._closing = self._closing, []
+        for timer in closing:
+            timer.join()
+
+    def stats(self) -> Dict[str, ChannelStats]:
+        with self._lock:
+            return {
+                addr: attr.evolve(s) for addr, s in self._stats.items()
+            }
+
+    ###########################################################################
+    # Internals
+    ###########################################################################
+    def _open(self, addr: str) -> Channel:
+        channel = grpc.intercept_channel(
+            grpc.insecure_channel(addr, options=self.options),
+            ClientMetricsInterceptor())
+        self._channels[addr] = channel
+        self._states[addr] = ChannelConnectivity.IDLE
+
+        def on_state_change(state: ChannelConnectivity):
+            # called from a grpc thread, ignore channels already replaced
+            with self._lock:
+                if self._channels.get(addr) is channel:
+                    self._states[addr] = state
+
+        channel.subscribe(on_state_change, try_to_connect=False)
+        self._watchers[addr] = on_state_change
+        return channel
+
+    def _release(self, addr: str):
+        channel = self._channels.pop(addr, None)
+        self._states.pop(addr, None)
+        on_state_change = self._watchers.pop(addr, None)
+        if channel is None:
+            return
+
+        if on_state_change is not None:
+            channel.unsubscribe(on_state_change)
+        # let gRPC stop polling the connectivity before closing the channel
+        timer = threading.Timer(
+            CLOSE_DELAY, self._close_channel, args=(addr, channel))
+        timer.daemon = True
+        timer.start()
+        self._closing = [t for t in self._closing if t.is_alive()]
+        self._closing.append(timer)
+
+    def _close_channel(self, addr: str, channel: Channel):
+        try:
+            channel.close()
+        except Exception:
+            logger.debug(
+                "Failed to close gRPC channel to {}".format(addr),
+                exc_info=True)
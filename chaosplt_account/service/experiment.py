@@ -1,22 +1,23 @@
 from typing import Any, Dict, List
 
-from chaosplt_grpc import remote_channel
 from chaosplt_grpc.experiment.client import get_experiments
 
 from ..model import Experiment
+from .channel import ChannelPool
 
 __all__ = ["ExperimentService"]
 
 
 class ExperimentService:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], channels: ChannelPool = None):
         self.exp_addr = config["grpc"]["experiment"]["addr"]
+        self.channels = channels or ChannelPool()
 
     def release(self):
         pass
 
     def get_experiments(self, experiment_ids: List[str]) -> List[Experiment]:
-        with remote_channel(self.exp_addr) as channel:
+        with self.channels.channel(self.exp_addr) as channel:
             experiments = get_experiments(
                 channel, experiment_ids, with_payload=False)
             result = []
@@ -0,0 +1,224 @@
+import logging
+from queue import Empty, Full, Queue
+import threading
+import time
+from typing import Any, Callable, List
+
+import attr
+
+__all__ = ["BatchPipeline", "PipelineStats", "OVERFLOW_POLICIES"]
+logger = logging.getLogger("chaosplatform")
+
+# what to do with a new item when the queue is full:
+# - "drop-newest": discard the new item
+# - "drop-oldest": discard the oldest queued item to make room
+# - "block": wait up to `block_timeout` seconds for room, then discard it
+OVERFLOW_POLICIES = ("drop-newest", "drop-oldest", "block")
+
+# queued when closing so that a worker waiting for items notices right away
+_WAKE_UP = object()
+
+
+@attr.s
+class PipelineStats:
+    submitted: int = attr.ib(default=0)
+    processed: int = attr.ib(default=0)
+    dropped: int = attr.ib(default=0)
+    failed: int = attr.ib(default=0)
+    batches: int = attr.ib(default=0)
+    queued: int = attr.ib(default=0)
+
+
+class BatchPipeline:
+    """
+    Hand items over to a background worker which processes them by batches.
+
+    The worker calls `handler` with up to `batch_size` items, as soon as that
+    many are queued or `flush_interval` seconds after the first item of the
+    batch was queued, whichever comes first. The queue holds at most
+    `max_size` items, beyond that the `overflow` policy applies.
+
+    The handler is responsible for dealing with its own failures, anything it
+    raises is logged and its batch counted as failed.
+
+    When set, `idle_handler` is called by the worker every `flush_interval`
+    seconds during which nothing was queued, and `drop_handler` is called
+    with the items the overflow policy discards, so that they can be kept
+    elsewhere.
+    """
+    def __init__(self, handler: Callable[[List[Any]], None],
+                 max_size: int = 10000, batch_size: int = 100,
+                 flush_interval: float = 1.0, overflow: str = "drop-newest",
+                 block_timeout: float = 0.1, name: str = "pipeline",
+                 idle_handler: Callable[[], None] = None,
+                 drop_handler: Callable[[List[Any]], None] = None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                "Overflow policy must be one of: {}".format(
+                    ", ".join(OVERFLOW_POLICIES)))
+
+        self.handler = handler
+        self.idle_handler = idle_handler
+        self.drop_handler = drop_handler
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.name = name
+        self._queue = Queue(maxsize=max_size)
+        self._stats = PipelineStats()
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._worker = threading.Thread(
+            target=self._run, name=name, daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> bool:
+        """
+        Queue the item and return immediately, unless the policy is to block
+        when the queue is full. Returns `False` when the item was dropped.
+        """
+        if self._stopping.is_set():
+            self._count(dropped=1)
+            self._drop(item)
+            return False
+
+        self._count(submitted=1)
+        try:
+            if self.overflow == "block":
+                self._queue.put(item, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(item)
+            return True
+        except Full:
+            pass
+
+        if self.overflow == "drop-oldest":
+            try:
+                oldest = self._queue.get_nowait()
+                self._queue.task_done()
+                self._count(dropped=1)
+                self._drop(oldest)
+                self._queue.put_nowait(item)
+                return True
+            except (Empty, Full):
+                pass
+
+        self._count(dropped=1)
+        logger.warning(
+            "The {} queue is full, dropping an item".format(self.name))
+        self._drop(item)
+        return False
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Wait until all the queued items have been processed. Returns `False`
+        when they have not within `timeout` seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """
+        Stop accepting new items and wait for the worker to process what is
+        left in the queue. Returns `False` when it could not drain in time.
+        """
+        self._stopping.set()
+        try:
+            self._queue.put_nowait(_WAKE_UP)
+        except Full:
+            # the worker is busy anyway
+            pass
+        self._worker.join(timeout)
+        drained = not self._worker.is_alive()
+        if not drained:
+            logger.warning(
+                "The {} queue could not be drained, {} items lost".format(
+                    self.name, self._queue.qsize()))
+        return drained
+
+    def stats(self) -> PipelineStats:
+        with self._lock:
+            return attr.evolve(self._stats, queued=self._queue.qsize())
+
+    ###########################################################################
+    # Internals
+    ###########################################################################
+    def _count(self, **counters: int):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self._stats, name, getattr(self._stats, name) + value)
+
+    def _next_batch(self) -> List[Any]:
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            try:
+                if self._stopping.is_set():
+                    item = self._queue.get_nowait()
+                elif deadline is None:
+                    # wait for the first item of the batch
+                    item = self._queue.get(timeout=self.flush_interval)
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    item = self._queue.get(timeout=remaining)
+            except Empty:
+                break
+
+            if item is _WAKE_UP:
+                self._queue.task_done()
+                continue
+
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _drop(self, item: Any):
+        if not self.drop_handler or item is _WAKE_UP:
+            return
+        try:
+            self.drop_handler([item])
+        except Exception:
+            logger.error(
+                "The {} drop handler failed".format(self.name), exc_info=True)
+
+    def _idle(self):
+        if not self.idle_handler:
+            return
+        try:
+            self.idle_handler()
+        except Exception:
+            logger.error(
+                "The {} idle handler failed".format(self.name), exc_info=True)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stopping.is_set():
+                    return
+                self._idle()
+                continue
+
+            try:
+                self.handler(batch)
+                self._count(processed=len(batch), batches=1)
+            except Exception:
+                logger.error(
+                    "Failed to process a batch of {} items from the {} "
+                    "queue".format(len(batch), self.name), exc_info=True)
+                self._count(failed=len(batch), batches=1)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
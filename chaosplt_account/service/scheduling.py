@@ -1,23 +1,24 @@
 from typing import Any, Dict, List
 
-from chaosplt_grpc import remote_channel
 from chaosplt_grpc.scheduling.client import get_by_user, \
     get_by_workspace, get_by_org
 
 from ..model import Schedule
+from .channel import ChannelPool
 
 __all__ = ["SchedulingService"]
 
 
 class SchedulingService:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], channels: ChannelPool = None):
         self.addr = config["grpc"]["scheduling"]["addr"]
+        self.channels = channels or ChannelPool()
 
     def release(self):
         pass
 
     def get_by_user(self, user_id: str) -> List[Schedule]:
-        with remote_channel(self.addr) as channel:
+        with self.channels.channel(self.addr) as channel:
             schedules = get_by_user(
                 channel, user_id, with_payload=False)
             result = []
@@ -42,7 +43,7 @@ class SchedulingService:
             return result
 
     def get_by_org(self, org_id: str) -> List[Schedule]:
-        with remote_channel(self.addr) as channel:
+        with self.channels.channel(self.addr) as channel:
             schedules = get_by_org(
                 channel, org_id, with_payload=False)
             result = []
@@ -67,7 +68,7 @@ class SchedulingService:
             return result
 
     def get_by_workspace(self, workspace_id: str) -> List[Schedule]:
-        with remote_channel(self.addr) as channel:
+        with self.channels.channel(self.addr) as channel:
             schedules = get_by_workspace(
                 channel, workspace_id, with_payload=False)
             result = []
@@ -0,0 +1,156 @@
+from contextlib import contextmanager
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List
+
+import attr
+
+__all__ = ["EventSpool", "SpoolStats"]
+logger = logging.getLogger("chaosplatform")
+
+
+@attr.s
+class SpoolStats:
+    # events currently waiting on disk
+    pending: int = attr.ib(default=0)
+    spooled: int = attr.ib(default=0)
+    replayed: int = attr.ib(default=0)
+    # oldest events discarded to stay within the bounds of the spool
+    dropped: int = attr.ib(default=0)
+    size: int = attr.ib(default=0)
+
+
+class EventSpool:
+    """
+    Append-only, on-disk, spool of events which could not be sent.
+
+    Events are stored in a SQLite database in WAL mode, so appending is a
+    sequential write and a batch of events is made durable with a single
+    sync. The spool holds at most `max_events` events, when full the oldest
+    ones are discarded.
+    """
+    def __init__(self, path: str, max_events: int = 1000000,
+                 replay_batch_size: int = 500):
+        self.path = path
+        self.max_events = max_events
+        self.replay_batch_size = replay_batch_size
+        self._stats = SpoolStats()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # WAL with NORMAL syncs at checkpoints, enough to survive a crash of
+        # the process though not always of the host
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL)")
+        self._stats.pending = self._count()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stats.pending
+
+    def append(self, events: List[Dict[str, Any]]):
+        """
+        Store the events, in a single transaction.
+        """
+        if not events:
+            return
+
+        with self._lock:
+            overflow = max(
+                0, self._stats.pending + len(events) - self.max_events)
+            with self._transaction():
+                self._db.executemany(
+                    "INSERT INTO events (payload) VALUES (?)",
+                    [(json.dumps(e),) for e in events])
+                if overflow:
+                    self._db.execute(
+                        "DELETE FROM events WHERE id IN ("
+                        "SELECT id FROM events ORDER BY id LIMIT ?)",
+                        (overflow,))
+
+            self._stats.spooled += len(events)
+            self._stats.pending += len(events) - overflow
+            if overflow:
+                self._stats.dropped += overflow
+                logger.warning(
+                    "Activity spool is full, {} events discarded".format(
+                        overflow))
+
+    def replay(self, send: Callable[[Dict[str, Any]], None],
+               limit: int = None) -> int:
+        """
+        Send the spooled events one at a time, oldest first, at most `limit`
+        of them when given. Returns the number of events replayed.
+
+        Events are read by batches and the ones sent are removed once their
+        batch is done or as soon as `send` fails, so that none is sent twice.
+        The failing event stays spooled and the error is raised.
+        """
+        replayed = 0
+        while limit is None or replayed < limit:
+            size = self.replay_batch_size
+            if limit is not None:
+                size = min(size, limit - replayed)
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, payload FROM events ORDER BY id LIMIT ?",
+                    (size,)).fetchall()
+            if not rows:
+                break
+
+            sent = 0
+            try:
+                for (_, payload) in rows:
+                    send(json.loads(payload))
+                    sent += 1
+            finally:
+                if sent:
+                    self._remove(rows[sent - 1][0], sent)
+                    replayed += sent
+        return replayed
+
+    def stats(self) -> SpoolStats:
+        with self._lock:
+            size = 0
+            for suffix in ("", "-wal"):
+                try:
+                    size += os.path.getsize(self.path + suffix)
+                except OSError:
+                    pass
+            return attr.evolve(self._stats, size=size)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    ###########################################################################
+    # Internals
+    ###########################################################################
+    def _remove(self, last_id: int, count: int):
+        with self._lock:
+            self._db.execute("DELETE FROM events WHERE id <= ?", (last_id,))
+            self._stats.replayed += count
+            self._stats.pending = max(0, self._stats.pending - count)
+
+    def _count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    @contextmanager
+    def _transaction(self):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+        else:
+            self._db.execute("COMMIT")
@@ -19,6 +19,12 @@ def load_settings(toml_path: str):
     default_cherrypy_env = "" if debug else "production"
 
     cherrypy_config = config["http"].get("cherrypy", {})
+    thread_pool = cherrypy_config.get("thread_pool", 10)
+    thread_pool_max = cherrypy_config.get("thread_pool_max", -1)
+    if cherrypy_config.get("adaptive_pool", False) and thread_pool_max < 0:
+        # the pool cannot grow without bounds
+        thread_pool_max = thread_pool * 4
+
     cherrypy.engine.unsubscribe('graceful', cherrypy.log.reopen_files)
     cherrypy.config.update({
         'server.socket_host': host,
@@ -28,7 +34,20 @@ def load_settings(toml_path: str):
         'log.access_file': cherrypy_config.get("access_file", ""),
         'log.error_file': cherrypy_config.get("error_file", ""),
         'environment': cherrypy_config.get(
-            "environment", default_cherrypy_env)
+            "environment", default_cherrypy_env),
+        'server.thread_pool': thread_pool,
+        'server.thread_pool_max': thread_pool_max,
+        'server.socket_queue_size': cherrypy_config.get(
+            "socket_queue_size", 5),
+        'server.socket_timeout': cherrypy_config.get("socket_timeout", 10),
+        'server.accepted_queue_size': cherrypy_config.get(
+            "accepted_queue_size", -1),
+        'server.accepted_queue_timeout': cherrypy_config.get(
+            "accepted_queue_timeout", 10),
+        'server.max_request_header_size': cherrypy_config.get(
+            "max_request_header_size", 500 * 1024),
+        'server.max_request_body_size': cherrypy_config.get(
+            "max_request_body_size", 100 * 1024 * 1024)
     })
 
     if "proxy" in config["http"]:
@@ -1,31 +1,111 @@
-from typing import Any, Dict, NoReturn
+import logging
+from typing import Any, Dict, NoReturn, Tuple
 
 from chaosplt_relational_storage import get_storage, \
-    configure_storage, release_storage
+    configure_storage, release_storage, RelationalStorage
 import pkg_resources
+from sqlalchemy.engine import Engine
 
+from ..metrics import track_engine
 from .concrete import OrgService, RegistrationService, UserService, \
     WorkspaceService
+from .details import DetailsCache
+from .instrumentation import QueryInstrumentation, RepeatedStatementError, \
+    begin_query_stats, end_query_stats, inspect_queries, instrument_engine
+from .indexes import ensure_indexes, missing_indexes
 from .interface import BaseAccountStorage
+from .passwords import PasswordHasher, PasswordHashingBusy, \
+    PasswordPolicy, PasswordSettings, password_context
+from .pool import PoolSettings, create_pooled_engine, warm_up_engine
+from .session import begin_unit_of_work, configure_replica, \
+    end_unit_of_work, release_replica, unit_of_work
+from .uuids import check_uuid_storage, configure_uuid_storage, \
+    migrate_uuids
 
-__all__ = ["initialize_storage", "shutdown_services", "AccountStorage"]
+__all__ = ["initialize_storage", "shutdown_storage", "warm_up_storage",
+           "AccountStorage", "ensure_indexes", "migrate_uuids",
+           "begin_unit_of_work", "end_unit_of_work", "unit_of_work",
+           "begin_query_stats", "end_query_stats", "inspect_queries",
+           "RepeatedStatementError",
+           "PasswordHashingBusy"]
+logger = logging.getLogger("chaosplatform")
 
 
 class AccountStorage(BaseAccountStorage):
     def __init__(self, config: Dict[str, Any]):
-        self.driver = get_storage(config)
+        self.pool_settings = PoolSettings.from_config(config)
+        uuid_storage = config["db"].get("uuid_storage", "char")
+        engine, self.own_engine = open_engine(
+            config["db"], self.pool_settings)
+        configure_uuid_storage(engine, uuid_storage)
+        check_uuid_storage(engine, uuid_storage)
+        self.driver = RelationalStorage(engine)
         configure_storage(self.driver)
+        # existing tables do not get the indexes added to the models since
+        # they were created, see `ensure-indexes`
+        warn_of_missing_indexes(self.driver.engine)
 
-        user = UserService(self.driver)
+        # reads may be served by a replica, see `read_session`
+        self.replica_engine = None
+        self.own_replica_engine = False
+        replica_config = config["db"].get("replica")
+        if replica_config:
+            self.replica_engine, self.own_replica_engine = open_engine(
+                replica_config, self.pool_settings)
+            configure_uuid_storage(self.replica_engine, uuid_storage)
+            configure_replica(
+                self.replica_engine,
+                replica_config.get("read_your_writes", 5.0))
+
+        # decrypted details of the users, shared by the services reading them
+        self.details = DetailsCache(
+            maxsize=config["db"].get("details_cache_size", 10000))
+        user = UserService(self.driver, self.details)
         org = OrgService(self.driver)
         workspace = WorkspaceService(self.driver)
-        registration = RegistrationService(self.driver)
+        self.passwords = PasswordHasher(
+            password_context(PasswordPolicy.from_config(config)),
+            PasswordSettings.from_config(config))
+        registration = RegistrationService(
+            self.driver, self.passwords, self.details)
+
+        track_engine("account", self.driver.engine)
+        if self.replica_engine:
+            track_engine("account-replica", self.replica_engine)
+
+        instrumentation = QueryInstrumentation.from_config(config)
+        if instrumentation.enabled:
+            instrument_engine(self.driver.engine)
+            if self.replica_engine:
+                instrument_engine(self.replica_engine)
+        else:
+            instrumentation = None
 
         BaseAccountStorage.__init__(
-            self, user, org, workspace, registration)
+            self, user, org, workspace, registration, instrumentation)
+
+    def warm_up(self) -> int:
+        """
+        Open the connections the pool keeps, so that the first requests do
+        not pay for it.
+        """
+        warmed = warm_up_engine(
+            self.driver.engine, self.pool_settings.pool_size)
+        if self.replica_engine:
+            warmed += warm_up_engine(
+                self.replica_engine, self.pool_settings.pool_size)
+        return warmed
 
     def release(self) -> NoReturn:
+        self.passwords.shutdown()
+        self.details.clear()
+        if self.replica_engine:
+            release_replica()
+            if self.own_replica_engine:
+                self.replica_engine.dispose()
         release_storage(self.driver)
+        if self.own_engine:
+            self.driver.engine.dispose()
 
 
 def initialize_storage(config: Dict[str, Any]) -> BaseAccountStorage:
@@ -37,5 +117,46 @@ def initialize_storage(config: Dict[str, Any]) -> BaseAccountStorage:
     return AccountStorage(config)
 
 
+def warm_up_storage(storage: BaseAccountStorage,
+                    config: Dict[str, Any]) -> NoReturn:
+    """
+    Warm the storage up when the `warm_up` setting of the `[db]` section
+    says so and the storage supports it.
+    """
+    if config.get("db", {}).get("warm_up", False) and \
+            hasattr(storage, "warm_up"):
+        storage.warm_up()
+
+
 def shutdown_storage(storage: BaseAccountStorage) -> NoReturn:
     storage.release()
+
+
+###############################################################################
+# Internals
+###############################################################################
+def open_engine(db_config: Dict[str, Any],
+                pool_settings: PoolSettings) -> Tuple[Engine, bool]:
+    """
+    Return the engine to the database at the `uri` of `db_config` and
+    whether it is owned by the caller, which must then dispose of it.
+
+    SQLite connections are shared by all threads, there is no pool to tune.
+    Its engine is the one of the relational storage package.
+    """
+    uri = db_config["uri"]
+    if uri.startswith("sqlite"):
+        return (get_storage({"db": db_config}).engine, False)
+
+    engine = create_pooled_engine(
+        uri, pool_settings, echo=db_config.get("debug", False))
+    return (engine, True)
+
+
+def warn_of_missing_indexes(engine: Engine):
+    missing = missing_indexes(engine)
+    if missing:
+        logger.warning(
+            "The database lacks the indexes {}, create them with "
+            "`chaosplatform-account ensure-indexes`".format(
+                ", ".join(str(index.name) for index in missing)))
@@ -1,13 +1,19 @@
-from typing import Dict, List, NoReturn, Union
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import binascii
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, NoReturn, Tuple, Union
 from uuid import UUID
 
-from chaosplt_account.model import Organization, User, Workspace, \
-    OrganizationMember, WorkspaceCollaborator
+from chaosplt_account.model import Organization, Page, Principal, User, \
+    Workspace, OrganizationMember, WorkspaceCollaborator
 from chaosplt_relational_storage import RelationalStorage
-from chaosplt_relational_storage.db import orm_session
+from sqlalchemy_utils.types.password import Password
 
+from .details import DetailsCache
 from .interface import BaseOrganizationService, BaseUserService, \
-    BaseRegistrationService, BaseWorkspaceService
+    BaseRegistrationService, BaseWorkspaceService, DEFAULT_PAGE_SIZE
+from .passwords import PasswordHasher
+from .session import orm_session, read_session, release_connection
 from .model import User as UserModel, \
     Org as OrgModel, Workspace as WorkspaceModel, \
     OrgsMembers as OrgsMembersAssociation, UserInfo as UserInfoModel, \
@@ -17,22 +23,34 @@ from .model import User as UserModel, \
 __all__ = ["UserService", "OrgService", "WorkspaceService",
            "RegistrationService"]
 
+# maximum number of identifiers sent within a single `IN (...)` clause
+IN_CLAUSE_CHUNK_SIZE = 500
+CURSOR_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
 
 class UserService(BaseUserService):
-    def __init__(self, driver: RelationalStorage):
+    def __init__(self, driver: RelationalStorage,
+                 details: DetailsCache = None):
         self.driver = driver
+        if details is None:
+            details = DetailsCache(maxsize=0)
+        self.details = details
 
     def get_bare(self, user_id: Union[UUID, str]) -> User:
         with orm_session() as session:
-            user = UserModel.load(user_id, session=session)
-            if not user:
+            loaded = UserModel.load_with_info(user_id, session=session)
+            if not loaded:
                 return
+            user, encrypted = loaded
 
+            details = self.details.get(
+                user.info, encrypted, lambda: UserInfoModel.decrypt_details(
+                    encrypted, session=session))
             return User(
                 id=user.id,
                 name=user.info.fullname,
                 username=user.info.username,
-                email=user.info.details.get('email'),
+                email=details.get('email'),
                 is_authenticated=user.is_authenticated,
                 is_active=user.is_active,
                 is_anonymous=user.is_anonymous,
@@ -43,57 +61,56 @@ class UserService(BaseUserService):
             )
 
     def get(self, user_id: Union[UUID, str]) -> User:
-        with orm_session() as session:
-            user = UserModel.load(user_id, session=session)
-            if not user:
+        with read_session() as session:
+            loaded = UserModel.load_with_info(user_id, session=session)
+            if not loaded:
                 return
+            user, encrypted = loaded
 
-            user_orgs = user.orgs or []
             orgs = []
-            for org in user_orgs:
-                org_id = org.id
-                assoc = OrgsMembersAssociation.load(
-                    org_id, user_id, session=session)
+            for org, is_owner in OrgModel.load_by_user_with_ownership(
+                    user_id, session=session):
                 orgs.append(
                     Organization(
-                        id=org_id,
+                        id=org.id,
                         name=org.name,
-                        owner=assoc.is_owner,
+                        owner=is_owner,
                         kind=org.kind.value,
                         created_on=org.created_on,
                         workspaces=[]
                     )
                 )
 
-            user_workspaces = user.workspaces or []
             workspaces = []
-            for workspace in user_workspaces:
-                workspace_id = workspace.id
-                assoc = WorkspaceMembersAssociation.load(
-                    workspace_id, user_id, session=session)
+            for workspace, is_owner in \
+                    WorkspaceModel.load_by_user_with_ownership(
+                        user_id, session=session):
                 settings = workspace.settings
 
                 workspaces.append(
                     Workspace(
-                        id=workspace_id,
+                        id=workspace.id,
                         org_id=workspace.org_id,
                         org_name=workspace.org.name,
                         name=workspace.name,
                         kind=workspace.kind.value,
-                        owner=assoc.is_owner,
+                        owner=is_owner,
                         created_on=workspace.created_on,
                         settings=settings,
                         visibility=settings.get("visibility")
                     )
                 )
 
+            details = self.details.get(
+                user.info, encrypted, lambda: UserInfoModel.decrypt_details(
+                    encrypted, session=session))
             return User(
                 id=user.id,
                 fullname=user.info.fullname,
                 username=user.info.username,
-                email=user.info.details.get('email'),
-                bio=user.info.details.get('bio'),
-                company=user.info.details.get('company'),
+                email=details.get('email'),
+                bio=details.get('bio'),
+                company=details.get('company'),
                 is_authenticated=user.is_authenticated,
                 is_active=user.is_active,
                 is_local=user.is_local,
@@ -206,10 +223,14 @@ class OrgService(BaseOrganizationService):
     def __init__(self, driver: RelationalStorage):
         self.driver = driver
 
-    def list_all(self) -> List[Organization]:
-        with orm_session() as session:
+    def list_all(self, cursor: str = None,
+                 limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        after = decode_cursor(cursor) if cursor else None
+        with read_session() as session:
             orgs = []
-            for org in OrgModel.load_all(session):
+            # fetch one extra row to know whether there is a next page
+            rows = OrgModel.load_page(after, limit + 1, session=session)
+            for org in rows[:limit]:
                 orgs.append(
                     Organization(
                         id=org.id,
@@ -218,19 +239,18 @@ class OrgService(BaseOrganizationService):
                         created_on=org.created_on
                     )
                 )
-            return orgs
+            return paginate(orgs, has_more=len(rows) > limit)
 
     def get_by_user(self, user_id: Union[UUID, str]) -> List[Organization]:
-        with orm_session() as session:
+        with read_session() as session:
             orgs = []
-            for org in OrgModel.load_by_user(user_id, session):
-                membership = OrgsMembersAssociation.load(
-                    org.id, user_id, session=session)
+            for org, is_owner in OrgModel.load_by_user_with_ownership(
+                    user_id, session=session):
                 orgs.append(
                     Organization(
                         id=org.id,
                         name=org.name,
-                        owner=membership.is_owner,
+                        owner=is_owner,
                         kind=org.kind.value,
                         created_on=org.created_on
                     )
@@ -238,7 +258,7 @@ class OrgService(BaseOrganizationService):
             return orgs
 
     def get(self, org_id: Union[UUID, str]) -> Organization:
-        with orm_session() as session:
+        with read_session() as session:
             org = OrgModel.load(org_id, session=session)
             if org:
                 return Organization(
@@ -262,35 +282,34 @@ class OrgService(BaseOrganizationService):
                 )
 
     def get_many(self, org_ids: List[Union[UUID, str]]) -> List[Organization]:
-        with orm_session() as session:
-            result = []
-            for org_id in org_ids:
-                org = OrgModel.load(org_id, session=session)
-                if not org:
-                    continue
-                result.append(Organization(
-                    id=org.id,
-                    name=org.name,
-                    kind=org.kind.value,
-                    created_on=org.created_on,
-                    workspaces=[
-                        Workspace(
-                            id=workspace.id,
-                            org_id=workspace.org_id,
-                            name=workspace.name,
-                            org_name=workspace.org.name,
-                            kind=workspace.kind.value,
-                            settings=workspace.settings,
-                            created_on=workspace.created_on,
-                            visibility=workspace.settings.get('visibility')
-                        ) for workspace in org.workspaces
-                    ],
-                    settings=org.settings
-                ))
-            return result
+        with read_session() as session:
+            orgs = {}
+            for chunk in chunk_ids(org_ids):
+                for org in OrgModel.load_many(chunk, session=session):
+                    orgs[org.id] = Organization(
+                        id=org.id,
+                        name=org.name,
+                        kind=org.kind.value,
+                        created_on=org.created_on,
+                        workspaces=[
+                            Workspace(
+                                id=workspace.id,
+                                org_id=workspace.org_id,
+                                name=workspace.name,
+                                org_name=org.name,
+                                kind=workspace.kind.value,
+                                settings=workspace.settings,
+                                created_on=workspace.created_on,
+                                visibility=workspace.settings.get(
+                                    'visibility')
+                            ) for workspace in org.workspaces
+                        ],
+                        settings=org.settings
+                    )
+            return in_given_order(org_ids, orgs)
 
     def get_by_name(self, org_name: str) -> Organization:
-        with orm_session() as session:
+        with read_session() as session:
             org = OrgModel.load_by_name(org_name, session=session)
             if org:
                 return Organization(
@@ -364,18 +383,18 @@ class OrgService(BaseOrganizationService):
                     break
 
     def has_org_by_name(self, org_name: str) -> bool:
-        with orm_session() as session:
+        with read_session() as session:
             org = OrgModel.load_by_name(org_name, session=session)
             return org is not None
 
     def has_org_by_id(self, org_id: Union[UUID, str]) -> bool:
-        with orm_session() as session:
+        with read_session() as session:
             org = OrgModel.load(org_id, session=session)
             return org is not None
 
     def has_workspace_by_name(self, org_id: Union[UUID, str],
                               workspace_name: str) -> bool:
-        with orm_session() as session:
+        with read_session() as session:
             org = OrgModel.load(org_id, session=session)
             workspace = org.get_workspace_by_name(
                 workspace_name, session=session)
@@ -383,7 +402,7 @@ class OrgService(BaseOrganizationService):
 
     def has_workspace_by_id(self, org_id: Union[UUID, str],
                             workspace_id: Union[UUID, str]) -> bool:
-        with orm_session() as session:
+        with read_session() as session:
             org = OrgModel.load(org_id, session=session)
             workspace = org.get_workspace_by_id(
                 workspace_id, session=session)
@@ -391,23 +410,19 @@ class OrgService(BaseOrganizationService):
 
     def is_member(self, org_id: Union[UUID, str],
                   user_id: Union[str, UUID]) -> bool:
-        with orm_session() as session:
-            org = OrgModel.load(org_id, session=session)
-            if not org:
-                return False
-            return org.is_member(user_id)
+        with read_session() as session:
+            return OrgsMembersAssociation.has_member(
+                org_id, user_id, session=session)
 
     def is_owner(self, org_id: Union[UUID, str],
                  user_id: Union[str, UUID]) -> bool:
-        with orm_session() as session:
-            org = OrgModel.load(org_id, session=session)
-            if not org:
-                return False
-            return org.is_owner(user_id)
+        with read_session() as session:
+            return OrgsMembersAssociation.has_owner(
+                org_id, user_id, session=session)
 
     def get_members(self, org_id: Union[UUID, str]) \
             -> List[OrganizationMember]:
-        with orm_session() as session:
+        with read_session() as session:
             memberships = OrgsMembersAssociation.get_by_org(
                 org_id, session=session)
 
@@ -429,7 +444,7 @@ class OrgService(BaseOrganizationService):
 
     def get_member(self, org_id: Union[UUID, str],
                    user_id: Union[str, UUID]) -> OrganizationMember:
-        with orm_session() as session:
+        with read_session() as session:
             membership = OrgsMembersAssociation.\
                 get_by_org_and_member(org_id, user_id, session=session)
 
@@ -472,10 +487,14 @@ class WorkspaceService(BaseWorkspaceService):
     def __init__(self, driver: RelationalStorage):
         self.driver = driver
 
-    def list_all(self) -> List[Workspace]:
-        with orm_session() as session:
+    def list_all(self, cursor: str = None,
+                 limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        after = decode_cursor(cursor) if cursor else None
+        with read_session() as session:
             workspaces = []
-            for workspace in WorkspaceModel.load_all(session):
+            # fetch one extra row to know whether there is a next page
+            rows = WorkspaceModel.load_page(after, limit + 1, session=session)
+            for workspace in rows[:limit]:
                 settings = workspace.settings
 
                 workspaces.append(
@@ -489,10 +508,10 @@ class WorkspaceService(BaseWorkspaceService):
                         visibility=settings.get("visibility", {})
                     )
                 )
-            return workspaces
+            return paginate(workspaces, has_more=len(rows) > limit)
 
     def get(self, workspace_id: Union[UUID, str]) -> Workspace:
-        with orm_session() as session:
+        with read_session() as session:
             workspace = WorkspaceModel.load(workspace_id, session=session)
             if workspace:
                 return Workspace(
@@ -508,13 +527,12 @@ class WorkspaceService(BaseWorkspaceService):
 
     def get_many(self, workspace_ids: List[Union[UUID, str]]) \
             -> List[Workspace]:
-        with orm_session() as session:
-            result = []
-            for workspace_id in workspace_ids:
-                workspace = WorkspaceModel.load(workspace_id, session=session)
-                if not workspace:
-                    continue
-                result.append(Workspace(
+        with read_session() as session:
+            workspaces = {}
+            for chunk in chunk_ids(workspace_ids):
+                for workspace in WorkspaceModel.load_many(
+                        chunk, session=session):
+                    workspaces[workspace.id] = Workspace(
                         id=workspace.id,
                         name=workspace.name,
                         org_id=workspace.org_id,
@@ -523,12 +541,12 @@ class WorkspaceService(BaseWorkspaceService):
                         settings=workspace.settings,
                         created_on=workspace.created_on,
                         visibility=workspace.settings.get('visibility')
-                    ))
-            return result
+                    )
+            return in_given_order(workspace_ids, workspaces)
 
     def get_by_name(self, org_id: Union[UUID, str],
                     workspace_name: str) -> Workspace:
-        with orm_session() as session:
+        with read_session() as session:
             workspace = WorkspaceModel.load_by_name(
                 org_id, workspace_name, session=session)
             if workspace:
@@ -544,18 +562,18 @@ class WorkspaceService(BaseWorkspaceService):
                 )
 
     def get_by_user(self, user_id: Union[UUID, str]) -> List[Workspace]:
-        with orm_session() as session:
+        with read_session() as session:
             workspaces = []
-            for workspace in WorkspaceModel.load_by_user(user_id, session):
-                membership = WorkspaceMembersAssociation.load(
-                    workspace.id, user_id, session=session)
+            for workspace, is_owner in \
+                    WorkspaceModel.load_by_user_with_ownership(
+                        user_id, session=session):
                 workspaces.append(
                     Workspace(
                         id=workspace.id,
                         org_id=workspace.org_id,
                         org_name=workspace.org.name,
                         name=workspace.name,
-                        owner=membership.is_owner,
+                        owner=is_owner,
                         kind=workspace.kind.value,
                         settings=workspace.settings,
                         created_on=workspace.created_on,
@@ -598,7 +616,7 @@ class WorkspaceService(BaseWorkspaceService):
 
     def get_collaborators(self, workspace_id: Union[UUID, str]) \
             -> List[WorkspaceCollaborator]:
-        with orm_session() as session:
+        with read_session() as session:
             memberships = WorkspaceMembersAssociation.get_by_workspace(
                 workspace_id, session=session)
 
@@ -620,7 +638,7 @@ class WorkspaceService(BaseWorkspaceService):
 
     def get_collaborator(self, workspace_id: Union[UUID, str],
                          user_id: Union[str, UUID]) -> WorkspaceCollaborator:
-        with orm_session() as session:
+        with read_session() as session:
             membership = WorkspaceMembersAssociation.\
                 get_by_workspace_and_collaborator(
                     workspace_id, user_id, session=session)
@@ -638,27 +656,53 @@ class WorkspaceService(BaseWorkspaceService):
 
     def is_collaborator(self, workspace_id: Union[UUID, str],
                         user_id: Union[str, UUID]) -> bool:
-        with orm_session() as session:
-            workspace = WorkspaceModel.load(workspace_id, session=session)
-            if not workspace:
-                return False
-            return workspace.is_collaborator(user_id)
+        with read_session() as session:
+            return WorkspaceMembersAssociation.has_collaborator(
+                workspace_id, user_id, session=session)
 
     def is_owner(self, workspace_id: Union[UUID, str],
                  user_id: Union[str, UUID]) -> bool:
-        with orm_session() as session:
-            workspace = WorkspaceModel.load(workspace_id, session=session)
-            if not workspace:
-                return False
-            return workspace.is_owner(user_id)
+        with read_session() as session:
+            return WorkspaceMembersAssociation.has_owner(
+                workspace_id, user_id, session=session)
+
+    def get_memberships(self, user_id: Union[UUID, str],
+                        workspace_ids: List[Union[UUID, str]]) \
+            -> Dict[UUID, bool]:
+        with read_session() as session:
+            memberships = {}
+            for chunk in chunk_ids(workspace_ids):
+                rows = WorkspaceMembersAssociation.load_ownership_by_user(
+                    user_id, chunk, session=session)
+                for workspace_id, is_owner in rows:
+                    memberships[workspace_id] = is_owner
+            return memberships
 
 
 class RegistrationService(UserService, BaseRegistrationService):
-    def __init__(self, driver: RelationalStorage):
-        UserService.__init__(self, driver)
+    def __init__(self, driver: RelationalStorage, passwords: PasswordHasher,
+                 details: DetailsCache = None):
+        UserService.__init__(self, driver, details)
+        self.passwords = passwords
+
+    def get_principal(self, user_id: Union[UUID, str]) -> Principal:
+        with read_session() as session:
+            row = UserModel.load_principal(user_id, session=session)
+            if not row:
+                return
+
+            return Principal(
+                id=row.id,
+                username=row.username,
+                is_authenticated=row.is_authenticated,
+                is_active=row.is_active,
+                is_anonymous=row.is_anonymous,
+                is_local=row.is_local,
+                is_closed=row.is_closed
+            )
 
     def get_by_username(self, username: str) -> User:
-        with orm_session() as session:
+        with read_session() as session:
             info = UserInfoModel.load_by_username(username, session=session)
             if not info:
                 return
@@ -666,7 +710,7 @@ class RegistrationService(UserService, BaseRegistrationService):
             return self.get(info.user_id)
 
     def lookup(self, username: str) -> List[User]:
-        with orm_session() as session:
+        with read_session() as session:
             info = UserInfoModel.loa(username, session=session)
             if not info:
                 return
@@ -674,7 +718,7 @@ class RegistrationService(UserService, BaseRegistrationService):
             return self.get(info.user_id)
 
     def has_by_username(self, username: str) -> bool:
-        with orm_session() as session:
+        with read_session() as session:
             info = UserInfoModel.load_by_username(username, session=session)
             if not info:
                 return False
@@ -685,16 +729,29 @@ class RegistrationService(UserService, BaseRegistrationService):
                           password: str) -> bool:
         with orm_session() as session:
             info = UserInfoModel.load_by_userid(user_id, session=session)
-            if not info:
+            if not info or info.password is None:
                 return False
-
-            return info.password == password
+            hashed = info.password.hash
+
+        # hashing is slow by design, it is done off the request thread and
+        # without holding a connection of the pool
+        release_connection()
+        valid, updated = self.passwords.verify_and_update(password, hashed)
+        if valid and updated:
+            # the hash was made by an outdated policy, now that the password
+            # is known, it is hashed again as per the current one
+            with orm_session() as session:
+                info = UserInfoModel.load_by_userid(user_id, session=session)
+                info.password = Password(updated)
+        return valid
 
     def create_local(self, username: str, password: str) -> User:
+        release_connection()
+        hashed = self.passwords.hash(password)
         with orm_session() as session:
             user = UserModel.create(
                 username, username, email=None, session=session)
-            user.info.password = password
+            user.info.password = Password(hashed)
             user.is_local = True
 
             org = OrgModel.create_personal(user, username, session=session)
@@ -744,3 +801,89 @@ class RegistrationService(UserService, BaseRegistrationService):
                     )
                 ]
             )
+
+
+###############################################################################
+# Internals
+###############################################################################
+def as_uuid(identifier: Union[UUID, str]) -> UUID:
+    """
+    Return the identifier as an `UUID` or `None` when it isn't a valid one.
+    """
+    if isinstance(identifier, UUID):
+        return identifier
+
+    try:
+        return UUID(str(identifier))
+    except ValueError:
+        return None
+
+
+def chunk_ids(identifiers: List[Union[UUID, str]],
+              size: int = IN_CLAUSE_CHUNK_SIZE) -> Iterator[List[UUID]]:
+    """
+    Split the valid and distinct identifiers into chunks no longer than
+    `size` so that they can be passed to an `IN (...)` clause.
+    """
+    ids = []
+    seen = set()
+    for identifier in identifiers:
+        identifier = as_uuid(identifier)
+        if identifier is not None and identifier not in seen:
+            seen.add(identifier)
+            ids.append(identifier)
+
+    for index in range(0, len(ids), size):
+        yield ids[index:index + size]
+
+
+def in_given_order(identifiers: List[Union[UUID, str]],
+                   entities: Dict[UUID, Any]) -> List[Any]:
+    """
+    Return the entities in the order of the given identifiers, skipping
+    those that were not found.
+    """
+    result = []
+    for identifier in identifiers:
+        entity = entities.get(as_uuid(identifier))
+        if entity is not None:
+            result.append(entity)
+    return result
+
+
+def encode_cursor(created_on: datetime, identifier: UUID) -> str:
+    """
+    Encode the keyset `(created_on, id)` of the last entity of a page into
+    an opaque cursor.
+    """
+    key = "{}|{}".format(created_on.strftime(CURSOR_DATE_FORMAT), identifier)
+    return urlsafe_b64encode(key.encode('utf-8')).decode('utf-8')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """
+    Decode a cursor generated by `encode_cursor`.
+
+    Raise `ValueError` when the cursor is not valid.
+    """
+    try:
+        key = urlsafe_b64decode(cursor.encode('utf-8')).decode('utf-8')
+        created_on, identifier = key.split("|", 1)
+        return (
+            datetime.strptime(created_on, CURSOR_DATE_FORMAT),
+            UUID(identifier)
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Invalid cursor '{}'".format(cursor))
+
+
+def paginate(items: List[Any], has_more: bool) -> Page:
+    """
+    Build the page of the given items, pointing to the next one when there
+    are more items to fetch.
+    """
+    cursor = None
+    if has_more and items:
+        last = items[-1]
+        cursor = encode_cursor(last.created_on, last.id)
+    return Page(items=items, cursor=cursor)
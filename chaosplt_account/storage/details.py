@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+from collections import OrderedDict
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from ..metrics import observe_cache
+from .model import UserInfo
+
+__all__ = ["DetailsCache"]
+
+
+class DetailsCache:
+    """
+    Decrypted details of the users, so that reading them again costs neither
+    a query nor their decryption.
+
+    Entries are keyed by the identifier of the `user_info` row and a digest
+    of the encrypted details as stored, which change with the details, so a
+    stale entry is never served, it is merely evicted once the `maxsize`
+    most recently used entries are all newer. Unlike the `last_updated`
+    column, whose resolution is the second on some databases, this tells
+    apart two updates made within the same second. A `maxsize` of `0`
+    disables the cache.
+    """
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, info: UserInfo, encrypted: Optional[bytes],
+            decrypt: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Return a copy of the details of the user, only calling `decrypt` on
+        the `encrypted` details, as read from the database, when they are not
+        cached.
+        """
+        if encrypted is None:
+            return {}
+        if not self.maxsize:
+            return dict(decrypt() or {})
+
+        key = (info.id, hashlib.sha256(encrypted).digest())
+        with self._lock:
+            details = self._entries.get(key)
+            if details is not None:
+                self._entries.move_to_end(key)
+        observe_cache("user_details", details is not None)
+
+        if details is None:
+            details = dict(decrypt() or {})
+            with self._lock:
+                self._entries[key] = details
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return dict(details)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import List, Sequence
+
+from sqlalchemy import Index, Table, inspect
+from sqlalchemy.engine import Engine
+
+from .model import Org, OrgsMembers, User, UserInfo, UserPrivacy, \
+    Workspace, WorkspacesMembers
+
+__all__ = ["missing_indexes", "ensure_indexes"]
+logger = logging.getLogger("chaosplatform")
+
+# read from the models, the metadata is cleared when the storage is released
+TABLES = tuple(
+    model.__table__ for model in (
+        User, UserInfo, UserPrivacy, Org, OrgsMembers, Workspace,
+        WorkspacesMembers))
+
+
+def missing_indexes(engine: Engine, tables: Sequence[Table] = TABLES) \
+        -> List[Index]:
+    """
+    List the indexes declared by the models which the database lacks.
+
+    Tables which do not exist yet are skipped, creating them creates their
+    indexes too. The indexes are compared by name only.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    missing = []
+    for table in tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: str(ix.name)):
+            if str(index.name) not in existing:
+                missing.append(index)
+    return missing
+
+
+def ensure_indexes(engine: Engine, tables: Sequence[Table] = TABLES,
+                   concurrently: bool = True,
+                   dry_run: bool = False) -> List[Index]:
+    """
+    Create the indexes declared by the models which the database lacks and
+    return them.
+
+    On PostgreSQL, when `concurrently` is set, they are built without locking
+    the tables against writes, outside of any transaction, which takes
+    longer. Nothing is created when `dry_run` is set.
+    """
+    missing = missing_indexes(engine, tables)
+    if dry_run:
+        return missing
+
+    concurrently = concurrently and engine.dialect.name == "postgresql"
+    for index in missing:
+        logger.info("Creating index {} on {}".format(
+            index.name, index.table.name))
+        if concurrently:
+            create_index_concurrently(engine, index)
+        else:
+            index.create(bind=engine)
+    return missing
+
+
+###############################################################################
+# Internals
+###############################################################################
+def create_index_concurrently(engine: Engine, index: Index):
+    options = index.dialect_options["postgresql"]
+    options["concurrently"] = True
+    try:
+        # `CREATE INDEX CONCURRENTLY` cannot run inside a transaction
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            index.create(bind=conn)
+    finally:
+        options["concurrently"] = False
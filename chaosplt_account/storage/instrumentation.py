@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+import attr
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+__all__ = ["QueryInstrumentation", "QueryStats", "RepeatedStatementError",
+           "instrument_engine", "begin_query_stats", "end_query_stats",
+           "current_query_stats", "inspect_queries", "statement_shape"]
+logger = logging.getLogger("chaosplatform")
+
+_local = threading.local()
+# a parenthesized list of bound parameters, such as the ones of `IN (...)`
+_PARAMS_LIST = re.compile(
+    r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_WHITESPACES = re.compile(r"\s+")
+
+
+class RepeatedStatementError(Exception):
+    pass
+
+
+@attr.s
+class QueryStats:
+    statements: int = attr.ib(default=0)
+    # seconds spent executing the statements
+    duration: float = attr.ib(default=0.0)
+    shapes: Counter = attr.ib(factory=Counter)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """
+        Shapes of the statements executed more than `threshold` times, the
+        most repeated first.
+        """
+        return [
+            (shape, count) for (shape, count) in self.shapes.most_common()
+            if count > threshold
+        ]
+
+    def server_timing(self) -> str:
+        """
+        Value of the `Server-Timing` header describing these statements.
+        """
+        return 'db;dur={:.2f};desc="{} statements"'.format(
+            self.duration * 1000, self.statements)
+
+
+@attr.s
+class QueryInstrumentation:
+    # every statement is then shaped, which has a cost, meant for tests
+    enabled: bool = attr.ib(default=False)
+    # a statement shape executed more than that many times while serving a
+    # single request is most likely executed in a loop
+    repeat_threshold: int = attr.ib(default=10)
+    fail_on_repeat: bool = attr.ib(default=False)
+    # tells clients how much the request queried, for debugging only
+    server_timing: bool = attr.ib(default=False)
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> 'QueryInstrumentation':
+        settings = config.get("db", {}).get("instrumentation", {})
+        return QueryInstrumentation(
+            enabled=settings.get("enabled", False),
+            repeat_threshold=settings.get("repeat_threshold", 10),
+            fail_on_repeat=settings.get("fail_on_repeat", False),
+            server_timing=settings.get("server_timing", False)
+        )
+
+    def check(self, stats: QueryStats, context: str):
+        """
+        Warn about, or fail with a `RepeatedStatementError` when
+        `fail_on_repeat` is set, the statements repeated more than the
+        threshold. The `context` tells what was being done, a request for
+        instance.
+        """
+        repeated = stats.repeated(self.repeat_threshold)
+        if not repeated:
+            return
+
+        message = "{} executed {} statements, repeating: {}".format(
+            context, stats.statements, "; ".join(
+                "{} times '{}'".format(count, shape)
+                for (shape, count) in repeated))
+        if self.fail_on_repeat:
+            raise RepeatedStatementError(message)
+        logger.warning(message)
+
+
+def instrument_engine(engine: Engine):
+    """
+    Record the statements executed through `engine` into the statistics of
+    the current thread, when recording. Instrumenting the same engine twice
+    does nothing.
+    """
+    if event.contains(engine, "before_cursor_execute", _before_execute):
+        return
+
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+def begin_query_stats() -> bool:
+    """
+    Start recording the statements executed by the current thread.
+
+    Return `False` when already recording, in which case the statistics
+    gathered so far are kept.
+    """
+    if current_query_stats() is not None:
+        return False
+
+    _local.stats = QueryStats()
+    return True
+
+
+def end_query_stats() -> QueryStats:
+    """
+    Stop recording the statements executed by the current thread and return
+    what was recorded, or `None` when not recording.
+    """
+    stats = current_query_stats()
+    _local.stats = None
+    return stats
+
+
+def current_query_stats() -> QueryStats:
+    return getattr(_local, "stats", None)
+
+
+def inspect_queries(instrumentation: QueryInstrumentation, response: Any,
+                    context: str):
+    """
+    Stop recording the statements executed by the current thread, check
+    them and, when `server_timing` is set, tell how long they took in the
+    `Server-Timing` header of the `response`.
+    """
+    stats = end_query_stats()
+    if stats is None or instrumentation is None:
+        return
+
+    if instrumentation.server_timing:
+        response.headers.add("Server-Timing", stats.server_timing())
+    instrumentation.check(stats, context)
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Normalize the statement so that executions only differing by the number
+    of bound parameters of their `IN (...)` clauses share the same shape.
+    """
+    statement = _WHITESPACES.sub(" ", statement).strip()
+    return _PARAMS_LIST.sub("(?)", statement)
+
+
+###############################################################################
+# Internals
+###############################################################################
+def _before_execute(conn, cursor, statement, parameters, context,
+                    executemany):
+    if current_query_stats() is not None and context is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context,
+                   executemany):
+    stats = current_query_stats()
+    if stats is None:
+        return
+
+    started = getattr(context, "_query_started", None)
+    if started is not None:
+        stats.duration += time.perf_counter() - started
+    stats.statements += 1
+    stats.shapes[statement_shape(statement)] += 1
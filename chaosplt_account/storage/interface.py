@@ -3,10 +3,14 @@ from uuid import UUID
 from typing import Dict, List, NoReturn, Union
 
 import attr
-from chaosplt_account.model import User, Organization, Workspace, \
-    OrganizationMember, WorkspaceCollaborator
+from chaosplt_account.model import User, Organization, Page, Principal, \
+    Workspace, OrganizationMember, WorkspaceCollaborator
 
-__all__ = ["BaseAccountStorage"]
+from .instrumentation import QueryInstrumentation
+
+__all__ = ["BaseAccountStorage", "DEFAULT_PAGE_SIZE"]
+
+DEFAULT_PAGE_SIZE = 100
 
 
 class BaseRegistrationService(ABC):
@@ -14,6 +18,14 @@ class BaseRegistrationService(ABC):
     def get(self, user_id: Union[UUID, str]) -> User:
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_principal(self, user_id: Union[UUID, str]) -> Principal:
+        """
+        Load only what authenticating the user requires, none of its orgs
+        or workspaces.
+        """
+        raise NotImplementedError()
+
     @abstractmethod
     def get_by_username(self, username: str) -> User:
         raise NotImplementedError()
@@ -85,7 +97,12 @@ class BaseUserService(ABC):
 
 class BaseOrganizationService(ABC):
     @abstractmethod
-    def list_all(self) -> List[Organization]:
+    def list_all(self, cursor: str = None,
+                 limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        """
+        Return a page of at most `limit` orgs, ordered by creation date,
+        starting right after the given `cursor` or from the first one.
+        """
         raise NotImplementedError()
 
     @abstractmethod
@@ -172,7 +189,12 @@ class BaseOrganizationService(ABC):
 
 class BaseWorkspaceService(ABC):
     @abstractmethod
-    def list_all(self) -> List[Workspace]:
+    def list_all(self, cursor: str = None,
+                 limit: int = DEFAULT_PAGE_SIZE) -> Page:
+        """
+        Return a page of at most `limit` workspaces, ordered by creation
+        date, starting right after the given `cursor` or from the first one.
+        """
         raise NotImplementedError()
 
     @abstractmethod
@@ -224,6 +246,17 @@ class BaseWorkspaceService(ABC):
                  user_id: Union[str, UUID]) -> bool:
         raise NotImplementedError()
 
+    @abstractmethod
+    def get_memberships(self, user_id: Union[UUID, str],
+                        workspace_ids: List[Union[UUID, str]]) \
+            -> Dict[UUID, bool]:
+        """
+        Map each of the given workspaces the user collaborates on to whether
+        the user owns it. Workspaces the user is not a collaborator of are
+        not part of the result.
+        """
+        raise NotImplementedError()
+
 
 @attr.s
 class BaseAccountStorage:
@@ -231,3 +264,6 @@ class BaseAccountStorage:
     org: BaseOrganizationService = attr.ib()
     workspace: BaseWorkspaceService = attr.ib()
     registration: BaseRegistrationService = attr.ib()
+    # how the statements executed while serving a request are inspected,
+    # they are not when unset
+    instrumentation: QueryInstrumentation = attr.ib(default=None)
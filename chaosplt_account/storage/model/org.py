@@ -1,19 +1,21 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime
 from enum import Enum
-from typing import List, NoReturn, Union
+from typing import List, NoReturn, Tuple, Union
 import uuid
 from uuid import UUID
 
 from chaosplt_relational_storage.db import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, \
-    String, func
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, \
+    String, and_, func, or_
 from sqlalchemy import Enum as EnumType
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import relationship, selectinload
 from sqlalchemy.orm.session import Session
-from sqlalchemy_utils import UUIDType
 from sqlalchemy_utils import JSONType as JSONB
 
 from . import ExperimentVisibility, ExecutionVisibility
+from .types import UUIDKey
 from .user import User
 
 __all__ = ["OrgsMembers", "Org", "OrgType"]
@@ -21,11 +23,17 @@ __all__ = ["OrgsMembers", "Org", "OrgType"]
 
 class OrgsMembers(Base):  # type: ignore
     __tablename__ = "orgs_members"
+    # the primary key leads with the org, this one serves the lookups of the
+    # orgs of a user, and their ownership, from the index alone
+    __table_args__ = (
+        Index(
+            "ix_orgs_members_user_id", "user_id", "is_owner", "org_id"),
+    )
 
     org_id = Column(
-        UUIDType(binary=False), ForeignKey('org.id'), primary_key=True)
+        UUIDKey(), ForeignKey('org.id'), primary_key=True)
     user_id = Column(
-        UUIDType(binary=False), ForeignKey('user.id'), primary_key=True)
+        UUIDKey(), ForeignKey('user.id'), primary_key=True)
     is_owner = Column(Boolean(name='is_owner'), default=False)
     user = relationship('User')
     organization = relationship('Org')
@@ -60,10 +68,40 @@ class OrgsMembers(Base):  # type: ignore
             filter_by(user_id=user_id).\
             first()
 
+    @staticmethod
+    def has_member(org_id: Union[UUID, str], user_id: Union[UUID, str],
+                   session: Session) -> bool:
+        """
+        Return `True` when the user is a member of the org, without loading
+        the org itself.
+        """
+        query = session.query(OrgsMembers).\
+            filter_by(org_id=org_id).\
+            filter_by(user_id=user_id)
+        return session.query(query.exists()).scalar()
+
+    @staticmethod
+    def has_owner(org_id: Union[UUID, str], user_id: Union[UUID, str],
+                  session: Session) -> bool:
+        """
+        Return `True` when the user is an owner of the org, without loading
+        the org itself.
+        """
+        query = session.query(OrgsMembers).\
+            filter_by(org_id=org_id).\
+            filter_by(user_id=user_id).\
+            filter_by(is_owner=True)
+        return session.query(query.exists()).scalar()
+
     @staticmethod
     def get_by_org(org_id: Union[UUID, str],
                    session: Session) -> 'OrgsMembers':
+        """
+        Load the memberships of the org along with their users and infos, in
+        a single query. The orgs and workspaces of the users are not loaded.
+        """
         return session.query(OrgsMembers).\
+            options(*User.member_loading(OrgsMembers.user)).\
             filter_by(org_id=org_id).\
             all()
 
@@ -102,18 +140,28 @@ DEFAULT_ORG_SETTINGS = {  # type: ignore
 
 class Org(Base):  # type: ignore
     __tablename__ = 'org'
+    # pages of orgs are read in that order, see `load_page`
+    __table_args__ = (
+        Index("ix_org_created_on_id", "created_on", "id"),
+    )
 
     id = Column(
-        UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+        UUIDKey(), primary_key=True, default=uuid.uuid4)
     # only set when this is a personal org linked to a single account,
     # otherwise it's not set
     user_id = Column(
-        UUIDType(binary=False), ForeignKey('user.id'), nullable=True)
+        UUIDKey(), ForeignKey('user.id'), nullable=True,
+        index=True)
     name = Column(String(), nullable=False, unique=True)
     name_lower = Column(String(), nullable=False, unique=True)
     kind = Column(
         EnumType(OrgType), nullable=False, default=OrgType.personal)
-    created_on = Column(DateTime(), server_default=func.now())
+    # SQLite stores the server default without microseconds, bound values
+    # must be formatted the same way for the keyset pagination to compare
+    created_on = Column(
+        DateTime().with_variant(
+            sqlite.DATETIME(truncate_microseconds=True), "sqlite"),
+        server_default=func.now())
     workspaces = relationship(
         'Workspace', backref='org', cascade="all, delete-orphan")
     settings = Column(
@@ -123,9 +171,40 @@ class Org(Base):  # type: ignore
     def load_all(session: Session) -> List['Org']:
         return session.query(Org).all()
 
+    @staticmethod
+    def load_page(after: Tuple[datetime, UUID], limit: int,
+                  session: Session) -> List['Org']:
+        """
+        Load at most `limit` orgs ordered by `(created_on, id)` and coming
+        strictly after the `after` key, or from the first org when `None`.
+        """
+        query = session.query(Org)
+        if after:
+            created_on, org_id = after
+            # the first term bounds the range read from the index, the
+            # second one skips the rows of the previous page
+            query = query.filter(
+                Org.created_on >= created_on,
+                or_(Org.created_on > created_on,
+                    and_(Org.created_on == created_on, Org.id > org_id)))
+        return query.order_by(Org.created_on, Org.id).limit(limit).all()
+
     @staticmethod
     def load(org_id: Union[UUID, str], session: Session) -> 'Org':
-        return session.query(Org).filter_by(id=org_id).first()
+        return session.query(Org).get(org_id)
+
+    @staticmethod
+    def load_many(org_ids: List[Union[UUID, str]],
+                  session: Session) -> List['Org']:
+        """
+        Load the orgs matching the given identifiers with a single `IN`
+        query. Their workspaces are fetched by one additional query.
+
+        The result is not ordered and unknown identifiers are ignored.
+        """
+        return session.query(Org).\
+            options(selectinload(Org.workspaces)).\
+            filter(Org.id.in_(org_ids)).all()
 
     @staticmethod
     def load_by_name(org_name: str, session: Session) -> 'Org':
@@ -140,6 +219,18 @@ class Org(Base):  # type: ignore
                 session.query(OrgsMembers.org_id).filter_by(user_id=user_id)
             )).all()
 
+    @staticmethod
+    def load_by_user_with_ownership(user_id: Union[UUID, str],
+                                    session: Session) \
+            -> List[Tuple['Org', bool]]:
+        """
+        Load all the orgs the user is a member of, each paired with the
+        `is_owner` flag of that membership, in a single query.
+        """
+        return session.query(Org, OrgsMembers.is_owner).\
+            join(OrgsMembers, OrgsMembers.org_id == Org.id).\
+            filter(OrgsMembers.user_id == user_id).all()
+
     @staticmethod
     def create_personal(user: User, org_name: str,
                         session: Session) -> 'Org':
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import uuid
+
+from sqlalchemy import types
+from sqlalchemy_utils import UUIDType
+
+__all__ = ["UUIDKey", "UUID_STORAGES", "UUID_STORAGE_ATTR"]
+
+UUID_STORAGES = ("char", "binary")
+# attribute of the engine's dialect telling how UUIDs are stored
+UUID_STORAGE_ATTR = "chaosplatform_uuid_storage"
+NATIVE_UUID_DIALECTS = ("postgresql", "cockroachdb", "mssql")
+
+
+class UUIDKey(UUIDType):
+    """
+    UUID of the primary and foreign keys.
+
+    PostgreSQL stores it natively. Other databases store it as its 32
+    hexadecimal characters or, when the `uuid_storage` of the engine is
+    `binary`, as 16 bytes. Values are read back from either form.
+    """
+    def __init__(self):
+        UUIDType.__init__(self, binary=False)
+
+    def stores_binary(self, dialect) -> bool:
+        if self.native and dialect.name in NATIVE_UUID_DIALECTS:
+            return False
+        return getattr(dialect, UUID_STORAGE_ATTR, "char") == "binary"
+
+    def load_dialect_impl(self, dialect):
+        if self.stores_binary(dialect):
+            return dialect.type_descriptor(types.BINARY(16))
+        return UUIDType.load_dialect_impl(self, dialect)
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not self.stores_binary(dialect):
+            return UUIDType.process_bind_param(self, value, dialect)
+        if not isinstance(value, uuid.UUID):
+            value = self._coerce(value)
+        return value.bytes
+
+    def process_result_value(self, value, dialect):
+        if isinstance(value, bytes) and len(value) == 16:
+            return uuid.UUID(bytes=value)
+        return UUIDType.process_result_value(self, value, dialect)
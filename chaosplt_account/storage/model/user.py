@@ -1,18 +1,22 @@
 # -*- coding: utf-8 -*-
-from typing import NoReturn, Union
+from typing import Any, Dict, List, NoReturn, Optional, Tuple, Union
 import uuid
 from uuid import UUID
 
 from chaosplt_relational_storage.db import Base, get_secret_key
 from flask_login import UserMixin
 from sqlalchemy import Boolean, Column, DateTime, ForeignKey, \
-    String, func
-from sqlalchemy.orm import backref, relationship
+    LargeBinary, String, func, type_coerce
+from sqlalchemy.orm import backref, contains_eager, defaultload, deferred, \
+    joinedload, lazyload, relationship
+from sqlalchemy.orm.strategy_options import Load
 from sqlalchemy.orm.session import Session
-from sqlalchemy_utils import EncryptedType, PasswordType, UUIDType
+from sqlalchemy_utils import EncryptedType, PasswordType
 from sqlalchemy_utils.types.encrypted.encrypted_type import AesEngine
 from sqlalchemy_utils import JSONType as JSONB
 
+from .types import UUIDKey
+
 __all__ = ["User", "UserInfo", "UserPrivacy"]
 
 
@@ -20,7 +24,7 @@ class User(Base, UserMixin):  # type: ignore
     __tablename__ = 'user'
 
     id = Column(
-        UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+        UUIDKey(), primary_key=True, default=uuid.uuid4)
     joined_dt = Column(DateTime(), server_default=func.now())
     closed_dt = Column(DateTime())
     inactive_dt = Column(DateTime())
@@ -49,7 +53,53 @@ class User(Base, UserMixin):  # type: ignore
 
     @staticmethod
     def load(user_id: Union[UUID, str], session: Session) -> 'User':
-        return session.query(User).filter_by(id=user_id).first()
+        return session.query(User).get(user_id)
+
+    @staticmethod
+    def load_with_info(user_id: Union[UUID, str], session: Session) \
+            -> Optional[Tuple['User', bytes]]:
+        """
+        Load the user along with its info and personal org in a single query.
+        The details of the info are returned alongside, still encrypted, see
+        `UserInfo.decrypt_details`.
+
+        The orgs and workspaces relationships are not loaded, use
+        `Org.load_by_user_with_ownership` and
+        `Workspace.load_by_user_with_ownership` to fetch them along with the
+        membership flags.
+        """
+        return session.query(
+            User, type_coerce(UserInfo.details, LargeBinary)).\
+            outerjoin(User.info).\
+            options(
+                contains_eager(User.info), joinedload(User.personal_org),
+                lazyload(User.orgs), lazyload(User.workspaces)).\
+            filter(User.id == user_id).first()
+
+    @staticmethod
+    def member_loading(relation) -> List[Load]:
+        """
+        Options loading the users of memberships, through their `relation`,
+        along with their info but without their orgs and workspaces.
+        """
+        return [
+            joinedload(relation).joinedload(User.info),
+            defaultload(relation).lazyload(User.orgs),
+            defaultload(relation).lazyload(User.workspaces)
+        ]
+
+    @staticmethod
+    def load_principal(user_id: Union[UUID, str], session: Session):
+        """
+        Load the user's flags and username as a single row, without its
+        encrypted details nor any of its relationships.
+        """
+        return session.query(
+            User.id, User.is_authenticated, User.is_active,
+            User.is_anonymous, User.is_local, User.is_closed,
+            UserInfo.username).\
+            join(UserInfo, UserInfo.user_id == User.id).\
+            filter(User.id == user_id).first()
 
     @staticmethod
     def create(username: str, name: str, email: str,
@@ -86,10 +136,10 @@ class UserInfo(Base):  # type: ignore
     __tablename__ = 'user_info'
 
     id = Column(
-        UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+        UUIDKey(), primary_key=True, default=uuid.uuid4)
     user_id = Column(
-        UUIDType(binary=False), ForeignKey('user.id'),
-        nullable=False)
+        UUIDKey(), ForeignKey('user.id'),
+        nullable=False, index=True)
     last_updated = Column(
         DateTime(), server_default=func.now(),
         onupdate=func.current_timestamp())
@@ -102,9 +152,21 @@ class UserInfo(Base):  # type: ignore
     lower_username = Column(String, index=True, nullable=True)
     fullname = Column(String, index=True, nullable=True)
 
-    details = Column(
+    # decrypting and parsing the details is costly, they are only loaded
+    # when read, through the `DetailsCache` of the storage
+    details = deferred(Column(
         EncryptedType(
-            JSONB, get_secret_key, AesEngine, 'pkcs5'))
+            JSONB, get_secret_key, AesEngine, 'pkcs5')))
+
+    @staticmethod
+    def decrypt_details(encrypted: Optional[bytes],
+                        session: Session) -> Dict[str, Any]:
+        """
+        Decrypt and parse the details as read from the database.
+        """
+        details_type = UserInfo.__table__.c.details.type
+        return details_type.process_result_value(
+            encrypted, session.get_bind().dialect)
 
     @staticmethod
     def load_by_userid(user_id: Union[UUID, str],
@@ -121,9 +183,9 @@ class UserPrivacy(Base):  # type: ignore
     __tablename__ = 'user_privacy'
 
     id = Column(
-        UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+        UUIDKey(), primary_key=True, default=uuid.uuid4)
     user_id = Column(
-        UUIDType(binary=False), ForeignKey('user.id'),
-        nullable=False)
+        UUIDKey(), ForeignKey('user.id'),
+        nullable=False, index=True)
     last_changed = Column(DateTime(), server_default=func.now())
     details = Column(JSONB())
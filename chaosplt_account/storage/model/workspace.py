@@ -1,20 +1,22 @@
 # -*- coding: utf-8 -*-
+from datetime import datetime
 from enum import Enum
-from typing import Dict, List, NoReturn, Union
+from typing import Dict, List, NoReturn, Tuple, Union
 import uuid
 from uuid import UUID
 
 from chaosplt_relational_storage.db import Base
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String, \
-    UniqueConstraint, func
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, \
+    String, UniqueConstraint, and_, func, or_
 from sqlalchemy import Enum as EnumType
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import joinedload, relationship
 from sqlalchemy.orm.session import Session
-from sqlalchemy_utils import UUIDType
 from sqlalchemy_utils import JSONType as JSONB
 
 from . import ExperimentVisibility, ExecutionVisibility
 from .org import Org
+from .types import UUIDKey
 from .user import User
 
 __all__ = ["Workspace", "WorkspacesMembers", "WorkspaceType"]
@@ -22,11 +24,18 @@ __all__ = ["Workspace", "WorkspacesMembers", "WorkspaceType"]
 
 class WorkspacesMembers(Base):  # type: ignore
     __tablename__ = "workspaces_members"
+    # the primary key leads with the workspace, this one serves the lookups
+    # of the workspaces of a user, and their ownership, from the index alone
+    __table_args__ = (
+        Index(
+            "ix_workspaces_members_user_id", "user_id", "is_owner",
+            "workspace_id"),
+    )
 
     workspace_id = Column(
-        UUIDType(binary=False), ForeignKey('workspace.id'), primary_key=True)
+        UUIDKey(), ForeignKey('workspace.id'), primary_key=True)
     user_id = Column(
-        UUIDType(binary=False), ForeignKey('user.id'), primary_key=True)
+        UUIDKey(), ForeignKey('user.id'), primary_key=True)
     is_owner = Column(Boolean(name='is_owner'), default=False)
     user = relationship('User')
     workspace = relationship('Workspace')
@@ -62,10 +71,56 @@ class WorkspacesMembers(Base):  # type: ignore
             filter_by(user_id=user_id).\
             first()
 
+    @staticmethod
+    def has_collaborator(workspace_id: Union[UUID, str],
+                         user_id: Union[UUID, str],
+                         session: Session) -> bool:
+        """
+        Return `True` when the user is a collaborator of the workspace,
+        without loading the workspace itself.
+        """
+        query = session.query(WorkspacesMembers).\
+            filter_by(workspace_id=workspace_id).\
+            filter_by(user_id=user_id)
+        return session.query(query.exists()).scalar()
+
+    @staticmethod
+    def has_owner(workspace_id: Union[UUID, str], user_id: Union[UUID, str],
+                  session: Session) -> bool:
+        """
+        Return `True` when the user is an owner of the workspace, without
+        loading the workspace itself.
+        """
+        query = session.query(WorkspacesMembers).\
+            filter_by(workspace_id=workspace_id).\
+            filter_by(user_id=user_id).\
+            filter_by(is_owner=True)
+        return session.query(query.exists()).scalar()
+
+    @staticmethod
+    def load_ownership_by_user(user_id: Union[UUID, str],
+                               workspace_ids: List[Union[UUID, str]],
+                               session: Session) -> List[Tuple[UUID, bool]]:
+        """
+        Load the `(workspace_id, is_owner)` pairs of the workspaces, amongst
+        the given ones, the user collaborates on.
+        """
+        return session.query(
+            WorkspacesMembers.workspace_id, WorkspacesMembers.is_owner).\
+            filter(WorkspacesMembers.user_id == user_id).\
+            filter(WorkspacesMembers.workspace_id.in_(workspace_ids)).\
+            all()
+
     @staticmethod
     def get_by_workspace(workspace_id: Union[UUID, str],
                          session: Session) -> List['WorkspacesMembers']:
+        """
+        Load the collaborators of the workspace along with their users and
+        infos, in a single query. The orgs and workspaces of the users are
+        not loaded.
+        """
         return session.query(WorkspacesMembers).\
+            options(*User.member_loading(WorkspacesMembers.user)).\
             filter_by(workspace_id=workspace_id).\
             all()
 
@@ -119,18 +174,26 @@ class Workspace(Base):  # type: ignore
         UniqueConstraint(
             'name', 'org_id'
         ),
+        # pages of workspaces are read in that order, see `load_page`
+        Index("ix_workspace_created_on_id", "created_on", "id"),
     )
 
     id = Column(
-        UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+        UUIDKey(), primary_key=True, default=uuid.uuid4)
     name = Column(String(), nullable=False)
     name_lower = Column(String(), nullable=False)
     kind = Column(
         EnumType(WorkspaceType), nullable=False,
         default=WorkspaceType.personal)
-    created_on = Column(DateTime(), server_default=func.now())
+    # SQLite stores the server default without microseconds, bound values
+    # must be formatted the same way for the keyset pagination to compare
+    created_on = Column(
+        DateTime().with_variant(
+            sqlite.DATETIME(truncate_microseconds=True), "sqlite"),
+        server_default=func.now())
     org_id = Column(
-        UUIDType(binary=False), ForeignKey('org.id'), nullable=False)
+        UUIDKey(), ForeignKey('org.id'), nullable=False,
+        index=True)
     settings = Column(
         JSONB(), nullable=False, default=DEFAULT_WORKSPACE_SETTINGS)
 
@@ -138,9 +201,43 @@ class Workspace(Base):  # type: ignore
     def load_all(session: Session) -> List['Workspace']:
         return session.query(Workspace).all()
 
+    @staticmethod
+    def load_page(after: Tuple[datetime, UUID], limit: int,
+                  session: Session) -> List['Workspace']:
+        """
+        Load at most `limit` workspaces, along with their org, ordered by
+        `(created_on, id)` and coming strictly after the `after` key, or from
+        the first workspace when `None`.
+        """
+        query = session.query(Workspace).options(joinedload(Workspace.org))
+        if after:
+            created_on, workspace_id = after
+            # the first term bounds the range read from the index, the
+            # second one skips the rows of the previous page
+            query = query.filter(
+                Workspace.created_on >= created_on,
+                or_(Workspace.created_on > created_on,
+                    and_(Workspace.created_on == created_on,
+                         Workspace.id > workspace_id)))
+        return query.order_by(
+            Workspace.created_on, Workspace.id).limit(limit).all()
+
     @staticmethod
     def load(workspace_id: Union[UUID, str], session: Session) -> 'Workspace':
-        return session.query(Workspace).filter_by(id=workspace_id).first()
+        return session.query(Workspace).get(workspace_id)
+
+    @staticmethod
+    def load_many(workspace_ids: List[Union[UUID, str]],
+                  session: Session) -> List['Workspace']:
+        """
+        Load the workspaces matching the given identifiers, along with their
+        org, with a single `IN` query.
+
+        The result is not ordered and unknown identifiers are ignored.
+        """
+        return session.query(Workspace).\
+            options(joinedload(Workspace.org)).\
+            filter(Workspace.id.in_(workspace_ids)).all()
 
     @staticmethod
     def load_by_name(org_id: Union[UUID, str],
@@ -185,6 +282,22 @@ class Workspace(Base):  # type: ignore
                 session.query(WorkspacesMembers.workspace_id).
                 filter_by(user_id=user_id))).all()
 
+    @staticmethod
+    def load_by_user_with_ownership(user_id: Union[UUID, str],
+                                    session: Session) \
+            -> List[Tuple['Workspace', bool]]:
+        """
+        Load all the workspaces the user collaborates on, each paired with
+        the `is_owner` flag of that membership, in a single query.
+
+        The org of each workspace is eagerly loaded as well.
+        """
+        return session.query(Workspace, WorkspacesMembers.is_owner).\
+            join(WorkspacesMembers,
+                 WorkspacesMembers.workspace_id == Workspace.id).\
+            options(joinedload(Workspace.org)).\
+            filter(WorkspacesMembers.user_id == user_id).all()
+
     def is_collaborator(self, user_id: Union[str, uuid.UUID]) -> bool:
         """
         Return `True` when the given account is a collaborator of the
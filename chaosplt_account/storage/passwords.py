@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+from concurrent.futures import Executor, ProcessPoolExecutor, \
+    ThreadPoolExecutor
+from functools import lru_cache
+import logging
+import math
+import multiprocessing
+import statistics
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import attr
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from ..metrics import observe_password_hash, observe_password_rejected
+from .model import UserInfo
+
+__all__ = ["PasswordSettings", "PasswordPolicy", "PasswordHasher",
+           "PasswordHashingBusy", "password_context", "calibrate_rounds",
+           "SCHEMES"]
+logger = logging.getLogger("chaosplatform")
+
+# schemes passwords can be hashed with, the first one was the only one
+SCHEMES = ("pbkdf2_sha512", "pbkdf2_sha256", "sha512_crypt", "bcrypt",
+           "scrypt")
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when too many passwords are already waiting to be hashed.
+    """
+    def __init__(self, retry_after: int):
+        Exception.__init__(
+            self, "Too many passwords waiting to be hashed, retry in "
+                  "{}s".format(retry_after))
+        self.retry_after = retry_after
+
+
+@attr.s
+class PasswordSettings:
+    workers: int = attr.ib(default=2)
+    # calls waiting for a worker, beyond which they are rejected
+    max_queued: int = attr.ib(default=16)
+    # hash on processes rather than threads, to use the other cores
+    processes: bool = attr.ib(default=False)
+    # seconds clients are told to wait when their call was rejected
+    retry_after: int = attr.ib(default=1)
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> 'PasswordSettings':
+        settings = config.get("passwords", {})
+        return PasswordSettings(
+            workers=settings.get("workers", 2),
+            max_queued=settings.get("max_queued", 16),
+            processes=settings.get("processes", False),
+            retry_after=settings.get("retry_after", 1)
+        )
+
+
+@attr.s
+class PasswordPolicy:
+    scheme: str = attr.ib(default="pbkdf2_sha512")
+    # cost of the scheme, the default of passlib when unset
+    rounds: int = attr.ib(default=None)
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> 'PasswordPolicy':
+        settings = config.get("passwords", {})
+        return PasswordPolicy(
+            scheme=settings.get("scheme", "pbkdf2_sha512"),
+            rounds=settings.get("rounds")
+        )
+
+
+def password_context(policy: PasswordPolicy = None) -> CryptContext:
+    """
+    Context which hashes the passwords of the users as per the `policy`.
+
+    Hashes made with another scheme, or with other rounds when these are
+    set, still verify but are deemed outdated, see `verify_and_update`.
+    Without a policy, this is the context of the `UserInfo.password` column.
+    """
+    if policy is None:
+        return UserInfo.__table__.c.password.type.context
+
+    if policy.scheme not in SCHEMES:
+        raise ValueError(
+            "Password scheme must be one of {}, not '{}'".format(
+                ", ".join(SCHEMES), policy.scheme))
+
+    schemes = [policy.scheme] + [s for s in SCHEMES if s != policy.scheme]
+    options = {}
+    if policy.rounds:
+        for option in ("rounds", "min_rounds", "max_rounds"):
+            options["{}__{}".format(policy.scheme, option)] = policy.rounds
+    return CryptContext(
+        schemes=schemes, default=policy.scheme, deprecated=schemes[1:],
+        **options)
+
+
+def calibrate_rounds(scheme: str, target: float, samples: int = 5,
+                     attempts: int = 4) -> Tuple[int, float]:
+    """
+    Search the rounds for which hashing a password with `scheme` takes about
+    `target` seconds on this machine.
+
+    Return those rounds and the median duration of a hash they lead to.
+    """
+    handler = get_crypt_handler(scheme)
+    rounds = handler.default_rounds
+    duration = time_hash(handler, rounds, samples)
+    for _ in range(attempts):
+        if handler.rounds_cost == "log2":
+            # each round doubles the cost
+            wanted = rounds + round(math.log2(target / duration))
+        else:
+            wanted = int(rounds * target / duration)
+        wanted = min(max(wanted, handler.min_rounds), handler.max_rounds)
+        if wanted == rounds:
+            break
+        rounds = wanted
+        duration = time_hash(handler, rounds, samples)
+    return (rounds, duration)
+
+
+class PasswordHasher:
+    """
+    Hash and verify passwords on a pool of `workers` threads, or processes,
+    so that a burst of sign ins does not hold every thread serving requests.
+
+    At most `max_queued` calls wait for a worker, further ones are rejected
+    right away with `PasswordHashingBusy`.
+    """
+    def __init__(self, context: CryptContext, settings: PasswordSettings):
+        self.settings = settings
+        # a string, so that the processes can load the context too
+        self.policy = context.to_string()
+        self._slots = threading.BoundedSemaphore(
+            settings.workers + settings.max_queued)
+        self._executor = create_executor(settings)
+
+    def hash(self, secret: str) -> str:
+        """
+        Hash the secret as per the context's default scheme.
+        """
+        return self._run("hash", secret)
+
+    def verify(self, secret: str, hashed: bytes) -> bool:
+        """
+        Tell whether the secret matches the hash.
+        """
+        return self._run("verify", secret, hashed)
+
+    def verify_and_update(self, secret: str, hashed: bytes) \
+            -> Tuple[bool, Optional[str]]:
+        """
+        Tell whether the secret matches the hash and, if so and the hash is
+        outdated, give a new hash of the secret as per the current policy.
+        """
+        return self._run("verify_and_update", secret, hashed)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, operation: str, *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            observe_password_rejected()
+            raise PasswordHashingBusy(self.settings.retry_after)
+
+        try:
+            submitted = time.perf_counter()
+            future = self._executor.submit(
+                run_password_job, self.policy, operation, *args)
+            result, duration = future.result()
+            waited = time.perf_counter() - submitted - duration
+            observe_password_hash(operation, max(0.0, waited), duration)
+            return result
+        finally:
+            self._slots.release()
+
+
+###############################################################################
+# Internals
+###############################################################################
+def create_executor(settings: PasswordSettings) -> Executor:
+    if settings.processes:
+        # never fork a process which runs threads already
+        return ProcessPoolExecutor(
+            max_workers=settings.workers,
+            mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(
+        max_workers=settings.workers, thread_name_prefix="passwords")
+
+
+@lru_cache(maxsize=8)
+def load_context(policy: str) -> CryptContext:
+    return CryptContext.from_string(policy)
+
+
+def run_password_job(policy: str, operation: str, *args) \
+        -> Tuple[Any, float]:
+    """
+    Run the operation in a worker and return its result along with how long
+    it took.
+    """
+    started = time.perf_counter()
+    context = load_context(policy)
+    result = getattr(context, operation)(*args)
+    return (result, time.perf_counter() - started)
+
+
+def time_hash(handler: Any, rounds: int, samples: int) -> float:
+    hasher = handler.using(rounds=rounds)
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("calibration")
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
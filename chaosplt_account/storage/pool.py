@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from typing import Any, Dict
+
+import attr
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+__all__ = ["PoolSettings", "create_pooled_engine", "warm_up_engine"]
+logger = logging.getLogger("chaosplatform")
+
+STATEMENT_TIMEOUT_DIALECTS = ("postgresql", "mysql")
+
+
+@attr.s
+class PoolSettings:
+    pool_size: int = attr.ib(default=5)
+    max_overflow: int = attr.ib(default=10)
+    # seconds to wait for a connection when they are all checked out
+    pool_timeout: float = attr.ib(default=30)
+    # seconds after which a connection is replaced, -1 to keep it forever
+    pool_recycle: int = attr.ib(default=-1)
+    pool_pre_ping: bool = attr.ib(default=False)
+    # milliseconds, no limit when unset
+    statement_timeout: int = attr.ib(default=None)
+
+    @staticmethod
+    def from_config(config: Dict[str, Any]) -> 'PoolSettings':
+        settings = config.get("db", {})
+        return PoolSettings(
+            pool_size=settings.get("pool_size", 5),
+            max_overflow=settings.get("max_overflow", 10),
+            pool_timeout=settings.get("pool_timeout", 30),
+            pool_recycle=settings.get("pool_recycle", -1),
+            pool_pre_ping=settings.get("pool_pre_ping", False),
+            statement_timeout=settings.get("statement_timeout")
+        )
+
+
+def create_pooled_engine(uri: str, settings: PoolSettings,
+                         echo: bool = False) -> Engine:
+    """
+    Create an engine whose connection pool is sized as per `settings`.
+
+    Sessions are limited to `statement_timeout` on PostgreSQL and MySQL,
+    the setting is ignored with a warning for other databases.
+    """
+    backend = make_url(uri).get_backend_name()
+    timeout = settings.statement_timeout
+    if timeout and backend not in STATEMENT_TIMEOUT_DIALECTS:
+        logger.warning(
+            "Statement timeout is not supported with {}, ignoring it".format(
+                backend))
+        timeout = None
+
+    connect_args = {}
+    if timeout and backend == "postgresql":
+        # a session parameter, a `SET` would be undone by the first rollback
+        connect_args["options"] = "-c statement_timeout={:d}".format(
+            int(timeout))
+
+    engine = create_engine(
+        uri, echo=echo, connect_args=connect_args, poolclass=QueuePool,
+        pool_size=settings.pool_size, max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping)
+
+    if timeout and backend == "mysql":
+        limit_mysql_statements(engine, int(timeout))
+
+    return engine
+
+
+def warm_up_engine(engine: Engine, connections: int) -> int:
+    """
+    Open up to `connections` connections, run a probe query on each and
+    hand them back to the pool, where they stay open.
+
+    Return the number of connections which were warmed up.
+    """
+    if isinstance(engine.pool, StaticPool):
+        connections = 1
+
+    started = time.perf_counter()
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            opened.append(conn)
+            conn.execute("SELECT 1")
+    finally:
+        for conn in opened:
+            conn.close()
+
+    logger.info("Warmed up {} database connections in {:.0f}ms".format(
+        len(opened), (time.perf_counter() - started) * 1000))
+    return len(opened)
+
+
+###############################################################################
+# Internals
+###############################################################################
+def limit_mysql_statements(engine: Engine, timeout: int):
+    @event.listens_for(engine, "connect")
+    def set_statement_timeout(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(
+            "SET SESSION max_execution_time = {:d}".format(timeout))
+        cursor.close()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+from contextlib import contextmanager
+import threading
+import time
+from typing import Dict, Hashable
+
+from chaosplt_relational_storage import db
+from chaosplt_relational_storage.db import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+__all__ = ["orm_session", "read_session", "unit_of_work",
+           "begin_unit_of_work", "end_unit_of_work", "in_unit_of_work",
+           "release_connection", "configure_replica", "release_replica",
+           "ReplicaSession"]
+
+_local = threading.local()
+ReplicaSession = scoped_session(
+    sessionmaker(autocommit=False, autoflush=False))
+_replica_lock = threading.Lock()
+_replica = {"enabled": False, "read_your_writes": 0.0}
+# until when the reads of a client go to the primary, as it wrote recently
+_recent_writes: Dict[Hashable, float] = {}
+# beyond that many clients, those past their window are forgotten
+MAX_RECENT_WRITES = 10000
+
+
+@contextmanager
+def orm_session() -> Session:
+    """
+    Provide the ORM session to the storage services.
+
+    Outside of a unit of work, this behaves like the relational storage's
+    `orm_session`: the transaction is committed, or rolled back, and the
+    session closed when the context exits.
+
+    Within a unit of work, the thread's session is shared by all the calls
+    and changes are only flushed when the context exits. The transaction is
+    committed or rolled back when the unit of work ends. Loading an entity
+    by its identifier a second time is then served by the session's identity
+    map.
+    """
+    if not in_unit_of_work():
+        with db.orm_session() as session:
+            yield session
+        if getattr(_local, "wrote", False):
+            _local.wrote = False
+            remember_write(getattr(_local, "key", None))
+        return
+
+    try:
+        yield Session
+        Session.flush()
+    except Exception:
+        # the transaction cannot be used anymore, make sure the unit of work
+        # does not commit whatever happens next within it
+        _local.failed = True
+        Session.rollback()
+        raise
+
+
+@contextmanager
+def read_session() -> Session:
+    """
+    Provide a session to the storage calls which only read.
+
+    When a replica is configured, the session reads from it, unless the
+    unit of work of the current thread wrote already, or is meant to write,
+    or the client it serves wrote within the read-your-writes window. The
+    primary is read, as with `orm_session`, in all the other cases.
+    """
+    if not _replica["enabled"] or getattr(_local, "wrote", False) or \
+            getattr(_local, "primary", False) or \
+            wrote_recently(getattr(_local, "key", None)):
+        with orm_session() as session:
+            yield session
+        return
+
+    try:
+        yield ReplicaSession
+    finally:
+        ReplicaSession.close()
+
+
+def in_unit_of_work() -> bool:
+    """
+    Return `True` when a unit of work is active on the current thread.
+    """
+    return getattr(_local, "active", False)
+
+
+def begin_unit_of_work(consistency_key: Hashable = None,
+                       writing: bool = False) -> bool:
+    """
+    Start a unit of work on the current thread so that all the storage
+    calls share the same session and transaction until
+    `end_unit_of_work` is called.
+
+    The `consistency_key` identifies the client on behalf of which the
+    unit of work runs. Once it wrote, its reads are served by the primary
+    for the read-your-writes window, rather than by the replica. `None`
+    stands for no client in particular, such as an anonymous one.
+
+    A unit of work `writing` reads from the primary from the start, so that
+    what it reads before its first write is as current as what it writes.
+
+    Return `False` when a unit of work was already active, in which case
+    it is left untouched.
+    """
+    if in_unit_of_work():
+        return False
+
+    _local.active = True
+    _local.failed = False
+    _local.wrote = False
+    _local.primary = writing
+    _local.key = consistency_key
+    return True
+
+
+def end_unit_of_work(commit: bool = True):
+    """
+    Commit, or rollback when `commit` is `False` or a storage call failed
+    within it, the unit of work of the current thread and release its
+    session.
+
+    Does nothing when no unit of work is active.
+    """
+    if not in_unit_of_work():
+        return
+
+    try:
+        if commit and not _local.failed:
+            Session.commit()
+            if _local.wrote:
+                remember_write(_local.key)
+        else:
+            Session.rollback()
+    except Exception:
+        Session.rollback()
+        raise
+    finally:
+        Session.close()
+        _local.active = False
+        _local.failed = False
+        _local.wrote = False
+        _local.primary = False
+        _local.key = None
+
+
+def release_connection() -> bool:
+    """
+    Give the connection of the current unit of work back to the pool ahead
+    of slow work which does not touch the database, such as hashing a
+    password.
+
+    Only a unit of work which did not write can do so: its transaction is
+    ended, the next storage call starts a new one. A unit of work which
+    wrote keeps its transaction, and connection, until it commits.
+
+    Return `True` when the connection was released.
+    """
+    if not in_unit_of_work() or _local.wrote or _local.failed:
+        return False
+    Session.rollback()
+    return True
+
+
+@contextmanager
+def unit_of_work(consistency_key: Hashable = None,
+                 writing: bool = False) -> Session:
+    """
+    Run the block as a single unit of work, committed when it exits normally
+    and rolled back when it raises.
+
+    When a unit of work is already active, the block simply joins it.
+    """
+    if not begin_unit_of_work(consistency_key, writing):
+        yield Session
+        return
+
+    try:
+        yield Session
+    except Exception:
+        end_unit_of_work(commit=False)
+        raise
+    else:
+        end_unit_of_work(commit=True)
+
+
+def configure_replica(engine: Engine, read_your_writes: float = 5.0):
+    """
+    Serve the reads of `read_session` from the replica behind `engine`.
+
+    Clients which wrote read from the primary for `read_your_writes`
+    seconds, long enough for the replica to catch up.
+    """
+    ReplicaSession.configure(bind=engine)
+    with _replica_lock:
+        _recent_writes.clear()
+        _replica["read_your_writes"] = read_your_writes
+        _replica["enabled"] = True
+
+
+def release_replica():
+    with _replica_lock:
+        _replica["enabled"] = False
+        _recent_writes.clear()
+    ReplicaSession.remove()
+    ReplicaSession.configure(bind=None)
+
+
+###############################################################################
+# Internals
+###############################################################################
+def remember_write(key: Hashable):
+    if not _replica["enabled"] or key is None:
+        return
+
+    now = time.monotonic()
+    with _replica_lock:
+        if len(_recent_writes) >= MAX_RECENT_WRITES:
+            for expired in [
+                    k for (k, until) in _recent_writes.items()
+                    if until <= now]:
+                del _recent_writes[expired]
+        _recent_writes[key] = now + _replica["read_your_writes"]
+
+
+def wrote_recently(key: Hashable) -> bool:
+    if key is None:
+        return False
+    with _replica_lock:
+        until = _recent_writes.get(key)
+    return until is not None and until > time.monotonic()
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    if session.new or session.dirty or session.deleted:
+        _local.wrote = True
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import uuid
+
+from sqlalchemy import Column, Table, func, or_, select
+from sqlalchemy.engine import Connection, Engine
+
+from .indexes import TABLES
+from .model import User
+from .model.types import NATIVE_UUID_DIALECTS, UUID_STORAGE_ATTR, \
+    UUID_STORAGES, UUIDKey
+
+__all__ = ["configure_uuid_storage", "stored_uuids", "check_uuid_storage",
+           "migrate_uuids"]
+logger = logging.getLogger("chaosplatform")
+
+# SQLite type of the stored values, per storage
+SQLITE_TYPES = {"char": "text", "binary": "blob"}
+
+
+def configure_uuid_storage(engine: Engine, storage: str = "char"):
+    """
+    Tell how the UUIDs of the keys are stored through this `engine`, either
+    as `char`, the default, or `binary`. Ignored by PostgreSQL which always
+    stores them natively.
+
+    Call this before the engine is first used, the column types are resolved
+    once per engine.
+    """
+    if storage not in UUID_STORAGES:
+        raise ValueError(
+            "UUID storage must be one of {}, not '{}'".format(
+                ", ".join(UUID_STORAGES), storage))
+    setattr(engine.dialect, UUID_STORAGE_ATTR, storage)
+
+
+def stored_uuids(engine: Engine) -> Optional[str]:
+    """
+    Tell how the UUIDs of the users are actually stored: `native`, `char` or
+    `binary`. `None` when that cannot be told, because there is no user yet
+    or the database is neither PostgreSQL nor SQLite.
+    """
+    if engine.dialect.name in NATIVE_UUID_DIALECTS:
+        return "native"
+    if engine.dialect.name != "sqlite":
+        return None
+    if not engine.has_table(User.__tablename__):
+        return None
+
+    column = User.__table__.c.id
+    with engine.connect() as conn:
+        kind = conn.execute(
+            select([func.typeof(column)]).limit(1)).scalar()
+    for storage, sqlite_type in SQLITE_TYPES.items():
+        if kind == sqlite_type:
+            return storage
+    return None
+
+
+def check_uuid_storage(engine: Engine, storage: str):
+    """
+    Raise a `RuntimeError` when the UUIDs are stored otherwise than the
+    engine was configured for, since then no row would ever be found.
+    """
+    stored = stored_uuids(engine)
+    if stored in (None, "native", storage):
+        return
+    raise RuntimeError(
+        "The database stores its UUIDs as {} but the `uuid_storage` setting "
+        "is '{}', convert them with `chaosplatform-account migrate-uuids "
+        "--to {}`".format(stored, storage, storage))
+
+
+def migrate_uuids(engine: Engine, to: str, batch_size: int = 1000,
+                  pause: float = 0.0, tables: Sequence[Table] = TABLES,
+                  progress: Callable[[str, int], None] = None) \
+        -> Dict[str, int]:
+    """
+    Convert in place the UUIDs stored by the tables to the `to` storage and
+    return the number of rows converted per table.
+
+    Rows are converted by batches of `batch_size`, each committed on its own
+    and followed by `pause` seconds, so that the database is never locked
+    for long. Only the rows still in the former storage are read, an
+    interrupted migration resumes where it stopped.
+
+    Only SQLite is supported: its columns accept both storages, whatever
+    their declared type. PostgreSQL stores UUIDs natively already.
+    """
+    if to not in UUID_STORAGES:
+        raise ValueError(
+            "UUID storage must be one of {}, not '{}'".format(
+                ", ".join(UUID_STORAGES), to))
+    if engine.dialect.name in NATIVE_UUID_DIALECTS:
+        logger.info("{} stores UUIDs natively, nothing to convert".format(
+            engine.dialect.name))
+        return {}
+    if engine.dialect.name != "sqlite":
+        raise RuntimeError(
+            "Converting UUIDs in place is not supported with {}".format(
+                engine.dialect.name))
+
+    converted = {}
+    with engine.connect() as conn:
+        # rows referring to a converted key must not be rejected before
+        # they are converted as well
+        conn.execute("PRAGMA foreign_keys=OFF")
+        try:
+            for table in tables:
+                converted[table.name] = migrate_table(
+                    conn, table, to, batch_size, pause, progress)
+            violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+        finally:
+            conn.execute("PRAGMA foreign_keys=ON")
+
+    if violations:
+        raise RuntimeError(
+            "{} rows refer to missing keys once converted".format(
+                len(violations)))
+    return converted
+
+
+###############################################################################
+# Internals
+###############################################################################
+def uuid_columns(table: Table) -> List[Column]:
+    return [c for c in table.columns if isinstance(c.type, UUIDKey)]
+
+
+def migrate_table(conn: Connection, table: Table, to: str, batch_size: int,
+                  pause: float,
+                  progress: Callable[[str, int], None] = None) -> int:
+    columns = uuid_columns(table)
+    if not columns:
+        return 0
+
+    rowid = Column("rowid")
+    former = SQLITE_TYPES["binary" if to == "char" else "char"]
+    pending = or_(*[func.typeof(c) == former for c in columns])
+    query = select([rowid] + columns).select_from(table).where(
+        pending).limit(batch_size)
+    # the converted values are bound as they are, not through the column type
+    quote = conn.dialect.identifier_preparer.quote
+    update = "UPDATE {} SET {} WHERE rowid = ?".format(
+        quote(table.name),
+        ", ".join("{} = ?".format(quote(c.name)) for c in columns))
+
+    total = 0
+    while True:
+        with conn.begin():
+            rows = conn.execute(query).fetchall()
+            if rows:
+                conn.execute(update, [
+                    tuple([convert_uuid(row[c.name], to) for c in columns] +
+                          [row["rowid"]])
+                    for row in rows
+                ])
+        if not rows:
+            break
+
+        total += len(rows)
+        if progress:
+            progress(table.name, total)
+        if pause:
+            time.sleep(pause)
+
+    logger.info("Converted {} rows of {} to {} UUIDs".format(
+        total, table.name, to))
+    return total
+
+
+def convert_uuid(value: Optional[uuid.UUID], to: str):
+    if value is None:
+        return None
+    return value.bytes if to == "binary" else value.hex
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+__all__ = ["READ_METHODS"]
+
+# requests made with any other method are expected to write
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import logging
+import time
 from logging import StreamHandler
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from flask import Blueprint, Flask, after_this_request, request, Response
 from flask_caching import Cache
 
 from chaosplt_account.auth import setup_jwt, setup_login
+from chaosplt_account.cache import apply_invalidations, defer_invalidations
+from chaosplt_account.metrics import observe_request
 from chaosplt_account.schemas import setup_schemas
 from chaosplt_account.service import Services
-from chaosplt_account.storage import AccountStorage
+from chaosplt_account.storage import AccountStorage, begin_query_stats, \
+    begin_unit_of_work, end_query_stats, end_unit_of_work, inspect_queries
+from chaosplt_account.views import READ_METHODS
 
 from .org import api as org_api
 from .user import api as user_api
@@ -62,9 +68,9 @@ def serve_api(app: Flask, cache: Cache, services: Services,
 ###############################################################################
 def register_api(app: Flask, cache: Cache, services, storage: AccountStorage,
                  mount_point: str):
-    patch_request(user_api, services, storage)
-    patch_request(org_api, services, storage)
-    patch_request(workspace_api, services, storage)
+    patch_request(user_api, cache, services, storage)
+    patch_request(org_api, cache, services, storage)
+    patch_request(workspace_api, cache, services, storage)
 
     app.register_blueprint(user_api, url_prefix="{}/users".format(mount_point))
     app.register_blueprint(
@@ -73,14 +79,64 @@ def register_api(app: Flask, cache: Cache, services, storage: AccountStorage,
         workspace_api, url_prefix="{}/workspaces".format(mount_point))
 
 
-def patch_request(bp: Blueprint, services, storage: AccountStorage):
+def patch_request(bp: Blueprint, cache: Cache, services,
+                  storage: AccountStorage):
     @bp.before_request
     def prepare_request():
+        started = time.perf_counter()
         request.services = services
         request.storage = storage
+        request.cache = cache
+        # all the storage calls made while serving this request share the
+        # same session and transaction. Once a client wrote, its next reads
+        # are served by the primary database rather than by a replica
+        begin_unit_of_work(
+            consistency_key=client_key(),
+            writing=request.method not in READ_METHODS)
+        defer_invalidations()
+        if storage.instrumentation:
+            begin_query_stats()
 
         @after_this_request
         def clean_request(response: Response):
             request.services = None
             request.storage = None
+            request.cache = None
+            # before committing, so that a request failing the check, with
+            # `fail_on_repeat`, does not keep its changes
+            try:
+                inspect_queries(
+                    storage.instrumentation, response,
+                    "{} {}".format(request.method, request.full_path))
+            except Exception:
+                end_unit_of_work(commit=False)
+                apply_invalidations(committed=False)
+                raise
+            # a handler answering with an error may have flushed some of
+            # its changes already
+            committed = response.status_code < 400
+            end_unit_of_work(commit=committed)
+            # only now can the cached responses be rebuilt from the changes
+            apply_invalidations(committed)
+            observe_request(
+                "api", request.endpoint, request.method,
+                response.status_code, started)
             return response
+
+    @bp.teardown_request
+    def release_request(exc: Exception = None):
+        # only does something when the response could not be processed
+        end_query_stats()
+        end_unit_of_work(commit=False)
+        apply_invalidations(committed=False)
+
+
+def client_key() -> Optional[str]:
+    """
+    Identify the client by a digest of its access token, rather than by
+    the token itself which is not kept in memory.
+    """
+    token = request.headers.get("Authorization")
+    if not token:
+        return None
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
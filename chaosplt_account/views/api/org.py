@@ -8,6 +8,7 @@ from chaosplt_account.api.org import list_all_orgs, create_org, get_org, \
     delete_org, get_org_workspaces, link_workspace_to_org, add_member, \
     unlink_workspace_from_org, lookup_org, get_members, get_member, \
     set_org_name
+from chaosplt_account.cache import cached_response
 
 __all__ = ["api"]
 
@@ -17,7 +18,7 @@ api = Blueprint("org", __name__)
 @api.route('', methods=['GET'])
 @login_required
 def api_list_all():
-    return list_all_orgs(request.services, current_user)
+    return list_all_orgs(request.services, current_user, request.args)
 
 
 @api.route('', methods=['POST'])
@@ -34,6 +35,7 @@ def update():
 
 @api.route('<uuid:org_id>', methods=['GET'])
 @login_required
+@cached_response("org:{org_id}", per_user=True)
 def get_one(org_id: UUID):
     return get_org(request.services, current_user, org_id)
 
@@ -46,6 +48,7 @@ def api_delete(org_id: UUID):
 
 @api.route('<uuid:org_id>/workspaces', methods=['GET'])
 @login_required
+@cached_response("org:{org_id}")
 def api_get_org_workspaces(org_id: UUID):
     return get_org_workspaces(request.services, current_user, org_id)
 
@@ -67,6 +70,7 @@ def api_unlink_workspace_from_org(org_id: UUID, workspace_id: UUID):
 
 @api.route('lookup/<string:org_name>', methods=['GET'])
 @login_required
+@cached_response("orgs", per_user=True)
 def api_lookup_org(org_name: str):
     workspaces = request.args.get("workspaces")
     return lookup_org(request.services, current_user, org_name, workspaces)
@@ -74,12 +78,14 @@ def api_lookup_org(org_name: str):
 
 @api.route('<uuid:org_id>/members', methods=["GET"])
 @login_required
+@cached_response("org:{org_id}")
 def api_get_members(org_id: UUID):
     return get_members(request.services, current_user, org_id)
 
 
 @api.route('<uuid:org_id>/members/<uuid:user_id>', methods=["GET"])
 @login_required
+@cached_response("org:{org_id}")
 def api_get_member(org_id: UUID, user_id: UUID):
     return get_member(request.services, current_user, org_id, user_id)
 
@@ -8,6 +8,7 @@ from chaosplt_account.api.user import create_user, get_user, delete_user, \
     get_user_orgs, get_user_workspaces, link_org_to_user, \
     unlink_org_from_user, link_workspace_to_user, unlink_workspace_from_user, \
     get_user_experiments, get_user_executions, get_user_schedules
+from chaosplt_account.cache import cached_response
 
 __all__ = ["api"]
 
@@ -34,12 +35,14 @@ def api_delete(user_id: UUID):
 
 @api.route('<uuid:user_id>/organizations', methods=['GET'])
 @login_required
+@cached_response("user:{user_id}", "orgs")
 def api_get_user_orgs(user_id: UUID):
     return get_user_orgs(request.services, current_user, user_id)
 
 
 @api.route('<uuid:user_id>/workspaces', methods=['GET'])
 @login_required
+@cached_response("user:{user_id}", "workspaces")
 def api_get_user_workspaces(user_id: UUID):
     return get_user_workspaces(request.services, current_user, user_id)
 
@@ -8,6 +8,7 @@ from chaosplt_account.api.workspace import list_all_workspaces, \
     create_workspace, get_workspace, delete_workspace, \
     get_workspace_experiments, get_workspace_collaborators, \
     get_workspace_collaborator, lookup_workspace_by_name
+from chaosplt_account.cache import cached_response
 
 __all__ = ["api"]
 
@@ -17,7 +18,7 @@ api = Blueprint("workspace", __name__)
 @api.route('', methods=['GET'])
 @login_required
 def api_list_all():
-    return list_all_workspaces(request.services, current_user)
+    return list_all_workspaces(request.services, current_user, request.args)
 
 
 @api.route('', methods=['POST'])
@@ -28,6 +29,7 @@ def api_new():
 
 @api.route('<uuid:workspace_id>', methods=['GET'])
 @login_required
+@cached_response("workspace:{workspace_id}")
 def get_one(workspace_id: UUID):
     return get_workspace(request.services, current_user, workspace_id)
 
@@ -47,6 +49,7 @@ def api_get_experiments(workspace_id: UUID):
 
 @api.route('<uuid:workspace_id>/collaborators', methods=["GET"])
 @login_required
+@cached_response("workspace:{workspace_id}")
 def api_collaborator_settings(workspace_id: UUID):
     return get_workspace_collaborators(
         request.services, current_user, workspace_id)
@@ -54,6 +57,7 @@ def api_collaborator_settings(workspace_id: UUID):
 
 @api.route('<uuid:workspace_id>/collaborators/<uuid:user_id>', methods=["GET"])
 @login_required
+@cached_response("workspace:{workspace_id}")
 def api_get_collaborator(workspace_id: UUID, user_id: UUID):
     return get_workspace_collaborator(
         request.services, current_user, workspace_id, user_id)
@@ -61,6 +65,7 @@ def api_get_collaborator(workspace_id: UUID, user_id: UUID):
 
 @api.route('lookup/<string:workspace_name>', methods=['GET'])
 @login_required
+@cached_response("workspaces")
 def api_lookup_workspace(workspace_name: str):
     org_name = request.args.get("org")
     return lookup_workspace_by_name(
@@ -1,14 +1,20 @@
 # -*- coding: utf-8 -*-
 import logging
+import time
 from logging import StreamHandler
 from typing import Any, Dict
 
-from flask import Blueprint, Flask, request, Response, after_this_request
+from flask import Blueprint, Flask, request, Response, after_this_request, \
+    session
 from flask_caching import Cache
 
 from chaosplt_account.auth import setup_login
+from chaosplt_account.cache import apply_invalidations, defer_invalidations
+from chaosplt_account.metrics import observe_request
 from chaosplt_account.service import Services
-from chaosplt_account.storage import AccountStorage
+from chaosplt_account.storage import AccountStorage, begin_query_stats, \
+    begin_unit_of_work, end_query_stats, end_unit_of_work, inspect_queries
+from chaosplt_account.views import READ_METHODS
 
 from .org import view as org_view
 from .user import view as user_view
@@ -60,23 +66,62 @@ def serve_app(app: Flask, cache: Cache, services: Services,
 ###############################################################################
 def register_views(app: Flask, cache: Cache, services: Services,
                    storage: AccountStorage, mount_point: str):
-    patch_request(user_view, services, storage)
-    patch_request(org_view, services, storage)
-    patch_request(workspace_view, services, storage)
+    patch_request(user_view, cache, services, storage)
+    patch_request(org_view, cache, services, storage)
+    patch_request(workspace_view, cache, services, storage)
 
     app.register_blueprint(user_view, url_prefix="/users")
     app.register_blueprint(org_view, url_prefix="/organizations")
     app.register_blueprint(workspace_view, url_prefix="/workspaces")
 
 
-def patch_request(bp: Blueprint, services: Services, storage: AccountStorage):
+def patch_request(bp: Blueprint, cache: Cache, services: Services,
+                  storage: AccountStorage):
     @bp.before_request
     def prepare_request():
+        started = time.perf_counter()
         request.services = services
         request.storage = storage
+        request.cache = cache
+        # all the storage calls made while serving this request share the
+        # same session and transaction. Once a user wrote, its next reads
+        # are served by the primary database rather than by a replica
+        begin_unit_of_work(
+            consistency_key=session.get("_user_id"),
+            writing=request.method not in READ_METHODS)
+        defer_invalidations()
+        if storage.instrumentation:
+            begin_query_stats()
 
         @after_this_request
         def clean_request(response: Response):
             request.services = None
             request.storage = None
+            request.cache = None
+            # before committing, so that a request failing the check, with
+            # `fail_on_repeat`, does not keep its changes
+            try:
+                inspect_queries(
+                    storage.instrumentation, response,
+                    "{} {}".format(request.method, request.full_path))
+            except Exception:
+                end_unit_of_work(commit=False)
+                apply_invalidations(committed=False)
+                raise
+            # a handler answering with an error may have flushed some of
+            # its changes already
+            committed = response.status_code < 400
+            end_unit_of_work(commit=committed)
+            # only now can the cached responses be rebuilt from the changes
+            apply_invalidations(committed)
+            observe_request(
+                "web", request.endpoint, request.method,
+                response.status_code, started)
             return response
+
+    @bp.teardown_request
+    def release_request(exc: Exception = None):
+        # only does something when the response could not be processed
+        end_query_stats()
+        end_unit_of_work(commit=False)
+        apply_invalidations(committed=False)
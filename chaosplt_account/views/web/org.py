@@ -7,6 +7,7 @@ from flask_login import current_user, login_required
 from chaosplt_account.api.org import create_org, get_org, \
     lookup_org, get_members, get_member, set_org_name, delete_org, \
     set_org_infos, add_member, get_org_experiments, get_schedulings
+from chaosplt_account.cache import cached_response
 from chaosplt_account.api.token import list_org_tokens
 from chaosplt_account.schemas import org_info_schema, workspace_info_schema
 
@@ -17,6 +18,7 @@ view = Blueprint("org", __name__)
 
 @view.route('<string:org_name>', methods=["GET"])
 @login_required
+@cached_response("orgs", per_user=True)
 def org(org_name: str):
     org = request.storage.org.get_by_name(org_name)
     if not org:
@@ -59,6 +61,7 @@ def update_org_name(org_id: UUID):
 
 @view.route('<string:org_name>/<string:workspace_name>', methods=["GET"])
 @login_required
+@cached_response("orgs", "workspaces", per_user=True)
 def workspace(org_name: str, workspace_name: str):
     org = request.storage.org.get_by_name(org_name)
     if not org:
@@ -95,6 +98,7 @@ def view_new():
 
 @view.route('lookup/<string:org_name>', methods=['GET'])
 @login_required
+@cached_response("orgs", per_user=True)
 def view_lookup_org(org_name: str):
     workspaces = request.args.get("workspaces")
     return lookup_org(request.services, current_user, org_name, workspaces)
@@ -102,12 +106,14 @@ def view_lookup_org(org_name: str):
 
 @view.route('<uuid:org_id>/members', methods=["GET"])
 @login_required
+@cached_response("org:{org_id}")
 def view_get_members(org_id: UUID):
     return get_members(request.services, current_user, org_id)
 
 
 @view.route('<uuid:org_id>/members/<uuid:user_id>', methods=["GET"])
 @login_required
+@cached_response("org:{org_id}")
 def view_get_member(org_id: UUID, user_id: UUID):
     return get_member(request.services, current_user, org_id, user_id)
 
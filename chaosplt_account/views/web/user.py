@@ -12,16 +12,28 @@ from chaosplt_account.api.user import create_user, get_user, delete_user, \
     lookup_user, get_user_tokens
 from chaosplt_account.api.token import create_token, list_tokens, \
     delete_token, revoke_token
+from chaosplt_account.cache import cached_response, invalidate
 from chaosplt_account.schemas import \
     user_profile_schema, profile_orgs_schema, \
     profile_new_org_schema, profile_org_schema, profile_workspaces_schema, \
     profile_new_workspace_schema, profile_workspace_schema, current_user_schema
+from chaosplt_account.storage import PasswordHashingBusy
 
 __all__ = ["view"]
 
 view = Blueprint("user", __name__)
 
 
+@view.errorhandler(PasswordHashingBusy)
+def passwords_busy(error: PasswordHashingBusy):
+    r = jsonify({
+        "message": "Too many sign ins at the moment, please retry shortly"
+    })
+    r.status_code = 503
+    r.headers["Retry-After"] = str(error.retry_after)
+    return r
+
+
 @view.route('current')
 def the_user():
     if current_user.is_anonymous:
@@ -166,6 +178,7 @@ def view_new_token():
 
 
 @view.route('orgs')
+@cached_response("orgs", per_user=True)
 def view_orgs():
     user_id = current_user.id
     orgs = request.storage.org.get_by_user(user_id)
@@ -191,10 +204,12 @@ def view_new_org():
         }), 409
 
     org = request.services.account.org.create(org_name, user_id)
+    invalidate("orgs", "user:{}".format(user_id))
     return profile_org_schema.jsonify(org), 201
 
 
 @view.route('workspaces')
+@cached_response("workspaces", per_user=True)
 def view_workspaces():
     user_id = current_user.id
     workspaces = request.storage.workspace.get_by_user(user_id)
@@ -237,6 +252,9 @@ def view_new_workspace():
     }
     workspace = request.services.account.workspace.create(
         workspace_name, org.id, user_id, workspace_settings)
+    invalidate(
+        "workspaces", "org:{}".format(org.id), "orgs",
+        "user:{}".format(user_id))
     return profile_workspace_schema.jsonify(workspace), 201
 
 
@@ -261,11 +279,13 @@ def view_get_user_tokens(user_id: UUID):
 
 
 @view.route('<uuid:user_id>/organizations', methods=['GET'])
+@cached_response("user:{user_id}", "orgs")
 def view_get_user_orgs(user_id: UUID):
     return get_user_orgs(request.services, current_user, user_id)
 
 
 @view.route('<uuid:user_id>/workspaces', methods=['GET'])
+@cached_response("user:{user_id}", "workspaces")
 def view_get_user_workspaces(user_id: UUID):
     return get_user_workspaces(request.services, current_user, user_id)
 
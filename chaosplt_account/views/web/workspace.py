@@ -8,6 +8,7 @@ from chaosplt_account.api.workspace import \
     create_workspace, get_workspace, get_workspace_experiments, \
     get_workspace_collaborators, get_workspace_collaborator, \
     lookup_workspace_by_name, get_workspace_experiment
+from chaosplt_account.cache import cached_response
 
 view = Blueprint("workspace", __name__)
 
@@ -29,6 +30,7 @@ def view_new():
 
 @view.route('<uuid:workspace_id>/collaborators', methods=["GET"])
 @login_required
+@cached_response("workspace:{workspace_id}")
 def view_collaborator_settings(workspace_id: UUID):
     return get_workspace_collaborators(
         request.services, current_user, workspace_id)
@@ -37,6 +39,7 @@ def view_collaborator_settings(workspace_id: UUID):
 @view.route('<uuid:workspace_id>/collaborators/<uuid:user_id>',
             methods=["GET"])
 @login_required
+@cached_response("workspace:{workspace_id}")
 def view_get_collaborator(workspace_id: UUID, user_id: UUID):
     return get_workspace_collaborator(
         request.services, current_user, workspace_id, user_id)
@@ -44,6 +47,7 @@ def view_get_collaborator(workspace_id: UUID, user_id: UUID):
 
 @view.route('lookup/<string:workspace_name>', methods=['GET'])
 @login_required
+@cached_response("workspaces")
 def view_lookup_workspace(workspace_name: str):
     org_name = request.args.get("org")
     return lookup_workspace_by_name(
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+import copy
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Tuple
+
+import attr
+
+from .metrics import forget_process, multiprocess_dir, \
+    reset_multiprocess_metrics
+from .server import run_forever
+
+__all__ = ["bind_listener", "check_workers", "run_workers"]
+logger = logging.getLogger("chaosplatform")
+
+# CherryPy picks up the socket at this file descriptor when `LISTEN_PID` is
+# set, as with a systemd socket activation
+LISTEN_FD = 3
+# a worker exiting sooner than that after it started is restarted with an
+# increasing delay, so that a broken worker does not spin
+MIN_UPTIME = 5.0
+MAX_RESTART_DELAY = 30.0
+# cache types kept in the memory of each process, a change made through a
+# worker would not invalidate the responses cached by the others
+PROCESS_CACHES = ("simple",)
+
+
+@attr.s
+class Worker:
+    slot: int = attr.ib()
+    process: multiprocessing.Process = attr.ib(default=None)
+    started: float = attr.ib(default=0.0)
+    failures: int = attr.ib(default=0)
+    restart_at: float = attr.ib(default=None)
+
+
+def bind_listener(config: Dict[str, Any], backlog: int = 128) \
+        -> socket.socket:
+    """
+    Bind the HTTP address once, on behalf of all the workers.
+
+    The socket is moved to the file descriptor 3, which must be free, so
+    call this before opening any file, the log files for instance.
+    """
+    host, port = config["http"]["address"].rsplit(":", 1)
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host.strip("[]"), int(port)))
+    sock.listen(backlog)
+
+    if sock.fileno() == LISTEN_FD:
+        return sock
+
+    try:
+        os.fstat(LISTEN_FD)
+    except OSError:
+        os.dup2(sock.fileno(), LISTEN_FD)
+        listener = socket.socket(fileno=LISTEN_FD)
+        sock.close()
+        return listener
+
+    sock.close()
+    raise RuntimeError(
+        "The file descriptor {} is already in use, the HTTP socket cannot "
+        "be handed over to the workers".format(LISTEN_FD))
+
+
+def check_workers(config: Dict[str, Any]):
+    """
+    Refuse settings which cannot be shared by several workers and warn
+    about the metrics when they are not aggregated across the workers.
+    """
+    cache_type = config.get("cache", {}).get("type", "simple")
+    if cache_type in PROCESS_CACHES:
+        raise RuntimeError(
+            "The `{}` cache is kept by each worker, so a change made "
+            "through one of them would not invalidate what the others "
+            "cached. Use a shared cache, such as `redis`, to run several "
+            "workers".format(cache_type))
+
+    if not multiprocess_dir():
+        logger.warning(
+            "PROMETHEUS_MULTIPROC_DIR is not set, each worker serves its "
+            "own metrics only")
+
+
+def run_workers(config: Dict[str, Any], workers: int,
+                listener: socket.socket, graceful_timeout: float = 30.0):
+    """
+    Run `workers` processes, each serving the service as `run_forever` does,
+    and block until a signal is sent to this process.
+
+    The `listener` socket must have been bound with `bind_listener`. The
+    workers are forked before anything else is initialized so that each gets
+    its own database pool, gRPC channels and gRPC server, the latter bound
+    with `SO_REUSEPORT`, as well as its own spool of activity events, see
+    `worker_config`. A worker that exits is restarted. On `SIGTERM` or
+    `SIGINT`, the workers are asked to stop and given `graceful_timeout`
+    seconds to drain before being killed.
+    """
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        logger.info("Stopping the workers")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    reset_multiprocess_metrics()
+    try:
+        supervise(serve, (config,), workers, stopping, graceful_timeout)
+    finally:
+        listener.close()
+
+
+###############################################################################
+# Internals
+###############################################################################
+def serve(config: Dict[str, Any], slot: int):
+    """
+    Entry point of a worker process.
+    """
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    os.environ["LISTEN_PID"] = str(os.getpid())
+    os.environ["LISTEN_FDS"] = "1"
+    run_forever(worker_config(config, slot))
+
+
+def worker_config(config: Dict[str, Any], slot: int) -> Dict[str, Any]:
+    """
+    Settings of the worker in `slot`.
+
+    A SQLite spool is not meant to be written by several processes, each
+    worker gets its own, suffixed by its slot. A restarted worker takes over
+    the spool of the one it replaces.
+    """
+    spool_path = config.get("grpc", {}).get("activity", {}).get("spool_path")
+    if not spool_path:
+        return config
+
+    config = copy.deepcopy(config)
+    root, ext = os.path.splitext(spool_path)
+    config["grpc"]["activity"]["spool_path"] = "{}-{}{}".format(
+        root, slot, ext)
+    return config
+
+
+def supervise(target: Callable, args: Tuple, workers: int,
+              stopping: threading.Event, graceful_timeout: float = 30.0,
+              interval: float = 1.0):
+    """
+    Keep `workers` processes running `target` until `stopping` is set, then
+    stop them. `target` is called with `args` followed by the slot of the
+    worker, from 0 to `workers - 1`.
+    """
+    context = multiprocessing.get_context("fork")
+    pool = [Worker(slot=slot) for slot in range(workers)]
+    for worker in pool:
+        start_worker(context, worker, target, args)
+
+    while not stopping.wait(interval):
+        now = time.monotonic()
+        for worker in pool:
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    start_worker(context, worker, target, args)
+            elif not worker.process.is_alive():
+                schedule_restart(worker, now)
+
+    stop_workers(pool, graceful_timeout)
+
+
+def start_worker(context: Any, worker: Worker, target: Callable,
+                 args: Tuple):
+    worker.process = context.Process(
+        target=target, args=args + (worker.slot,), daemon=False,
+        name="chaosplatform-account-worker-{}".format(worker.slot))
+    worker.process.start()
+    worker.started = time.monotonic()
+    worker.restart_at = None
+    logger.info("Worker {} started with pid {}".format(
+        worker.slot, worker.process.pid))
+
+
+def schedule_restart(worker: Worker, now: float):
+    worker.process.join()
+    forget_process(worker.process.pid)
+    if now - worker.started < MIN_UPTIME:
+        worker.failures += 1
+    else:
+        worker.failures = 0
+    delay = 0.0
+    if worker.failures:
+        delay = min(MAX_RESTART_DELAY, 2 ** (worker.failures - 1))
+    worker.restart_at = now + delay
+    logger.warning(
+        "Worker {} (pid {}) exited with code {}, restarting it in "
+        "{}s".format(
+            worker.slot, worker.process.pid, worker.process.exitcode, delay))
+
+
+def stop_workers(pool: list, graceful_timeout: float):
+    running = [
+        w.process for w in pool
+        if w.restart_at is None and w.process.is_alive()]
+    for process in running:
+        process.terminate()
+
+    deadline = time.monotonic() + graceful_timeout
+    for process in running:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning(
+                "Worker {} did not drain in time, killing it".format(
+                    process.pid))
+            process.kill()
+            process.join()
+        forget_process(process.pid)
+    logger.info("All workers stopped")
@@ -15,7 +15,8 @@ from chaosplt_account.log import http_requests_logger
 from chaosplt_account.model import Organization, User, anonymous_user as anon
 from chaosplt_account.views.web import create_app, serve_app
 from chaosplt_account.views.api import create_api, serve_api
-from chaosplt_account.service import Services, initialize_services
+from chaosplt_account.service import Services, initialize_services, \
+    shutdown_services
 from chaosplt_account.settings import load_settings
 from chaosplt_account.storage import AccountStorage, initialize_storage
 from chaosplt_account.storage.model.user import UserInfo
@@ -51,7 +52,8 @@ def services(account_storage: AccountStorage,
     services = Services()
     services.account = account_storage
     initialize_services(services, config)
-    return services
+    yield services
+    shutdown_services(services)
 
 
 @pytest.fixture
@@ -0,0 +1,26 @@
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+__all__ = ["count_queries"]
+
+
+@contextmanager
+def count_queries(engine: Engine) -> List[str]:
+    """
+    Collect every SQL statement sent to the database through `engine` while
+    the context is active.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
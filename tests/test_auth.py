@@ -0,0 +1,57 @@
+from unittest.mock import MagicMock
+
+from flask import Flask, request
+
+from chaosplt_account.auth import load_principal
+from chaosplt_account.cache import invalidate, setup_cache
+from chaosplt_account.model import Principal, User
+from chaosplt_account.rpc.registration import RegistrationRPC
+from chaosplt_account.storage import AccountStorage
+
+
+def test_principal_is_loaded_from_the_cache(app: Flask,
+                                            account_storage: AccountStorage,
+                                            authed_user: User):
+    cache = setup_cache(app)
+    registration = MagicMock(wraps=account_storage.registration)
+
+    with app.test_request_context():
+        request.storage = MagicMock(registration=registration)
+        request.cache = cache
+
+        principal = load_principal(authed_user.id)
+        assert isinstance(principal, Principal)
+        assert principal.username == authed_user.username
+
+        assert load_principal(authed_user.id) == principal
+        assert registration.get_principal.call_count == 1
+        registration.get.assert_not_called()
+
+        invalidate("user:{}".format(authed_user.id))
+        assert load_principal(authed_user.id) == principal
+        assert registration.get_principal.call_count == 2
+
+
+def test_deleted_registration_is_no_longer_authenticated(
+        app: Flask, account_storage: AccountStorage, user1: User):
+    cache = setup_cache(app)
+    with app.test_request_context():
+        request.storage = account_storage
+        request.cache = cache
+        assert load_principal(user1.id) is not None
+
+        RegistrationRPC(account_storage).delete_registration(str(user1.id))
+        assert load_principal(user1.id) is None
+
+
+def test_current_user_view_loads_the_full_user(app: Flask, authed_user: User):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(authed_user.id)
+        session["_fresh"] = True
+
+    response = client.get("/users/current")
+    assert response.status_code == 200
+    assert response.json["username"] == authed_user.username
+    assert {o["name"] for o in response.json["orgs"]} == {
+        "myorg", "org1", "org2"}
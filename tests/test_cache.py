@@ -0,0 +1,124 @@
+from unittest.mock import MagicMock
+
+from flask import Flask
+from flask.testing import FlaskClient
+
+from chaosplt_account.api.user import link_org_to_user
+from chaosplt_account.cache import apply_invalidations, \
+    defer_invalidations, invalidate
+from chaosplt_account.model import Organization, User
+from chaosplt_account.rpc.registration import RegistrationRPC
+from chaosplt_account.service import Services
+from chaosplt_account.storage import AccountStorage
+
+
+def signin(app: Flask, user: User) -> FlaskClient:
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["_user_id"] = str(user.id)
+        session["_fresh"] = True
+    return client
+
+
+def get_member_names(client: FlaskClient, org: Organization):
+    response = client.get("/organizations/{}/members".format(org.id))
+    assert response.status_code == 200
+    return sorted(m["username"] for m in response.json)
+
+
+def test_response_is_cached_until_invalidated(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        collaborative_org1: Organization, user_with_no_orgs: User):
+    client = signin(app, authed_user)
+    members = get_member_names(client, collaborative_org1)
+    assert user_with_no_orgs.username not in members
+
+    # bypass the api so that nothing gets invalidated
+    with app.app_context():
+        account_storage.user.add_org(
+            user_with_no_orgs.id, collaborative_org1.id)
+    assert get_member_names(client, collaborative_org1) == members
+
+    invalidate("org:{}".format(collaborative_org1.id))
+    members = get_member_names(client, collaborative_org1)
+    assert user_with_no_orgs.username in members
+
+
+def test_mutation_invalidates_cached_responses(
+        app: Flask, services: Services, authed_user: User,
+        collaborative_org1: Organization, user_with_no_orgs: User):
+    client = signin(app, authed_user)
+    members = get_member_names(client, collaborative_org1)
+    assert user_with_no_orgs.username not in members
+
+    services.activity.event = MagicMock()
+    with app.app_context():
+        link_org_to_user(
+            services, authed_user, user_with_no_orgs.id,
+            collaborative_org1.id, {"owner": False})
+
+    members = get_member_names(client, collaborative_org1)
+    assert user_with_no_orgs.username in members
+
+
+def test_cached_response_varies_per_user(app: Flask, authed_user: User,
+                                         user1: User):
+    response = signin(app, authed_user).get("/users/orgs")
+    assert response.status_code == 200
+    names = sorted(o["name"] for o in response.json["orgs"])
+
+    response = signin(app, user1).get("/users/orgs")
+    assert response.status_code == 200
+    assert sorted(o["name"] for o in response.json["orgs"]) != names
+
+
+def test_only_successful_responses_are_cached(
+        app: Flask, authed_user: User, collaborative_org1: Organization):
+    client = signin(app, authed_user)
+    response = client.get("/organizations/lookup/not-yet-an-org")
+    assert response.status_code == 404
+
+    response = client.get("/organizations/lookup/org1")
+    assert response.status_code == 200
+    assert response.json["name"] == "org1"
+
+
+def test_invalidations_wait_for_the_commit(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        collaborative_org1: Organization, user_with_no_orgs: User):
+    client = signin(app, authed_user)
+    members = get_member_names(client, collaborative_org1)
+    scope = "org:{}".format(collaborative_org1.id)
+
+    with app.test_request_context():
+        defer_invalidations()
+        invalidate(scope)
+        apply_invalidations(committed=False)
+
+    with app.test_request_context():
+        defer_invalidations()
+        invalidate(scope)
+        account_storage.user.add_org(
+            user_with_no_orgs.id, collaborative_org1.id)
+        # not committed yet as far as the cache is concerned
+        assert get_member_names(client, collaborative_org1) == members
+        apply_invalidations()
+
+    assert user_with_no_orgs.username in get_member_names(
+        client, collaborative_org1)
+
+
+def test_deleting_a_registration_invalidates_the_user(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        collaborative_org1: Organization, user_with_no_orgs: User):
+    with app.app_context():
+        account_storage.user.add_org(
+            user_with_no_orgs.id, collaborative_org1.id)
+    client = signin(app, authed_user)
+    assert user_with_no_orgs.username in get_member_names(
+        client, collaborative_org1)
+
+    RegistrationRPC(account_storage).delete_registration(
+        str(user_with_no_orgs.id))
+    assert user_with_no_orgs.username not in get_member_names(
+        client, collaborative_org1)
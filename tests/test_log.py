@@ -0,0 +1,117 @@
+import io
+import json
+import logging
+
+from flask import Flask
+import pytest
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+
+from chaosplt_account.log import AccessLogSettings, BatchingHandler, \
+    http_requests_logger, shutdown_access_logs
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        io.StringIO.__init__(self)
+        self.writes = 0
+
+    def write(self, s: str) -> int:
+        self.writes += 1
+        return io.StringIO.write(self, s)
+
+
+def make_app() -> Flask:
+    app = Flask(__name__)
+
+    @app.route("/ok")
+    def ok():
+        return "ok"
+
+    @app.route("/missing")
+    def missing():
+        return "missing", 404
+
+    return app
+
+
+def access_log_config(settings: dict) -> dict:
+    return {"http": {"access_log": settings}}
+
+
+def test_requests_are_logged_in_apache_format():
+    stream = io.StringIO()
+    wsgiapp = http_requests_logger(make_app(), logging.StreamHandler(stream))
+    Client(wsgiapp, BaseResponse).get(
+        "/ok", headers={"User-Agent": "pytest"})
+
+    line = stream.getvalue()
+    assert '"GET /ok HTTP/1.1" 200 2 "" "pytest" 0/' in line
+
+
+def test_formatter_of_the_given_handler_is_left_alone():
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    formatter = logging.Formatter("access: %(message)s")
+    handler.setFormatter(formatter)
+    wsgiapp = http_requests_logger(make_app(), handler)
+    Client(wsgiapp, BaseResponse).get("/ok")
+
+    assert handler.formatter is formatter
+    line = stream.getvalue()
+    assert line.startswith("access: ")
+    assert '"GET /ok HTTP/1.1" 200 2' in line
+
+
+def test_requests_are_logged_from_a_background_thread_as_json():
+    stream = CountingStream()
+    config = access_log_config(
+        {"async": True, "format": "json", "batch_size": 50})
+    wsgiapp = http_requests_logger(
+        make_app(), logging.StreamHandler(stream), config)
+    client = Client(wsgiapp, BaseResponse)
+    for _ in range(10):
+        client.get("/ok")
+    client.get("/missing")
+    shutdown_access_logs()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 11
+    assert lines[0]["path"] == "/ok"
+    assert lines[0]["status"] == 200
+    assert "duration_ms" in lines[0]
+    assert lines[-1]["status"] == 404
+    # written by batches rather than one line at a time
+    assert stream.writes < 11
+
+
+def test_only_a_sample_of_successful_requests_are_logged():
+    stream = io.StringIO()
+    config = access_log_config({"sample_2xx": 0.0})
+    wsgiapp = http_requests_logger(
+        make_app(), logging.StreamHandler(stream), config)
+    client = Client(wsgiapp, BaseResponse)
+    client.get("/ok")
+    client.get("/missing")
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert '"GET /missing HTTP/1.1" 404' in lines[0]
+
+
+def test_lines_are_written_once_the_batch_is_full():
+    stream = CountingStream()
+    target = logging.StreamHandler(stream)
+    handler = BatchingHandler(target, batch_size=2)
+    record = logging.makeLogRecord({"msg": "hello"})
+
+    handler.handle(record)
+    assert stream.getvalue() == ""
+    handler.handle(record)
+    assert stream.getvalue() == "hello\nhello\n"
+    assert stream.writes == 1
+
+
+def test_unknown_access_log_format_is_rejected():
+    with pytest.raises(ValueError):
+        AccessLogSettings.from_config(access_log_config({"format": "xml"}))
@@ -0,0 +1,137 @@
+from unittest.mock import MagicMock
+
+from flask import Flask
+import grpc
+from prometheus_client import Counter, values
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from werkzeug.test import Client
+
+from chaosplt_account.metrics import NAMESPACE, ClientMetricsInterceptor, \
+    metrics_app, registry, timed_handler, track_engine, track_http_server, \
+    track_pipeline
+from chaosplt_account.model import User
+from chaosplt_account.service.pipeline import BatchPipeline
+
+from test_cache import signin
+
+
+def sample(name: str, **labels) -> float:
+    return registry.get_sample_value(
+        "chaosplatform_account_{}".format(name), labels) or 0
+
+
+def scrape() -> str:
+    response = Client(metrics_app()).get("/")
+    return b"".join(response[0]).decode("utf-8")
+
+
+def test_request_latency_per_endpoint(app: Flask, authed_user: User):
+    labels = {
+        "app": "web", "endpoint": "user.the_user", "method": "GET",
+        "status": "200"
+    }
+    before = sample("http_request_duration_seconds_count", **labels)
+
+    client = signin(app, authed_user)
+    assert client.get("/users/current").status_code == 200
+    # hooks pile up on the blueprints as every test serves a new app, each
+    # observes the request
+    assert sample("http_request_duration_seconds_count", **labels) > before
+
+
+def test_cache_lookups_are_counted(app: Flask, authed_user: User):
+    client = signin(app, authed_user)
+    url = "/users/{}/organizations".format(authed_user.id)
+    hits = sample("cache_requests_total", kind="response", result="hit")
+    misses = sample("cache_requests_total", kind="response", result="miss")
+
+    client.get(url)
+    client.get(url)
+    assert sample(
+        "cache_requests_total", kind="response", result="miss") == misses + 1
+    assert sample(
+        "cache_requests_total", kind="response", result="hit") == hits + 1
+
+
+def test_outbound_call_latency_per_method():
+    labels = {
+        "service": "chaosplatform.activity.ActivityService",
+        "method": "RecordActivity", "code": "UNAVAILABLE"
+    }
+    before = sample("grpc_client_duration_seconds_count", **labels)
+
+    outcome = MagicMock()
+    outcome.code.return_value = grpc.StatusCode.UNAVAILABLE
+    outcome.add_done_callback.side_effect = lambda done: done(outcome)
+    details = MagicMock()
+    details.method = "/chaosplatform.activity.ActivityService/RecordActivity"
+
+    result = ClientMetricsInterceptor().intercept_unary_unary(
+        lambda d, r: outcome, details, None)
+    assert result is outcome
+    assert sample("grpc_client_duration_seconds_count", **labels) == \
+        before + 1
+
+
+def test_handler_latency_per_code():
+    @timed_handler("RegistrationService", "GetById")
+    def handler(fail: bool):
+        if fail:
+            raise RuntimeError()
+
+    handler(False)
+    with pytest.raises(RuntimeError):
+        handler(True)
+
+    assert sample(
+        "grpc_server_handler_duration_seconds_count",
+        service="RegistrationService", method="GetById", code="OK") >= 1
+    assert sample(
+        "grpc_server_handler_duration_seconds_count",
+        service="RegistrationService", method="GetById",
+        code="UNKNOWN") >= 1
+
+
+def test_resources_are_read_when_scraped():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+    track_engine("test-pool", engine)
+    with engine.connect():
+        assert sample("db_pool_checked_out", storage="test-pool") == 1
+    assert sample("db_pool_size", storage="test-pool") == 3
+
+    pipeline = BatchPipeline(lambda batch: None, name="test-queue")
+    track_pipeline("test-queue", pipeline)
+    pipeline.submit(1)
+    pipeline.close()
+    assert sample(
+        "queue_items_total", queue="test-queue", outcome="submitted") == 1
+
+    body = scrape()
+    assert 'chaosplatform_account_queue_depth{queue="test-queue"} 0.0' in body
+    assert "chaosplatform_account_db_pool_size" in body
+
+
+def test_queued_requests_are_read_when_scraped():
+    server = MagicMock()
+    server.httpserver.requests.qsize = 4
+    server.httpserver.requests.idle = 0
+    server.httpserver.requests._threads = [object()] * 10
+    track_http_server("test-server", server)
+
+    assert sample("http_requests_queued", server="test-server") == 4
+    assert sample("http_threads_idle", server="test-server") == 0
+    assert sample("http_threads", server="test-server") == 10
+
+
+def test_metrics_of_all_the_workers_are_served(tmpdir, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmpdir))
+    for pid in (1001, 1002):
+        # as the module would be set up in a worker started in that mode
+        monkeypatch.setattr(
+            values, "ValueClass", values.MultiProcessValue(lambda pid=pid: pid))
+        Counter("worker_requests", "Requests served by the worker",
+                namespace=NAMESPACE, registry=None).inc(2)
+
+    assert "chaosplatform_account_worker_requests_total 4.0" in scrape()
@@ -17,8 +17,46 @@ from werkzeug.exceptions import NotFound
 def test_list_all_orgs(app: Flask, services: Services, authed_user: User):
     with app.app_context():
         response = list_all_orgs(services, authed_user)
-        orgs = response.json
+        orgs = response.json["orgs"]
         assert len(orgs) == 3
+        assert response.json["paging"]["cursor"] is None
+
+
+def test_list_all_orgs_by_page(app: Flask, services: Services,
+                               authed_user: User):
+    with app.app_context():
+        response = list_all_orgs(services, authed_user, {"limit": 2})
+        first_page = response.json
+        assert len(first_page["orgs"]) == 2
+        cursor = first_page["paging"]["cursor"]
+        assert cursor is not None
+
+        response = list_all_orgs(
+            services, authed_user, {"limit": 2, "cursor": cursor})
+        second_page = response.json
+        assert len(second_page["orgs"]) == 1
+        assert second_page["paging"]["cursor"] is None
+
+        names = [o["name"] for o in first_page["orgs"] + second_page["orgs"]]
+        assert sorted(names) == ["myorg", "org1", "org2"]
+
+
+def test_list_all_orgs_invalid_cursor(app: Flask, services: Services,
+                                      authed_user: User):
+    with app.app_context():
+        response, status_code = list_all_orgs(
+            services, authed_user, {"cursor": "not-a-cursor"})
+        assert status_code == 422
+        assert "cursor" in response.json
+
+
+def test_list_all_orgs_limit_is_bounded(app: Flask, services: Services,
+                                        authed_user: User):
+    with app.app_context():
+        response, status_code = list_all_orgs(
+            services, authed_user, {"limit": 10000})
+        assert status_code == 422
+        assert "limit" in response.json
 
 
 def test_create_org_name_is_mandatory(app: Flask, services: Services,
@@ -0,0 +1,51 @@
+from uuid import uuid4
+
+from chaosplt_account.model import Organization, User
+from chaosplt_account.storage import AccountStorage
+from flask import Flask
+
+from fixtures.sql import count_queries
+
+
+def test_get_many_orgs_preserves_order_and_drops_missing(
+        app: Flask, account_storage: AccountStorage, user_org: Organization,
+        collaborative_org1: Organization, collaborative_org2: Organization):
+    with app.app_context():
+        org_ids = [
+            collaborative_org2.id, uuid4(), str(user_org.id),
+            collaborative_org1.id
+        ]
+        orgs = account_storage.org.get_many(org_ids)
+
+        assert [o.name for o in orgs] == ["org2", "myorg", "org1"]
+        assert len(orgs[1].workspaces) == 2
+        assert orgs[1].workspaces[0].org_name == "myorg"
+
+
+def test_get_many_orgs_uses_a_fixed_number_of_queries(
+        app: Flask, account_storage: AccountStorage, user_org: Organization,
+        collaborative_org1: Organization, collaborative_org2: Organization):
+    engine = account_storage.driver.engine
+    with app.app_context():
+        org_ids = [user_org.id, collaborative_org1.id, collaborative_org2.id]
+        with count_queries(engine) as statements:
+            orgs = account_storage.org.get_many(org_ids)
+        assert len(orgs) == 3
+        assert len(statements) == 2
+
+
+def test_org_membership_checks_run_a_single_query(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        user1: User, collaborative_org2: Organization):
+    engine = account_storage.driver.engine
+    org_id = collaborative_org2.id
+    with app.app_context():
+        with count_queries(engine) as statements:
+            assert account_storage.org.is_member(org_id, authed_user.id)
+            assert not account_storage.org.is_owner(org_id, authed_user.id)
+            assert account_storage.org.is_owner(org_id, user1.id)
+        assert len(statements) == 3
+        assert "EXISTS" in statements[0]
+
+        assert not account_storage.org.is_member(uuid4(), authed_user.id)
+        assert not account_storage.org.is_owner(org_id, uuid4())
@@ -2,9 +2,10 @@ from typing import Any, Dict
 from unittest.mock import MagicMock, patch
 
 from chaosplt_account.service import Services
-from chaosplt_account.server import initialize_all, release_all, \
-    initialize_grpc
+from chaosplt_account.server import AdaptiveThreadPool, initialize_all, \
+    initialize_grpc, release_all
 from chaosplt_account.storage import AccountStorage
+import cherrypy
 from chaosplt_grpc import create_grpc_server, start_grpc_server, \
     stop_grpc_server
 import grpc
@@ -16,16 +17,36 @@ def test_initialize_all(create_grpc_server, config: Dict[str, Any],
     grpc_server = MagicMock()
     create_grpc_server.return_value = grpc_server
 
+    cherrypy.tree.apps.pop("/metrics", None)
     try:
         web_app, api_app, services, grpc_server, \
             storage = initialize_all(config, services=services)
 
         assert services.account is not None
+        assert "/metrics" not in cherrypy.tree.apps
     finally:
         release_all(
             web_app, api_app, services, grpc_server, storage)
 
 
+@patch('chaosplt_account.server.create_grpc_server', autospec=True)
+def test_metrics_are_served_once_enabled(create_grpc_server,
+                                         config: Dict[str, Any],
+                                         services: Services):
+    create_grpc_server.return_value = MagicMock()
+    config["metrics"] = {"enabled": True}
+
+    try:
+        web_app, api_app, services, grpc_server, \
+            storage = initialize_all(config, services=services)
+
+        assert "/metrics" in cherrypy.tree.apps
+    finally:
+        release_all(
+            web_app, api_app, services, grpc_server, storage)
+        cherrypy.tree.apps.pop("/metrics", None)
+
+
 def test_initialize_and_start_grpc_server(config: Dict[str, Any],
                                           account_storage: AccountStorage):
     try:
@@ -57,3 +78,21 @@ def test_initialize_and_reuse_grpc_server(config: Dict[str, Any],
         assert handler.service_name() == svc_name
     finally:
         stop_grpc_server(server, timeout=0)
+
+
+def test_adaptive_pool_grows_when_requests_wait():
+    server = MagicMock()
+    pool = server.httpserver.requests
+    pool.qsize = 3
+    pool.idle = 0
+    adaptive = AdaptiveThreadPool(cherrypy.engine, server, idle_checks=2)
+
+    adaptive.adapt()
+    pool.grow.assert_called_once_with(3)
+
+    pool.qsize = 0
+    pool.idle = 6
+    adaptive.adapt()
+    pool.shrink.assert_not_called()
+    adaptive.adapt()
+    pool.shrink.assert_called_once_with(3)
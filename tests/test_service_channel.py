@@ -0,0 +1,119 @@
+from unittest.mock import patch
+
+import grpc
+from grpc import ChannelConnectivity
+import pytest
+
+from chaosplt_account.service import Services, initialize_services, \
+    shutdown_services
+from chaosplt_account.service.activity import EventService
+from chaosplt_account.service.channel import ChannelPool, channel_options
+
+ADDR = "localhost:50051"
+
+
+class UnavailableError(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+
+def test_channel_is_reused():
+    pool = ChannelPool()
+    with pool.channel(ADDR) as first:
+        pass
+    with pool.channel(ADDR) as second:
+        pass
+    assert first is second
+
+    stats = pool.stats()[ADDR]
+    assert stats.created == 1
+    assert stats.reused == 1
+    assert stats.reuse_ratio == 0.5
+    pool.close_all()
+
+
+def test_channel_is_replaced_when_server_is_unavailable():
+    pool = ChannelPool()
+    with pytest.raises(UnavailableError):
+        with pool.channel(ADDR) as first:
+            raise UnavailableError()
+
+    with pool.channel(ADDR) as second:
+        pass
+    assert first is not second
+
+    stats = pool.stats()[ADDR]
+    assert stats.created == 2
+    assert stats.failures == 1
+    pool.close_all()
+
+
+def test_broken_channel_is_reconnected():
+    pool = ChannelPool()
+    first = pool.get(ADDR)
+    pool._states[ADDR] = ChannelConnectivity.TRANSIENT_FAILURE
+
+    second = pool.get(ADDR)
+    assert first is not second
+    assert pool.stats()[ADDR].reconnects == 1
+    pool.close_all()
+
+
+def test_released_channel_is_unwatched_before_being_closed():
+    pool = ChannelPool()
+    channel = pool.get(ADDR)
+    with patch.object(channel, "unsubscribe",
+                      wraps=channel.unsubscribe) as unsubscribe, \
+            patch.object(channel, "close", wraps=channel.close) as close:
+        pool.discard(ADDR)
+        unsubscribe.assert_called_once()
+        close.assert_not_called()
+
+        pool.close_all()
+        close.assert_called_once()
+
+
+def test_closed_pool_cannot_be_used():
+    pool = ChannelPool()
+    pool.get(ADDR)
+    pool.close_all()
+    with pytest.raises(RuntimeError):
+        pool.get(ADDR)
+
+
+def test_keepalive_options_from_config():
+    options = dict(channel_options({
+        "grpc": {
+            "keepalive": {
+                "time_ms": 1000
+            }
+        }
+    }))
+    assert options["grpc.keepalive_time_ms"] == 1000
+    assert options["grpc.keepalive_timeout_ms"] == 10000
+    assert options["grpc.keepalive_permit_without_calls"] == 1
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_events_share_the_same_channel(record_activity):
+    pool = ChannelPool()
+    svc = EventService({"grpc": {"activity": {"address": ADDR}}}, pool)
+    svc.record(user_id=None, event_type="user", phase="create")
+    svc.record(user_id=None, event_type="user", phase="delete")
+    svc.release()
+
+    channels = [c[0][0] for c in record_activity.call_args_list]
+    assert channels[0] is channels[1]
+    assert pool.stats()[ADDR].created == 1
+    pool.close_all()
+
+
+def test_services_share_a_pool_closed_on_shutdown(config):
+    services = Services()
+    initialize_services(services, config)
+    assert services.activity.event.channels is services.channels
+    assert services.auth.access_token.channels is services.channels
+
+    shutdown_services(services)
+    with pytest.raises(RuntimeError):
+        services.channels.get(ADDR)
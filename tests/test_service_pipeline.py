@@ -0,0 +1,145 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from chaosplt_account.service.activity import EventService
+from chaosplt_account.service.channel import ChannelPool
+from chaosplt_account.service.pipeline import BatchPipeline
+
+ADDR = "localhost:50051"
+
+
+def test_items_are_processed_by_batches_of_given_size():
+    batches = []
+    pipeline = BatchPipeline(
+        batches.append, batch_size=3, flush_interval=10)
+    for i in range(7):
+        assert pipeline.submit(i) is True
+    assert pipeline.close(timeout=5) is True
+
+    assert [i for b in batches for i in b] == list(range(7))
+    assert all(len(b) <= 3 for b in batches)
+    assert len(batches[0]) == 3
+
+    stats = pipeline.stats()
+    assert stats.submitted == 7
+    assert stats.processed == 7
+    assert stats.queued == 0
+
+
+def test_incomplete_batch_is_flushed_after_interval():
+    batches = []
+    pipeline = BatchPipeline(
+        batches.append, batch_size=100, flush_interval=0.05)
+    pipeline.submit("a")
+    assert pipeline.flush(timeout=5) is True
+    assert batches == [["a"]]
+    pipeline.close()
+
+
+def test_drop_policies_when_queue_is_full():
+    release = threading.Event()
+    batches = []
+
+    def handler(batch):
+        release.wait(5)
+        batches.append(batch)
+
+    pipeline = BatchPipeline(
+        handler, max_size=2, batch_size=1, flush_interval=0.01,
+        overflow="drop-oldest")
+    pipeline.submit(0)
+    # wait for the worker to be busy with the first item
+    time.sleep(0.1)
+    pipeline.submit(1)
+    pipeline.submit(2)
+    pipeline.submit(3)
+    release.set()
+    pipeline.close(timeout=5)
+    assert [b[0] for b in batches] == [0, 2, 3]
+    assert pipeline.stats().dropped == 1
+
+    release.clear()
+    batches.clear()
+    pipeline = BatchPipeline(
+        handler, max_size=2, batch_size=1, flush_interval=0.01,
+        overflow="drop-newest")
+    pipeline.submit(0)
+    time.sleep(0.1)
+    pipeline.submit(1)
+    pipeline.submit(2)
+    assert pipeline.submit(3) is False
+    release.set()
+    pipeline.close(timeout=5)
+    assert [b[0] for b in batches] == [0, 1, 2]
+
+
+def test_dropped_items_are_handed_over():
+    release = threading.Event()
+    dropped = []
+    pipeline = BatchPipeline(
+        lambda batch: release.wait(5), max_size=1, batch_size=1,
+        flush_interval=0.01, overflow="drop-oldest",
+        drop_handler=dropped.extend)
+    pipeline.submit(0)
+    time.sleep(0.1)
+    pipeline.submit(1)
+    pipeline.submit(2)
+    release.set()
+    pipeline.close(timeout=5)
+    assert dropped == [1]
+    assert pipeline.submit(3) is False
+    assert dropped == [1, 3]
+
+
+def test_failing_handler_does_not_stop_the_worker():
+    calls = []
+
+    def handler(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    pipeline = BatchPipeline(handler, batch_size=1, flush_interval=0.01)
+    pipeline.submit("a")
+    pipeline.submit("b")
+    pipeline.close(timeout=5)
+    assert calls == [["a"], ["b"]]
+
+    stats = pipeline.stats()
+    assert stats.failed == 1
+    assert stats.processed == 1
+
+
+def test_closed_pipeline_rejects_items():
+    pipeline = BatchPipeline(lambda batch: None)
+    pipeline.close()
+    assert pipeline.submit("a") is False
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        BatchPipeline(lambda batch: None, overflow="whatever")
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_recording_does_not_fail_when_remote_is_down(record_activity):
+    record_activity.side_effect = RuntimeError("activity service is down")
+    svc = EventService(
+        {"grpc": {"activity": {"address": ADDR}}}, ChannelPool())
+    assert svc.record(user_id=None, event_type="user", phase="create") is None
+    svc.release()
+    assert svc.pipeline.stats().failed == 1
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_synchronous_recording(record_activity):
+    record_activity.return_value = "activity-id"
+    svc = EventService(
+        {"grpc": {"activity": {"address": ADDR, "async": False}}},
+        ChannelPool())
+    assert svc.pipeline is None
+    assert svc.record(
+        user_id=None, event_type="user", phase="create") == "activity-id"
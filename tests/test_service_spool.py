@@ -0,0 +1,253 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from chaosplt_account.service.activity import EventService
+from chaosplt_account.service.channel import ChannelPool
+from chaosplt_account.service.spool import EventSpool
+
+ADDR = "localhost:50051"
+
+
+def test_spooled_events_are_replayed_in_order(tmp_path):
+    spool = EventSpool(str(tmp_path / "spool.db"), replay_batch_size=2)
+    spool.append([{"n": 1}, {"n": 2}])
+    spool.append([{"n": 3}])
+    assert len(spool) == 3
+
+    sent = []
+    assert spool.replay(sent.append) == 3
+    assert sent == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert len(spool) == 0
+
+    stats = spool.stats()
+    assert stats.spooled == 3
+    assert stats.replayed == 3
+    assert stats.size > 0
+    spool.close()
+
+
+def test_failed_replay_keeps_events(tmp_path):
+    spool = EventSpool(str(tmp_path / "spool.db"))
+    spool.append([{"n": 1}])
+
+    def send(event):
+        raise RuntimeError("still down")
+
+    with pytest.raises(RuntimeError):
+        spool.replay(send)
+    assert len(spool) == 1
+    spool.close()
+
+
+def test_events_sent_before_a_failure_are_not_sent_again(tmp_path):
+    spool = EventSpool(str(tmp_path / "spool.db"), replay_batch_size=10)
+    spool.append([{"n": 1}, {"n": 2}, {"n": 3}])
+
+    sent = []
+
+    def send(event):
+        if event["n"] == 2:
+            raise RuntimeError("down in the middle of the batch")
+        sent.append(event)
+
+    with pytest.raises(RuntimeError):
+        spool.replay(send)
+    assert sent == [{"n": 1}]
+    assert len(spool) == 2
+    assert spool.stats().replayed == 1
+
+    sent = []
+    assert spool.replay(sent.append) == 2
+    assert sent == [{"n": 2}, {"n": 3}]
+    spool.close()
+
+
+def test_replay_stops_at_the_limit(tmp_path):
+    spool = EventSpool(str(tmp_path / "spool.db"), replay_batch_size=2)
+    spool.append([{"n": n} for n in range(5)])
+
+    sent = []
+    assert spool.replay(sent.append, limit=3) == 3
+    assert sent == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert len(spool) == 2
+    spool.close()
+
+
+def test_spool_is_bounded(tmp_path):
+    spool = EventSpool(str(tmp_path / "spool.db"), max_events=2)
+    spool.append([{"n": 1}, {"n": 2}, {"n": 3}])
+    assert len(spool) == 2
+    assert spool.stats().dropped == 1
+
+    sent = []
+    spool.replay(sent.append)
+    assert sent == [{"n": 2}, {"n": 3}]
+    spool.close()
+
+
+def test_spool_survives_restarts(tmp_path):
+    path = str(tmp_path / "spool" / "events.db")
+    spool = EventSpool(path)
+    spool.append([{"n": 1}])
+    spool.close()
+    assert os.path.exists(path)
+
+    spool = EventSpool(path)
+    assert len(spool) == 1
+    spool.close()
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_events_are_spooled_while_remote_is_down(record_activity, tmp_path):
+    config = {
+        "grpc": {
+            "activity": {
+                "address": ADDR,
+                "spool_path": str(tmp_path / "spool.db"),
+                "retry_interval": 0
+            }
+        }
+    }
+
+    record_activity.side_effect = RuntimeError("activity service is down")
+    svc = EventService(config, ChannelPool())
+    svc.record(user_id=None, event_type="user", phase="create")
+    svc.record(user_id=None, event_type="user", phase="delete")
+    svc.release()
+    assert svc.pipeline.stats().failed == 0
+    assert svc.spool.stats().spooled == 2
+
+    record_activity.side_effect = None
+    record_activity.reset_mock()
+    svc = EventService(config, ChannelPool())
+    svc.record(user_id=None, event_type="org", phase="create")
+    svc.release()
+
+    phases = [c[1]["phase"] for c in record_activity.call_args_list]
+    assert phases == ["create", "delete", "create"]
+    assert len(svc.spool) == 0
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_synchronous_recording_spools_when_remote_is_down(record_activity,
+                                                          tmp_path):
+    record_activity.side_effect = RuntimeError("activity service is down")
+    svc = EventService({
+        "grpc": {
+            "activity": {
+                "address": ADDR,
+                "async": False,
+                "spool_path": str(tmp_path / "spool.db")
+            }
+        }
+    }, ChannelPool())
+    assert svc.record(user_id=None, event_type="user", phase="create") is None
+    assert svc.is_remote_down()
+
+    # while the remote is down, events are spooled without trying to send
+    svc.record(user_id=None, event_type="user", phase="delete")
+    assert record_activity.call_count == 1
+    assert len(svc.spool) == 2
+    svc.release()
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_synchronous_recording_replays_the_spool_first(record_activity,
+                                                       tmp_path):
+    svc = EventService({
+        "grpc": {
+            "activity": {
+                "address": ADDR,
+                "async": False,
+                "retry_interval": 0,
+                "spool_path": str(tmp_path / "spool.db")
+            }
+        }
+    }, ChannelPool())
+    record_activity.side_effect = RuntimeError("activity service is down")
+    svc.record(user_id=None, event_type="user", phase="a")
+    assert len(svc.spool) == 1
+
+    record_activity.side_effect = None
+    record_activity.reset_mock()
+    for phase in ("b", "c"):
+        svc.record(user_id=None, event_type="user", phase=phase)
+    phases = [c[1]["phase"] for c in record_activity.call_args_list]
+    assert phases == ["a", "b", "c"]
+    assert len(svc.spool) == 0
+    svc.release()
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_synchronous_recording_replays_a_bounded_part_of_the_spool(
+        record_activity, tmp_path):
+    svc = EventService({
+        "grpc": {
+            "activity": {
+                "address": ADDR,
+                "async": False,
+                "batch_size": 2,
+                "retry_interval": 0,
+                "spool_path": str(tmp_path / "spool.db")
+            }
+        }
+    }, ChannelPool())
+    record_activity.side_effect = RuntimeError("activity service is down")
+    for phase in ("a", "b", "c"):
+        svc.record(user_id=None, event_type="user", phase=phase)
+    assert len(svc.spool) == 3
+
+    record_activity.side_effect = None
+    record_activity.reset_mock()
+    # the event waits behind the ones still spooled
+    assert svc.record(user_id=None, event_type="user", phase="d") is None
+    phases = [c[1]["phase"] for c in record_activity.call_args_list]
+    assert phases == ["a", "b"]
+    assert len(svc.spool) == 2
+
+    svc.record(user_id=None, event_type="user", phase="e")
+    phases = [c[1]["phase"] for c in record_activity.call_args_list]
+    assert phases == ["a", "b", "c", "d", "e"]
+    assert len(svc.spool) == 0
+    svc.release()
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_synchronous_recording_does_not_wait_for_a_replay(record_activity,
+                                                          tmp_path):
+    svc = EventService({
+        "grpc": {
+            "activity": {
+                "address": ADDR,
+                "async": False,
+                "spool_path": str(tmp_path / "spool.db")
+            }
+        }
+    }, ChannelPool())
+    svc.spool.append([{"phase": "a"}])
+
+    # another request is replaying the spool
+    with svc._replay_lock:
+        svc.record(user_id=None, event_type="user", phase="b")
+    record_activity.assert_not_called()
+    assert len(svc.spool) == 2
+    svc.release()
+
+
+@patch("chaosplt_account.service.activity.record_activity", autospec=True)
+def test_events_beyond_the_queue_are_spooled(record_activity, tmp_path):
+    svc = EventService({
+        "grpc": {
+            "activity": {
+                "address": ADDR,
+                "queue_size": 1,
+                "spool_path": str(tmp_path / "spool.db")
+            }
+        }
+    }, ChannelPool())
+    svc.pipeline.close()
+    svc.record(user_id=None, event_type="user", phase="create")
+    assert svc.spool.stats().spooled == 1
+    svc.release()
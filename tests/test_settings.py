@@ -0,0 +1,55 @@
+import cherrypy
+import pytest
+
+from chaosplt_account.settings import load_settings
+
+
+@pytest.fixture
+def restore_cherrypy_config():
+    saved = dict(cherrypy.config)
+    yield
+    cherrypy.config.clear()
+    cherrypy.config.update(saved)
+
+
+def write_settings(tmpdir, cherrypy_section: str) -> str:
+    path = tmpdir.join("config.toml")
+    path.write("""
+[chaosplatform]
+debug = false
+
+    [chaosplatform.http]
+    address = "127.0.0.1:8090"
+    secret_key = "whatever"
+
+        [chaosplatform.http.cherrypy]
+{}
+""".format(cherrypy_section))
+    return str(path)
+
+
+def test_server_pool_and_sockets_are_tuned(tmpdir, restore_cherrypy_config):
+    load_settings(write_settings(tmpdir, """
+        thread_pool = 20
+        thread_pool_max = 50
+        socket_queue_size = 128
+        socket_timeout = 5
+        max_request_body_size = 1048576
+    """))
+
+    assert cherrypy.config["server.thread_pool"] == 20
+    assert cherrypy.config["server.thread_pool_max"] == 50
+    assert cherrypy.config["server.socket_queue_size"] == 128
+    assert cherrypy.config["server.socket_timeout"] == 5
+    assert cherrypy.config["server.max_request_body_size"] == 1048576
+    assert cherrypy.config["server.max_request_header_size"] == 500 * 1024
+
+
+def test_adaptive_pool_is_bounded(tmpdir, restore_cherrypy_config):
+    load_settings(write_settings(tmpdir, """
+        thread_pool = 8
+        adaptive_pool = true
+    """))
+
+    assert cherrypy.config["server.thread_pool"] == 8
+    assert cherrypy.config["server.thread_pool_max"] == 32
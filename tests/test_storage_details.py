@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+import uuid
+
+from chaosplt_relational_storage.db import orm_session
+from flask import Flask
+
+from chaosplt_account.model import Organization, User
+from chaosplt_account.storage import AccountStorage
+from chaosplt_account.storage.details import DetailsCache
+from chaosplt_account.storage.model import UserInfo
+
+from fixtures.sql import count_queries
+from test_metrics import sample
+
+
+def test_details_are_decrypted_once_per_update(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    account_storage.details.clear()
+    hits = sample(
+        "cache_requests_total", kind="user_details", result="hit")
+    with app.app_context():
+        user = account_storage.user.get(authed_user.id)
+        assert user.email == "myuser@example.com"
+        assert sample(
+            "cache_requests_total", kind="user_details", result="hit") == hits
+
+        user = account_storage.user.get(authed_user.id)
+        assert user.email == "myuser@example.com"
+        assert sample(
+            "cache_requests_total", kind="user_details",
+            result="hit") == hits + 1
+
+        with orm_session() as session:
+            info = UserInfo.load_by_userid(authed_user.id, session=session)
+            info.details = {"email": "jane@example.com"}
+            info.last_updated = datetime.utcnow() + timedelta(seconds=10)
+
+        user = account_storage.user.get(authed_user.id)
+        assert user.email == "jane@example.com"
+
+
+def test_details_updated_within_the_same_second_are_not_stale(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    account_storage.details.clear()
+    with app.app_context():
+        with orm_session() as session:
+            info = UserInfo.load_by_userid(authed_user.id, session=session)
+            last_updated = info.last_updated
+
+        for email in ("jane@example.com", "joan@example.com"):
+            with orm_session() as session:
+                info = UserInfo.load_by_userid(
+                    authed_user.id, session=session)
+                info.details = {"email": email}
+                info.last_updated = last_updated
+
+            user = account_storage.user.get(authed_user.id)
+            assert user.email == email
+
+
+def test_least_recently_used_details_are_evicted():
+    cache = DetailsCache(maxsize=1)
+    first = UserInfo(id=uuid.uuid4())
+    second = UserInfo(id=uuid.uuid4())
+
+    assert cache.get(first, b"1", lambda: {"email": "a"}) == {"email": "a"}
+    assert len(cache) == 1
+    cache.get(second, b"2", lambda: {"email": "b"})
+    assert len(cache) == 1
+    assert cache.get(second, b"2", lambda: {"email": "x"}) == {"email": "b"}
+    assert cache.get(first, b"1", lambda: {"email": "x"}) == {"email": "x"}
+
+
+def test_member_listings_do_not_load_details(
+        app: Flask, account_storage: AccountStorage,
+        collaborative_org1: Organization):
+    engine = account_storage.driver.engine
+    with app.app_context():
+        with count_queries(engine) as statements:
+            members = account_storage.org.get_members(collaborative_org1.id)
+        assert members
+        assert {m.username for m in members} >= {"myuser"}
+        # the memberships with their users, then the org
+        assert len(statements) <= 2
+        assert not any("details" in s for s in statements)
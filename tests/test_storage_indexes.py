@@ -0,0 +1,60 @@
+import logging
+
+from click.testing import CliRunner
+from sqlalchemy import create_engine
+
+from chaosplt_account.cli import cli
+from chaosplt_account.storage import AccountStorage, ensure_indexes
+from chaosplt_account.storage.indexes import missing_indexes
+
+from conftest import config_path
+
+
+def test_missing_indexes_are_created(account_storage: AccountStorage):
+    engine = account_storage.driver.engine
+    assert missing_indexes(engine) == []
+
+    engine.execute("DROP INDEX ix_orgs_members_user_id")
+    try:
+        missing = ensure_indexes(engine, dry_run=True)
+        assert [str(index.name) for index in missing] == [
+            "ix_orgs_members_user_id"]
+        assert missing_indexes(engine) == missing
+
+        assert ensure_indexes(engine) == missing
+        assert missing_indexes(engine) == []
+    finally:
+        if missing_indexes(engine):
+            ensure_indexes(engine)
+
+
+def test_storage_warns_of_missing_indexes(
+        account_storage: AccountStorage, config, caplog, tmpdir):
+    # a database made before the index was added to the models
+    uri = "sqlite:///{}".format(tmpdir.join("db.sqlite"))
+    engine = create_engine(uri)
+    schema = account_storage.driver.engine.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL").fetchall()
+    for (statement,) in schema:
+        if "ix_workspaces_members_user_id" not in statement:
+            engine.execute(statement)
+    engine.dispose()
+
+    config["db"]["uri"] = uri
+    with caplog.at_level(logging.WARNING, logger="chaosplatform"):
+        storage = AccountStorage(config)
+        storage.release()
+    assert "ix_workspaces_members_user_id" in caplog.text
+
+    with open(config_path) as f:
+        settings = f.read().replace('"sqlite:///:memory:"', '"{}"'.format(uri))
+    path = tmpdir.join("config.toml")
+    path.write(settings)
+    runner = CliRunner()
+    result = runner.invoke(cli, ["ensure-indexes", "--config", str(path)])
+    assert result.exit_code == 0, result.output
+    assert "Created index ix_workspaces_members_user_id on " \
+        "workspaces_members" in result.output
+
+    result = runner.invoke(cli, ["ensure-indexes", "--config", str(path)])
+    assert "No index is missing" in result.output
@@ -0,0 +1,100 @@
+import logging
+from unittest.mock import patch
+
+from chaosplt_account.model import Organization, User
+from chaosplt_account.storage import AccountStorage, RepeatedStatementError
+from chaosplt_account.storage.instrumentation import QueryInstrumentation, \
+    QueryStats, begin_query_stats, end_query_stats, statement_shape
+from flask import Flask
+import pytest
+
+from test_cache import signin
+
+
+def test_statements_differing_by_in_clause_share_their_shape():
+    first = statement_shape(
+        "SELECT org.id FROM org\n WHERE org.id IN (?, ?)")
+    second = statement_shape("SELECT org.id FROM org WHERE org.id IN (?)")
+    assert first == second == "SELECT org.id FROM org WHERE org.id IN (?)"
+    assert statement_shape(
+        "SELECT * FROM org WHERE id IN (%(id_1)s, %(id_2)s)") == \
+        "SELECT * FROM org WHERE id IN (?)"
+
+
+def test_statements_are_recorded_while_recording(
+        app: Flask, account_storage: AccountStorage,
+        user_org: Organization):
+    with app.app_context():
+        account_storage.org.is_member(user_org.id, user_org.id)
+        assert begin_query_stats()
+        assert not begin_query_stats()
+        account_storage.org.is_member(user_org.id, user_org.id)
+        account_storage.org.is_member(user_org.id, user_org.id)
+        stats = end_query_stats()
+
+    assert stats.statements == 2
+    assert stats.duration > 0
+    assert len(stats.shapes) == 1
+    assert stats.repeated(1) == [(list(stats.shapes)[0], 2)]
+    assert end_query_stats() is None
+
+
+def test_repeated_statements_fail_in_test_mode():
+    stats = QueryStats(statements=3)
+    stats.shapes["SELECT 1"] = 3
+
+    QueryInstrumentation(repeat_threshold=3, fail_on_repeat=True).check(
+        stats, "GET /")
+    with pytest.raises(RepeatedStatementError):
+        QueryInstrumentation(repeat_threshold=2, fail_on_repeat=True).check(
+            stats, "GET /")
+
+
+def test_repeated_statements_log_a_warning(caplog):
+    stats = QueryStats(statements=3)
+    stats.shapes["SELECT 1"] = 3
+    with caplog.at_level(logging.WARNING, logger="chaosplatform"):
+        QueryInstrumentation(repeat_threshold=2).check(stats, "GET /")
+    assert "3 times 'SELECT 1'" in caplog.text
+
+
+def test_instrumentation_is_off_by_default():
+    instrumentation = QueryInstrumentation.from_config({})
+    assert not instrumentation.enabled
+    assert not instrumentation.server_timing
+
+
+def test_response_tells_time_spent_in_database(app: Flask,
+                                               authed_user: User):
+    client = signin(app, authed_user)
+    response = client.get("/users/current")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    assert "statements" in timing
+
+
+def test_request_fails_when_statements_repeat(app: Flask, authed_user: User):
+    client = signin(app, authed_user)
+    with patch.object(QueryStats, "repeated", autospec=True) as repeated:
+        repeated.return_value = [("SELECT user.id FROM user", 11)]
+        # the tests configuration fails rather than warns
+        with pytest.raises(RepeatedStatementError):
+            client.get("/users/current")
+
+
+def test_request_failing_on_repeated_statements_is_rolled_back(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    def creating():
+        account_storage.org.create("repeating-org", authed_user.id)
+        return "", 204
+
+    app.view_functions["user.signout"] = creating
+    client = app.test_client()
+    with patch.object(QueryStats, "repeated", autospec=True) as repeated:
+        repeated.return_value = [("SELECT user.id FROM user", 11)]
+        with pytest.raises(RepeatedStatementError):
+            client.get("/users/signout")
+
+    with app.app_context():
+        assert not account_storage.org.has_org_by_name("repeating-org")
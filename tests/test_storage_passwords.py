@@ -0,0 +1,180 @@
+import threading
+from unittest.mock import patch
+
+from click.testing import CliRunner
+from flask import Flask
+import pytest
+from sqlalchemy import event
+
+from chaosplt_account.cli import cli
+from chaosplt_account.storage import AccountStorage, PasswordHashingBusy
+from chaosplt_account.storage.passwords import PasswordHasher, \
+    PasswordPolicy, PasswordSettings, calibrate_rounds, password_context
+from chaosplt_account.storage.session import orm_session, unit_of_work
+from chaosplt_account.storage.model import UserInfo
+
+from test_metrics import sample
+
+
+def test_passwords_are_hashed_by_workers():
+    hasher = PasswordHasher(password_context(), PasswordSettings(workers=1))
+    before = sample(
+        "password_hash_duration_seconds_count", operation="verify")
+    try:
+        hashed = hasher.hash("secret")
+        assert hashed.startswith("$pbkdf2-sha512$")
+        assert hasher.verify("secret", hashed)
+        assert not hasher.verify("not the secret", hashed.encode("utf-8"))
+    finally:
+        hasher.shutdown()
+
+    assert sample(
+        "password_hash_duration_seconds_count", operation="verify") == \
+        before + 2
+    assert sample("password_queue_wait_seconds_count", operation="hash") >= 1
+
+
+def test_calls_beyond_the_queue_are_rejected():
+    hasher = PasswordHasher(
+        password_context(),
+        PasswordSettings(workers=1, max_queued=0, retry_after=3))
+    started = threading.Event()
+    done = threading.Event()
+
+    def slow_job(policy, operation, *args):
+        started.set()
+        done.wait(5)
+        return (True, 0.0)
+
+    rejected = sample("password_rejected_total")
+    with patch("chaosplt_account.storage.passwords.run_password_job",
+               side_effect=slow_job):
+        waiting = threading.Thread(target=hasher.verify, args=("s", b"h"))
+        waiting.start()
+        try:
+            assert started.wait(5)
+            with pytest.raises(PasswordHashingBusy) as x:
+                hasher.verify("secret", b"hash")
+            assert x.value.retry_after == 3
+        finally:
+            done.set()
+            waiting.join()
+
+    assert sample("password_rejected_total") == rejected + 1
+    hasher.shutdown()
+
+
+def test_passwords_can_be_hashed_by_processes():
+    hasher = PasswordHasher(
+        password_context(), PasswordSettings(workers=1, processes=True))
+    try:
+        assert hasher.verify("secret", hasher.hash("secret"))
+    finally:
+        hasher.shutdown()
+
+
+def test_signin_is_refused_while_hashers_are_busy(app: Flask):
+    client = app.test_client()
+    credentials = {"username": "jdoe", "password": "secret"}
+    response = client.post("/users/signup/local", json=credentials)
+    assert response.status_code == 201
+
+    response = client.post("/users/signin/local", json=credentials)
+    assert response.status_code == 200
+
+    with patch.object(PasswordHasher, "verify_and_update",
+                      side_effect=PasswordHashingBusy(2)):
+        response = client.post("/users/signin/local", json=credentials)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
+
+
+def test_policy_sets_the_scheme_and_its_rounds():
+    context = password_context(PasswordPolicy(scheme="bcrypt", rounds=5))
+    hashed = context.hash("secret")
+    assert hashed.startswith("$2b$05$")
+    assert not context.needs_update(hashed)
+    assert context.needs_update(password_context().hash("secret"))
+    assert context.needs_update(
+        password_context(PasswordPolicy(scheme="bcrypt", rounds=4)).hash(
+            "secret"))
+
+    with pytest.raises(ValueError):
+        password_context(PasswordPolicy(scheme="md5_crypt"))
+
+
+def test_outdated_hashes_are_rehashed_on_signin(
+        account_storage: AccountStorage):
+    registration = account_storage.registration
+    user = registration.create_local("jane", "secret")
+    former = load_hash(user.id)
+
+    registration.passwords = PasswordHasher(
+        password_context(PasswordPolicy(rounds=1000)), PasswordSettings())
+    try:
+        assert not registration.validate_password(user.id, "not the secret")
+        assert load_hash(user.id) == former
+
+        assert registration.validate_password(user.id, "secret")
+        rehashed = load_hash(user.id)
+        assert rehashed.startswith("$pbkdf2-sha512$1000$")
+
+        # up to date now
+        assert registration.validate_password(user.id, "secret")
+        assert load_hash(user.id) == rehashed
+    finally:
+        registration.passwords.shutdown()
+
+
+def test_rounds_are_calibrated_to_a_target_duration():
+    rounds, duration = calibrate_rounds("bcrypt", 0.001, samples=1)
+    # never below the cheapest cost bcrypt accepts
+    assert rounds == 4
+
+    rounds, duration = calibrate_rounds("pbkdf2_sha512", 0.01, samples=1)
+    assert 1 <= rounds < 25000
+    assert duration < 0.1
+
+    result = CliRunner().invoke(cli, [
+        "calibrate-passwords", "--scheme", "bcrypt", "--target-ms", "1",
+        "--samples", "1"])
+    assert result.exit_code == 0, result.output
+    assert "`rounds = 4`" in result.output
+
+
+def load_hash(user_id) -> str:
+    with orm_session() as session:
+        info = UserInfo.load_by_userid(user_id, session=session)
+        hashed = info.password.hash
+    return hashed.decode("utf-8") if isinstance(hashed, bytes) else hashed
+
+
+def test_no_connection_is_held_while_hashing(
+        account_storage: AccountStorage):
+    registration = account_storage.registration
+    user = registration.create_local("janet", "secret")
+    engine = account_storage.driver.engine
+    checked_out = []
+
+    def checkout(*args):
+        checked_out.append(1)
+
+    def checkin(*args):
+        checked_out.pop()
+
+    def verify_and_update(secret, hashed):
+        assert not checked_out
+        return (True, None)
+
+    event.listen(engine, "checkout", checkout)
+    event.listen(engine, "checkin", checkin)
+    try:
+        with unit_of_work():
+            assert registration.has_by_username("janet")
+            with patch.object(registration.passwords, "verify_and_update",
+                              side_effect=verify_and_update) as verify:
+                assert registration.validate_password(user.id, "secret")
+            assert verify.call_count == 1
+    finally:
+        event.remove(engine, "checkout", checkout)
+        event.remove(engine, "checkin", checkin)
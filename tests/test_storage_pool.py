@@ -0,0 +1,53 @@
+import logging
+
+from sqlalchemy.pool import StaticPool
+
+from chaosplt_account.storage.pool import PoolSettings, \
+    create_pooled_engine, warm_up_engine
+
+
+def test_pool_is_sized_from_settings(tmpdir):
+    settings = PoolSettings.from_config({
+        "db": {
+            "pool_size": 3,
+            "max_overflow": 2,
+            "pool_recycle": 600,
+            "pool_pre_ping": True
+        }
+    })
+    engine = create_pooled_engine(
+        "sqlite:///{}".format(tmpdir.join("db.sqlite")), settings)
+    try:
+        assert engine.pool.size() == 3
+        assert engine.pool._max_overflow == 2
+        assert engine.pool._recycle == 600
+        assert engine.pool._pre_ping is True
+    finally:
+        engine.dispose()
+
+
+def test_warm_up_opens_the_pool(tmpdir):
+    engine = create_pooled_engine(
+        "sqlite:///{}".format(tmpdir.join("db.sqlite")),
+        PoolSettings(pool_size=3))
+    try:
+        assert engine.pool.checkedin() == 0
+        assert warm_up_engine(engine, 3) == 3
+        assert engine.pool.checkedin() == 3
+        assert engine.pool.checkedout() == 0
+    finally:
+        engine.dispose()
+
+
+def test_warm_up_opens_the_single_static_connection(account_storage):
+    assert isinstance(account_storage.driver.engine.pool, StaticPool)
+    assert account_storage.warm_up() == 1
+
+
+def test_statement_timeout_is_ignored_when_unsupported(tmpdir, caplog):
+    with caplog.at_level(logging.WARNING, logger="chaosplatform"):
+        engine = create_pooled_engine(
+            "sqlite:///{}".format(tmpdir.join("db.sqlite")),
+            PoolSettings(statement_timeout=1000))
+    engine.dispose()
+    assert "Statement timeout is not supported with sqlite" in caplog.text
@@ -0,0 +1,84 @@
+import hashlib
+
+from flask import Flask
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from chaosplt_account.model import Organization, User
+from chaosplt_account.storage import AccountStorage, unit_of_work
+from chaosplt_account.storage.session import configure_replica, \
+    release_replica
+from chaosplt_account.views.api import client_key
+
+
+@pytest.fixture
+def replica(account_storage: AccountStorage):
+    # an empty copy of the database: whatever is read from it is not found
+    engine = create_engine(
+        "sqlite://", poolclass=StaticPool,
+        connect_args={"check_same_thread": False})
+    tables = account_storage.driver.engine.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table'").fetchall()
+    for (statement,) in tables:
+        engine.execute(statement)
+    configure_replica(engine, read_your_writes=60)
+    yield engine
+    release_replica()
+    engine.dispose()
+
+
+def test_reads_are_served_by_the_replica(
+        app: Flask, account_storage: AccountStorage,
+        user_org: Organization, replica):
+    with app.app_context():
+        assert account_storage.org.get(user_org.id) is None
+        assert not account_storage.org.has_org_by_name(user_org.name)
+        with unit_of_work():
+            assert account_storage.org.get(user_org.id) is None
+
+
+def test_reads_following_a_write_are_served_by_the_primary(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        replica):
+    with app.app_context():
+        with unit_of_work(consistency_key="alice"):
+            org = account_storage.org.create("replica-org", authed_user.id)
+            assert account_storage.org.get(org.id) is not None
+            assert account_storage.org.is_owner(org.id, authed_user.id)
+
+        # the client which wrote reads its writes for a little while
+        with unit_of_work(consistency_key="alice"):
+            assert account_storage.org.get(org.id) is not None
+        with unit_of_work(consistency_key="bob"):
+            assert account_storage.org.get(org.id) is None
+
+        account_storage.org.delete(org.id)
+
+
+def test_unit_of_work_meant_to_write_reads_from_the_primary(
+        app: Flask, account_storage: AccountStorage,
+        user_org: Organization, replica):
+    with app.app_context():
+        with unit_of_work(writing=True):
+            assert account_storage.org.get(user_org.id) is not None
+
+
+def test_anonymous_clients_do_not_share_their_writes(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        replica):
+    with app.app_context():
+        with unit_of_work():
+            org = account_storage.org.create("anonymous-org", authed_user.id)
+
+        with unit_of_work():
+            assert account_storage.org.get(org.id) is None
+
+        account_storage.org.delete(org.id)
+
+
+def test_api_clients_are_identified_by_a_digest_of_their_token(app: Flask):
+    with app.test_request_context(headers={"Authorization": "Bearer abc"}):
+        assert client_key() == hashlib.sha256(b"Bearer abc").hexdigest()
+    with app.test_request_context():
+        assert client_key() is None
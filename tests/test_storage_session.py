@@ -0,0 +1,89 @@
+from chaosplt_account.model import Organization, User
+from chaosplt_account.storage import AccountStorage, unit_of_work
+from chaosplt_account.storage.session import in_unit_of_work
+from flask import Flask
+import pytest
+
+from fixtures.sql import count_queries
+
+
+def test_unit_of_work_serves_repeated_loads_from_the_identity_map(
+        app: Flask, account_storage: AccountStorage,
+        user_org: Organization):
+    engine = account_storage.driver.engine
+    with app.app_context():
+        with unit_of_work():
+            org = account_storage.org.get(user_org.id)
+            with count_queries(engine) as statements:
+                again = account_storage.org.get(user_org.id)
+            assert statements == []
+            assert again == org
+
+
+def test_unit_of_work_commits_once_done(app: Flask,
+                                        account_storage: AccountStorage,
+                                        authed_user: User):
+    with app.app_context():
+        with unit_of_work():
+            org = account_storage.org.create("uow-org", authed_user.id)
+            assert account_storage.org.is_owner(org.id, authed_user.id)
+
+        assert account_storage.org.has_org_by_name("uow-org")
+        account_storage.org.delete(org.id)
+
+
+def test_unit_of_work_rolls_back_on_error(app: Flask,
+                                          account_storage: AccountStorage,
+                                          authed_user: User):
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            with unit_of_work():
+                account_storage.org.create("uow-org", authed_user.id)
+                assert account_storage.org.has_org_by_name("uow-org")
+                raise RuntimeError()
+
+        assert not account_storage.org.has_org_by_name("uow-org")
+
+
+def test_failed_call_prevents_unit_of_work_from_committing(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    with app.app_context():
+        with unit_of_work():
+            account_storage.org.create("uow-org", authed_user.id)
+            with pytest.raises(Exception):
+                # name is unique
+                account_storage.org.create("uow-org", authed_user.id)
+
+        assert not account_storage.org.has_org_by_name("uow-org")
+
+
+def test_request_runs_within_a_unit_of_work(app: Flask):
+    seen = []
+    view = app.view_functions["user.signout"]
+
+    def spy():
+        seen.append(in_unit_of_work())
+        return view()
+
+    app.view_functions["user.signout"] = spy
+    client = app.test_client()
+    response = client.get("/users/signout")
+    assert response.status_code == 204
+    assert seen == [True]
+    assert not in_unit_of_work()
+
+
+def test_request_answered_with_an_error_is_rolled_back(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    def conflicting():
+        # writes, then gives up
+        account_storage.org.create("uow-org", authed_user.id)
+        return "", 409
+
+    app.view_functions["user.signout"] = conflicting
+    client = app.test_client()
+    response = client.get("/users/signout")
+    assert response.status_code == 409
+
+    with app.app_context():
+        assert not account_storage.org.has_org_by_name("uow-org")
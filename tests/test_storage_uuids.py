@@ -0,0 +1,115 @@
+import uuid
+
+from click.testing import CliRunner
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import configure_mappers
+
+from chaosplt_account.cli import cli
+from chaosplt_account.storage import AccountStorage, migrate_uuids
+from chaosplt_account.storage.model import Org, OrgsMembers, User
+from chaosplt_account.storage.uuids import check_uuid_storage, \
+    configure_uuid_storage, stored_uuids
+
+from conftest import config_path
+
+
+@pytest.fixture
+def db_uri(account_storage: AccountStorage, tmpdir) -> str:
+    # a database made with the UUIDs stored as characters
+    uri = "sqlite:///{}".format(tmpdir.join("db.sqlite"))
+    engine = create_engine(uri)
+    schema = account_storage.driver.engine.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL").fetchall()
+    for (statement,) in schema:
+        engine.execute(statement)
+    engine.dispose()
+    return uri
+
+
+def add_member(engine) -> uuid.UUID:
+    user_id = uuid.uuid4()
+    org_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {"id": user_id})
+        conn.execute(Org.__table__.insert(), {
+            "id": org_id, "user_id": user_id, "name": str(org_id),
+            "name_lower": str(org_id)})
+        conn.execute(OrgsMembers.__table__.insert(), {
+            "org_id": org_id, "user_id": user_id})
+    return user_id
+
+
+def member_org(engine, user_id: str) -> uuid.UUID:
+    members = OrgsMembers.__table__
+    return engine.execute(
+        select([members.c.org_id]).where(
+            members.c.user_id == user_id)).scalar()
+
+
+def test_uuids_are_converted_by_batches(db_uri: str):
+    engine = create_engine(db_uri)
+    user_ids = [add_member(engine), add_member(engine)]
+    assert stored_uuids(engine) == "char"
+
+    progress = []
+    converted = migrate_uuids(
+        engine, "binary", batch_size=1,
+        progress=lambda table, count: progress.append((table, count)))
+    assert converted["user"] == converted["org"] == 2
+    assert converted["orgs_members"] == 2
+    assert ("orgs_members", 1) in progress
+    assert stored_uuids(engine) == "binary"
+    # nothing left to convert
+    assert sum(migrate_uuids(engine, "binary").values()) == 0
+    with pytest.raises(RuntimeError):
+        check_uuid_storage(engine, "char")
+    engine.dispose()
+
+    engine = create_engine(db_uri)
+    configure_uuid_storage(engine, "binary")
+    check_uuid_storage(engine, "binary")
+    # looked up by their string form too
+    assert member_org(engine, str(user_ids[0])) is not None
+    assert member_org(engine, user_ids[1]) is not None
+
+    migrate_uuids(engine, "char")
+    assert stored_uuids(engine) == "char"
+    engine.dispose()
+
+
+def test_storage_serves_binary_uuids(account_storage: AccountStorage,
+                                     config, db_uri: str, tmpdir):
+    # the ORM session is bound to the storage of the tests until released,
+    # which forgets the tables the mappers have not resolved yet
+    configure_mappers()
+    account_storage.release()
+    config["db"]["uri"] = db_uri
+    config["db"]["uuid_storage"] = "binary"
+    with pytest.raises(ValueError):
+        configure_uuid_storage(create_engine(db_uri), "text")
+
+    storage = AccountStorage(config)
+    try:
+        user = storage.registration.create("jane", "Jane", "j@example.com")
+        assert stored_uuids(storage.driver.engine) == "binary"
+        assert storage.user.get(str(user.id)).username == "jane"
+        assert storage.user.get(user.id).id == user.id
+    finally:
+        storage.release()
+
+    # the setting does not match the database anymore
+    config["db"]["uuid_storage"] = "char"
+    with pytest.raises(RuntimeError):
+        AccountStorage(config)
+
+    with open(config_path) as f:
+        settings = f.read().replace(
+            '"sqlite:///:memory:"', '"{}"'.format(db_uri))
+    path = tmpdir.join("config.toml")
+    path.write(settings)
+    result = CliRunner().invoke(
+        cli, ["migrate-uuids", "--config", str(path), "--to", "char"])
+    assert result.exit_code == 0, result.output
+    assert "user: 1 rows converted" in result.output
+    assert stored_uuids(create_engine(db_uri)) == "char"
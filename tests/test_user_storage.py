@@ -0,0 +1,84 @@
+from uuid import UUID
+
+from chaosplt_account.model import User
+from chaosplt_account.storage import AccountStorage
+from chaosplt_account.storage.model.org import Org, OrgsMembers
+from chaosplt_account.storage.model.workspace import Workspace, \
+    WorkspacesMembers
+from chaosplt_relational_storage.db import orm_session
+from flask import Flask
+
+from fixtures.sql import count_queries
+
+
+def test_get_user_loads_memberships(app: Flask,
+                                    account_storage: AccountStorage,
+                                    authed_user: User):
+    with app.app_context():
+        user = account_storage.user.get(authed_user.id)
+
+        assert user.org_name == "myorg"
+        assert user.email == "myuser@example.com"
+
+        orgs = {o.name: o.owner for o in user.orgs}
+        assert orgs == {"myorg": True, "org1": True, "org2": False}
+
+        workspaces = {w.name: (w.owner, w.org_name) for w in user.workspaces}
+        assert workspaces == {
+            "myworkspace": (True, "myorg"),
+            "workspace1": (False, "myorg"),
+            "workspace2": (False, "org1")
+        }
+
+
+def test_get_user_query_count_does_not_depend_on_memberships(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    engine = account_storage.driver.engine
+    with app.app_context():
+        with count_queries(engine) as statements:
+            account_storage.user.get(authed_user.id)
+        baseline = len(statements)
+        assert baseline <= 3
+
+        with orm_session() as session:
+            for i in range(20):
+                org = Org.create("bulk-org-{}".format(i), session=session)
+                workspace = Workspace.create(
+                    org, "bulk-workspace-{}".format(i), "public", None,
+                    session=session)
+                session.flush()
+                OrgsMembers.create_from_ids(
+                    org.id, authed_user.id, owner=bool(i % 2),
+                    session=session)
+                WorkspacesMembers.create_from_ids(
+                    workspace.id, authed_user.id, owner=bool(i % 2),
+                    session=session)
+
+        with count_queries(engine) as statements:
+            user = account_storage.user.get(authed_user.id)
+        assert len(statements) == baseline
+        assert len(user.orgs) == 23
+        assert len(user.workspaces) == 23
+
+
+def test_get_principal_in_a_single_query(app: Flask,
+                                         account_storage: AccountStorage,
+                                         authed_user: User):
+    engine = account_storage.driver.engine
+    with app.app_context():
+        with count_queries(engine) as statements:
+            principal = account_storage.registration.get_principal(
+                authed_user.id)
+        assert len(statements) == 1
+
+        assert principal.id == authed_user.id
+        assert principal.username == authed_user.username
+        assert principal.is_authenticated is True
+        assert principal.get_id() == str(authed_user.id)
+
+
+def test_get_principal_of_unknown_user(app: Flask,
+                                       account_storage: AccountStorage,
+                                       user_id: UUID):
+    with app.app_context():
+        assert account_storage.registration.get_principal(user_id) is None
@@ -0,0 +1,85 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from chaosplt_account import workers
+from chaosplt_account.workers import Worker, check_workers, stop_workers, \
+    supervise, worker_config
+
+
+def crash(path: str, slot: int):
+    with open(path, "a") as f:
+        f.write("started\n")
+    os._exit(3)
+
+
+def linger(ignore_sigterm: bool, slot: int):
+    if ignore_sigterm:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    time.sleep(60)
+
+
+def test_exited_workers_are_restarted(tmpdir, monkeypatch):
+    monkeypatch.setattr(workers, "MIN_UPTIME", 0)
+    path = str(tmpdir.join("starts"))
+    stopping = threading.Event()
+    supervisor = threading.Thread(
+        target=supervise, args=(crash, (path,), 2, stopping),
+        kwargs={"interval": 0.05})
+    supervisor.start()
+    time.sleep(1)
+    stopping.set()
+    supervisor.join(10)
+
+    assert not supervisor.is_alive()
+    with open(path) as f:
+        assert len(f.readlines()) > 2
+
+
+def test_restarts_of_failing_workers_are_delayed():
+    worker = Worker(slot=0, process=workers.multiprocessing.Process())
+    worker.process.join = lambda: None
+    for expected in (1, 2, 4):
+        worker.started = time.monotonic()
+        workers.schedule_restart(worker, worker.started)
+        assert worker.restart_at - worker.started == expected
+
+
+def test_workers_are_killed_when_they_do_not_drain():
+    context = workers.multiprocessing.get_context("fork")
+    pool = []
+    for slot, ignore_sigterm in enumerate((False, True)):
+        worker = Worker(slot=slot)
+        workers.start_worker(context, worker, linger, (ignore_sigterm,))
+        pool.append(worker)
+    # give them time to install their signal handlers
+    time.sleep(0.5)
+
+    stop_workers(pool, graceful_timeout=0.5)
+
+    assert pool[0].process.exitcode == -signal.SIGTERM
+    assert pool[1].process.exitcode == -signal.SIGKILL
+
+
+def test_process_local_cache_is_refused_with_several_workers():
+    with pytest.raises(RuntimeError):
+        check_workers({"cache": {"type": "simple"}})
+    check_workers({"cache": {"type": "redis"}})
+
+
+def test_each_worker_has_its_own_spool():
+    config = {
+        "grpc": {"activity": {"spool_path": "/var/lib/spool/activity.db"}}}
+    first = worker_config(config, 0)
+    second = worker_config(config, 1)
+
+    assert first["grpc"]["activity"]["spool_path"] == \
+        "/var/lib/spool/activity-0.db"
+    assert second["grpc"]["activity"]["spool_path"] == \
+        "/var/lib/spool/activity-1.db"
+    assert config["grpc"]["activity"]["spool_path"] == \
+        "/var/lib/spool/activity.db"
+    assert worker_config({}, 1) == {}
@@ -4,7 +4,8 @@ from unittest.mock import MagicMock
 from uuid import uuid4, UUID
 
 from chaosplt_account.api.org import get_org
-from chaosplt_account.api.workspace import create_workspace, get_workspace
+from chaosplt_account.api.workspace import create_workspace, get_workspace, \
+    list_all_workspaces
 from chaosplt_account.model import Organization, User
 from chaosplt_account.service import Services
 from chaosplt_account.storage.model.workspace import DEFAULT_WORKSPACE_SETTINGS
@@ -128,3 +129,23 @@ def test_create_personal_workspace(app: Flask, services: Services,
             authenticated_user_id=authed_user.id, org_id=collaborative_org2.id,
             user_id=authed_user.id, event_type="workspace",
             workspace_id=UUID(workspace['id']), phase="create")
+
+
+def test_list_all_workspaces_by_page(app: Flask, services: Services,
+                                     authed_user: User):
+    with app.app_context():
+        names = []
+        cursor = None
+        while True:
+            params = {"limit": 1}
+            if cursor:
+                params["cursor"] = cursor
+            response = list_all_workspaces(services, authed_user, params)
+            page = response.json
+            assert len(page["workspaces"]) <= 1
+            names.extend(w["name"] for w in page["workspaces"])
+            cursor = page["paging"]["cursor"]
+            if not cursor:
+                break
+
+        assert sorted(names) == ["myworkspace", "workspace1", "workspace2"]
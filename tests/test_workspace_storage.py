@@ -0,0 +1,65 @@
+from uuid import uuid4
+
+from chaosplt_account.model import User
+from chaosplt_account.storage import AccountStorage
+from flask import Flask
+
+from fixtures.sql import count_queries
+
+
+def test_get_many_workspaces_preserves_order_and_drops_missing(
+        app: Flask, account_storage: AccountStorage, authed_user: User):
+    engine = account_storage.driver.engine
+    with app.app_context():
+        workspaces = sorted(authed_user.workspaces, key=lambda w: w.name)
+        workspace_ids = [w.id for w in reversed(workspaces)]
+        workspace_ids.insert(1, uuid4())
+
+        with count_queries(engine) as statements:
+            result = account_storage.workspace.get_many(workspace_ids)
+        assert len(statements) == 1
+        assert [w.name for w in result] == [
+            "workspace2", "workspace1", "myworkspace"]
+        assert [w.org_name for w in result] == ["org1", "myorg", "myorg"]
+
+
+def test_workspace_membership_checks_run_a_single_query(
+        app: Flask, account_storage: AccountStorage, authed_user: User,
+        user1: User):
+    engine = account_storage.driver.engine
+    workspace = [
+        w for w in authed_user.workspaces if w.name == "workspace2"][0]
+    with app.app_context():
+        with count_queries(engine) as statements:
+            assert account_storage.workspace.is_collaborator(
+                workspace.id, authed_user.id)
+            assert not account_storage.workspace.is_owner(
+                workspace.id, authed_user.id)
+            assert account_storage.workspace.is_owner(workspace.id, user1.id)
+        assert len(statements) == 3
+        assert "EXISTS" in statements[0]
+
+        assert not account_storage.workspace.is_collaborator(
+            uuid4(), authed_user.id)
+
+
+def test_get_memberships_of_a_user(app: Flask,
+                                   account_storage: AccountStorage,
+                                   authed_user: User, user1: User):
+    engine = account_storage.driver.engine
+    workspaces = {w.name: w.id for w in authed_user.workspaces}
+    workspace_ids = list(workspaces.values()) + [uuid4()]
+    with app.app_context():
+        with count_queries(engine) as statements:
+            memberships = account_storage.workspace.get_memberships(
+                authed_user.id, workspace_ids)
+        assert len(statements) == 1
+        assert memberships == {
+            workspaces["myworkspace"]: True,
+            workspaces["workspace1"]: False,
+            workspaces["workspace2"]: False
+        }
+
+        memberships = account_storage.workspace.get_memberships(
+            user1.id, workspace_ids)
+        assert memberships == {workspaces["workspace2"]: True}